@@ -0,0 +1,87 @@
+"""
+Compare `dump(many=True)`, object by object, with the field-major `dump_batch` on the ``User`` schema of main.py.
+
+Run from the repository root with ``python -m benchmarks.batch``.
+"""
+
+import datetime as dt
+import timeit
+
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+ROWS = 100_000
+REPEAT = 3
+
+
+class Team:
+    def __init__(self, id: str, name: str):
+        self.id = id
+        self.name = name
+
+
+class User:
+    def __init__(self, id: str, name: str, email: str, created_at: dt.datetime, referrer: 'User' = None, teams=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.created_at = created_at
+
+        self.referrer = referrer
+        self.teams = teams
+
+
+class TeamSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'teams'
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+
+
+class UserSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'users'
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+    email = fields.Email()
+    created_at = fields.DateTime()
+
+    # relationships
+    referrer = RelationshipType(related_schema='UserSchema')
+    teams = RelationshipType(related_schema=TeamSchema, many=True)
+
+
+now = dt.datetime(2022, 1, 1)
+teams = [Team(id=f't{i}', name=f'Team {i}') for i in range(10)]
+users = []
+for i in range(ROWS):
+    users.append(User(
+        id=f'u{i}', name=f'User {i}', email=f'user-{i}@python.org', created_at=now + dt.timedelta(seconds=i),
+        referrer=users[i - 1] if i else None, teams=teams[:i % 3],
+    ))
+
+schema = UserSchema.get_jsonapi_resource_object_schema()()
+
+
+def dump_objects():
+    return schema.dump(users, many=True)
+
+
+def dump_batch():
+    return schema.dump_batch(users)
+
+
+assert dump_objects() == dump_batch()
+
+print('\n' + f' DUMP {ROWS} USERS (best of {REPEAT}) '.center(100, '=') + '\n')
+for name, func in (('objects', dump_objects), ('batch', dump_batch)):
+    best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print(f'{name:>10}: {best * 1000:8.1f} ms  {ROWS / best:12.0f} resources/s')
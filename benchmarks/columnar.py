@@ -0,0 +1,81 @@
+"""
+Compare `dump(many=True)` on row objects with `dump_columns` on the same data held as columns.
+
+Run from the repository root with ``python -m benchmarks.columnar``.
+"""
+
+import datetime as dt
+import timeit
+
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+ROWS = 10_000
+REPEAT = 5
+
+
+class UserRef:
+    def __init__(self, id: str):
+        self.id = id
+
+
+class User:
+    def __init__(self, id: str, name: str, email: str, created_at: dt.datetime, referrer_id: str = None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.created_at = created_at
+        self.referrer = UserRef(referrer_id) if referrer_id else None
+
+
+class UserSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'users'
+        self_url = '/api/v1/users/{id}'
+        self_url_kwargs = {'id': '<id>'}
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+    email = fields.Email()
+    created_at = fields.DateTime()
+
+    # relationships
+    referrer = RelationshipType(related_schema='UserSchema')
+
+
+now = dt.datetime(2022, 1, 1)
+columns = {
+    'id': [f'u{i}' for i in range(ROWS)],
+    'name': [f'User {i}' for i in range(ROWS)],
+    'email': [f'user-{i}@python.org' for i in range(ROWS)],
+    'created_at': [now + dt.timedelta(seconds=i) for i in range(ROWS)],
+    'referrer': [f'u{i - 1}' if i else None for i in range(ROWS)],
+}
+
+schema = UserSchema.get_jsonapi_resource_object_schema()()
+
+
+def dump_rows():
+    # building the row objects is part of the cost the columnar path avoids
+    users = [
+        User(*row) for row in zip(
+            columns['id'], columns['name'], columns['email'], columns['created_at'], columns['referrer'],
+        )
+    ]
+    return schema.dump(users, many=True)
+
+
+def dump_columns():
+    return schema.dump_columns(columns)
+
+
+assert dump_rows() == dump_columns()
+
+print('\n' + f' DUMP {ROWS} USERS (best of {REPEAT}) '.center(100, '=') + '\n')
+for name, func in (('rows', dump_rows), ('columns', dump_columns)):
+    best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+    print(f'{name:>10}: {best * 1000:8.1f} ms  {ROWS / best:12.0f} resources/s')
@@ -0,0 +1,91 @@
+"""
+Compare the size and the encode/decode time of the compact wire format (`mjapi.compact`) with plain `json`
+on a document of 10k users including their teams.
+
+Run from the repository root with ``python -m benchmarks.compact``.
+"""
+
+import datetime as dt
+import json
+import timeit
+
+from marshmallow import fields
+
+from mjapi import compact
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+ROWS = 10_000
+REPEAT = 5
+
+
+class Team:
+    def __init__(self, id: str, name: str):
+        self.id = id
+        self.name = name
+
+
+class User:
+    def __init__(self, id: str, name: str, email: str, created_at: dt.datetime, referrer: 'User' = None, teams=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.created_at = created_at
+
+        self.referrer = referrer
+        self.teams = teams
+
+
+class TeamSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'teams'
+        self_url = '/api/v1/teams/{id}'
+        self_url_kwargs = {'id': '<id>'}
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+
+
+class UserSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'users'
+        self_url = '/api/v1/users/{id}'
+        self_url_kwargs = {'id': '<id>'}
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+    email = fields.Email()
+    created_at = fields.DateTime()
+
+    # relationships
+    referrer = RelationshipType(related_schema='UserSchema')
+    teams = RelationshipType(related_schema=TeamSchema, many=True)
+
+
+now = dt.datetime(2022, 1, 1)
+teams = [Team(id=f't{i}', name=f'Team {i}') for i in range(100)]
+users = []
+for i in range(ROWS):
+    users.append(User(
+        id=f'u{i}', name=f'User {i}', email=f'user-{i}@python.org', created_at=now + dt.timedelta(seconds=i),
+        referrer=users[i - 1] if i else None, teams=teams[i % 100:i % 100 + 3],
+    ))
+
+document = UserSchema.get_jsonapi_top_level_schema(many=True)().dump(users, context={'to_include': ['teams']})
+json_payload = json.dumps(document, separators=(',', ':')).encode()
+compact_payload = compact.dumps(document)
+assert compact.loads(compact_payload) == document
+
+print('\n' + f' {ROWS} USERS DOCUMENT (best of {REPEAT}) '.center(100, '=') + '\n')
+print(f'{"format":>10}  {"size":>12}  {"encode":>10}  {"decode":>10}')
+for name, payload, encode, decode in (
+        ('json', json_payload, lambda: json.dumps(document, separators=(',', ':')).encode(), json.loads),
+        ('compact', compact_payload, lambda: compact.dumps(document), compact.loads),
+):
+    encode_time = min(timeit.repeat(encode, number=1, repeat=REPEAT))
+    decode_time = min(timeit.repeat(lambda: decode(payload), number=1, repeat=REPEAT))
+    print(f'{name:>10}  {len(payload):10d} B  {encode_time * 1000:7.1f} ms  {decode_time * 1000:7.1f} ms')
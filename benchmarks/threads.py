@@ -0,0 +1,89 @@
+"""
+Measure the throughput of a single shared top level schema instance dumping from several threads.
+
+Run from the repository root with ``python -m benchmarks.threads``. Scaling with the number
+of threads is only expected on free-threaded CPython builds (``python3.13t`` and later).
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+DUMPS_PER_THREAD = 200
+THREAD_COUNTS = (1, 2, 4, 8)
+
+
+class Team:
+    def __init__(self, id: str, name: str):
+        self.id = id
+        self.name = name
+
+
+class User:
+    def __init__(self, id: str, name: str, email: str, referrer: 'User' = None, teams=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.referrer = referrer
+        self.teams = teams
+
+
+class TeamSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'teams'
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+
+
+class UserSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'users'
+
+    id = fields.String()
+
+    # attributes
+    name = fields.String()
+    email = fields.Email()
+
+    # relationships
+    referrer = RelationshipType(related_schema='UserSchema')
+    teams = RelationshipType(related_schema=TeamSchema, many=True)
+
+
+teams = [Team(id=f't{i}', name=f'Team {i}') for i in range(5)]
+users = []
+for i in range(20):
+    users.append(User(
+        id=f'u{i}', name=f'User {i}', email=f'user-{i}@python.org',
+        referrer=users[-1] if users else None, teams=teams[:i % 5],
+    ))
+
+schema = UserSchema.get_jsonapi_top_level_schema(many=True)()
+context = {'to_include': {'referrer.teams'}}
+expected = schema.dump(users, context=context)
+
+
+def dump_many(_):
+    for _ in range(DUMPS_PER_THREAD):
+        assert schema.dump(users, context=context) == expected
+
+
+gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+print('\n' + f' SHARED SCHEMA THROUGHPUT (GIL {"enabled" if gil_enabled else "disabled"}) '.center(100, '=') + '\n')
+baseline = None
+for thread_count in THREAD_COUNTS:
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        start = time.perf_counter()
+        list(executor.map(dump_many, range(thread_count)))
+        elapsed = time.perf_counter() - start
+    throughput = thread_count * DUMPS_PER_THREAD / elapsed
+    baseline = baseline or throughput
+    print(f'{thread_count:>3} threads: {throughput:10.0f} documents/s  x{throughput / baseline:.2f}')
@@ -26,7 +26,8 @@ class User:
 
 
 class TeamSchema(JSONAPISchema):
-    type = 'teams'
+    class Meta:
+        type_ = 'teams'
 
     id = fields.String()
 
@@ -35,7 +36,8 @@ class TeamSchema(JSONAPISchema):
 
 
 class UserSchema(JSONAPISchema):
-    type = 'users'
+    class Meta:
+        type_ = 'users'
 
     id = fields.String()
 
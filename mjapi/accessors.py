@@ -0,0 +1,91 @@
+"""
+Accessor strategies used to read attributes from the serialized objects.
+
+Accessors have the signature of `marshmallow.utils.get_value`, ``(obj, attr, default)``,
+but are compiled once for a given attribute, skipping the generic lookup.
+"""
+
+import operator
+import typing as t
+
+from marshmallow.utils import get_value, missing
+
+from mjapi.state import DumpContextSchema
+
+Accessor = t.Callable[[t.Any, str, t.Any], t.Any]
+
+# read objects with `getattr`, supports dotted attribute names
+ATTRIBUTE = 'attribute'
+# read tuples (e.g. DB-API rows) by position, see ``Meta.row_fields``
+INDEX = 'index'
+# read mappings by key, supports dotted keys of nested mappings
+MAPPING = 'mapping'
+
+
+def _missing_accessor(obj, attr, default=missing):
+    return default
+
+
+def make_accessor(strategy: t.Optional[str], attr: str, row_fields: t.Optional[t.Sequence[str]] = None) -> Accessor:
+    """Compile the accessor of ``attr`` for the given strategy.
+
+    ``None`` uses marshmallow's generic `get_value`. The `INDEX` strategy reads the position
+    of ``attr`` in ``row_fields``, attributes not part of the row are always missing. Rows hold
+    the related objects of relationships like any other value: a flat foreign key column is not
+    a related object and is dumped as a linkage without ``id``, rows of foreign keys are to be
+    dumped with `dump_columns` instead.
+    """
+    if strategy is None:
+        return get_value
+    if strategy == ATTRIBUTE:
+        getter = operator.attrgetter(attr)
+
+        def attribute_accessor(obj, _attr, default=missing):
+            try:
+                return getter(obj)
+            except AttributeError:
+                return default
+
+        return attribute_accessor
+    if strategy == INDEX:
+        if not row_fields or attr not in row_fields:
+            return _missing_accessor
+        getter = operator.itemgetter(list(row_fields).index(attr))
+
+        def index_accessor(obj, _attr, default=missing):
+            try:
+                return getter(obj)
+            except IndexError:
+                return default
+
+        return index_accessor
+    if strategy == MAPPING:
+        if '.' in attr:
+            keys = attr.split('.')
+
+            def nested_mapping_accessor(obj, _attr, default=missing):
+                for key in keys:
+                    try:
+                        obj = obj[key]
+                    except (KeyError, IndexError, TypeError):
+                        return default
+                return obj
+
+            return nested_mapping_accessor
+
+        def mapping_accessor(obj, _attr, default=missing):
+            return obj.get(attr, default)
+
+        return mapping_accessor
+    raise ValueError(f'Unknown accessor strategy {strategy!r}')
+
+
+class AccessorSchema(DumpContextSchema):
+    """Schema reading the attributes listed in ``accessors`` through their compiled accessor."""
+    accessors: t.Dict[str, Accessor] = {}
+
+    def get_attribute(self, obj: t.Any, attr: str, default: t.Any):
+        accessor = self.accessors.get(attr)
+        if accessor is None:
+            return super().get_attribute(obj, attr, default)
+        return accessor(obj, attr, default)
@@ -0,0 +1,58 @@
+"""
+Dumps of several independent documents sharing the serialized resources.
+
+Batch endpoints and gateways dump many documents per request, often relating to the same
+resources. `dump_documents` runs the jobs with one top-level schema instance per schema,
+``many`` and ``only``, and one ``resource_memo`` of the resources serialized by any of the
+jobs, so each related resource is serialized once per schema for the whole batch. The
+documents share the memoized resource dicts, they are to be treated as read-only. Memoized
+resources can also be pre-serialized `mjapi.raw.RawJSON` resources, e.g. from a cache.
+"""
+
+import typing as t
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+# (schema class, type, id)
+ResourceKey = t.Tuple[t.Type['JSONAPISchema'], str, str]
+
+
+class DumpJob(t.NamedTuple):
+    schema_cls: t.Type['JSONAPISchema']
+    obj: t.Any
+    many: bool = False
+    only: t.Optional[t.Sequence[str]] = None
+    to_include: t.Sequence[str] = ()
+
+
+def dump_documents(
+        jobs: t.Iterable[DumpJob], *, context: t.Optional[t.Mapping[str, t.Any]] = None,
+        memo: t.Optional[t.MutableMapping[ResourceKey, dict]] = None,
+) -> t.List[dict]:
+    """Dump the top-level document of each job, in order.
+
+    ``context`` is the schema context of all the jobs. ``memo`` maps ``(schema class, type, id)``
+    to the serialized resources, it can be passed to share resources with another batch.
+    The primary resources of the jobs without ``only`` are memoized as well, as they are
+    serialized like included resources.
+    """
+    memo = {} if memo is None else memo
+    schema_classes = {}
+    schemas = {}
+    documents = []
+    for job in jobs:
+        schema_key = (job.schema_cls, job.many, tuple(job.only) if job.only is not None else None)
+        schema = schemas.get(schema_key)
+        if schema is None:
+            schema_cls = schema_classes.get(schema_key[:2])
+            if schema_cls is None:
+                schema_cls = schema_classes[schema_key[:2]] = job.schema_cls.get_jsonapi_top_level_schema(job.many)
+            schema = schemas[schema_key] = schema_cls(only=job.only, context=dict(context or {}))
+        document = schema.dump(job.obj, context={'to_include': job.to_include, 'resource_memo': memo})
+        if job.only is None and 'data' in document:
+            for resource in (document['data'] if job.many else [document['data']]):
+                if isinstance(resource, dict):
+                    memo.setdefault((job.schema_cls, resource['type'], resource['id']), resource)
+        documents.append(document)
+    return documents
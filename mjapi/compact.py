@@ -0,0 +1,257 @@
+"""
+Compact wire format of JSON API documents, for service-to-service traffic.
+
+The resources of ``data`` and ``included`` are grouped into blocks of the same type and
+members, each block holding the member names once and the values in columns:
+
+* attributes, one column per attribute,
+* relationships, one column per relationship, resource identifiers being ``[type, id]``
+  pairs of indexes in the shared string table (a list of pairs for to-many relationships),
+* resource links, one column per link, URLs being ``[prefix, rest]`` with the prefix up to
+  the last ``/`` in the string table.
+
+Types, ids and link prefixes are stored once in the string table. Members not fitting the
+columns (e.g. ``meta``, relationship ``links``) are kept as is, as well as the top-level
+members other than ``data`` and ``included``. `decode` rebuilds a document equal to the
+encoded one, only the order of the members of resource objects may differ.
+"""
+
+import json
+import typing as t
+
+from mjapi import raw
+
+VERSION = 1
+
+# member names of the compact document
+STRINGS = 's'
+BLOCKS = 'b'
+DATA = 'd'
+DATA_SINGLE = 'd1'
+INCLUDED = 'i'
+OTHER = 'o'
+
+# member names of the blocks
+BLOCK_TYPE = 't'
+BLOCK_ATTRIBUTE_KEYS = 'ak'
+BLOCK_RELATIONSHIP_KEYS = 'rk'
+BLOCK_LINK_KEYS = 'lk'
+BLOCK_IDS = 'id'
+BLOCK_ATTRIBUTES = 'a'
+BLOCK_RELATIONSHIPS = 'r'
+BLOCK_LINKS = 'l'
+BLOCK_EXTRA = 'x'
+
+RESOURCE_COLUMNS = ('type', 'id', 'attributes', 'relationships', 'links')
+
+
+def _is_resource(value: t.Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get('type'), str)
+
+
+def _is_identifier(value: t.Any) -> bool:
+    return (
+        isinstance(value, dict) and len(value) == 2
+        and isinstance(value.get('type'), str) and isinstance(value.get('id'), str)
+    )
+
+
+def _is_linkage_only(relationship: t.Any) -> bool:
+    """Whether ``relationship`` only holds a linkage of resource identifiers, encoded in columns."""
+    if not isinstance(relationship, dict) or relationship.keys() != {'data'}:
+        return False
+    linkage = relationship['data']
+    if isinstance(linkage, list):
+        return all(_is_identifier(identifier) for identifier in linkage)
+    return linkage is None or _is_identifier(linkage)
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings: t.List[str] = []
+        self.string_indexes: t.Dict[str, int] = {}
+        self.blocks: t.List[dict] = []
+        self.block_indexes: t.Dict[tuple, int] = {}
+
+    def intern(self, value: str) -> int:
+        index = self.string_indexes.get(value)
+        if index is None:
+            index = self.string_indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def encode_link(self, url: str) -> list:
+        prefix, slash, rest = url.rpartition('/')
+        return [self.intern(prefix + slash), rest]
+
+    def encode_relationship(self, relationship: dict) -> t.Any:
+        if not _is_linkage_only(relationship):
+            # other relationship objects are kept as is
+            return {'~': relationship}
+        linkage = relationship['data']
+        if linkage is None:
+            return None
+        if isinstance(linkage, list):
+            return [[self.intern(identifier['type']), self.intern(identifier['id'])] for identifier in linkage]
+        return [self.intern(linkage['type']), self.intern(linkage['id'])]
+
+    def add_resource(self, resource: dict) -> t.Tuple[int, int]:
+        """Add ``resource`` to the block of its shape, return the block and the row of the resource."""
+        attributes = resource.get('attributes')
+        relationships = resource.get('relationships')
+        links = resource.get('links')
+        if attributes is not None and not isinstance(attributes, dict):
+            attributes = None
+        if relationships is not None and not isinstance(relationships, dict):
+            relationships = None
+        if links is not None and not (isinstance(links, dict) and all(isinstance(v, str) for v in links.values())):
+            links = None
+        extra = {
+            key: value for key, value in resource.items()
+            if key not in RESOURCE_COLUMNS
+            or (key == 'id' and not isinstance(value, str))
+            or (key == 'attributes' and attributes is None)
+            or (key == 'relationships' and relationships is None)
+            or (key == 'links' and links is None)
+        }
+        resource_id = resource.get('id') if 'id' not in extra else None
+
+        shape = (
+            resource['type'],
+            tuple(attributes) if attributes is not None else None,
+            tuple(relationships) if relationships is not None else None,
+            tuple(links) if links is not None else None,
+        )
+        block_index = self.block_indexes.get(shape)
+        if block_index is None:
+            block_index = self.block_indexes[shape] = len(self.blocks)
+            type_, attribute_keys, relationship_keys, link_keys = shape
+            block = {BLOCK_TYPE: self.intern(type_), BLOCK_IDS: []}
+            if attribute_keys is not None:
+                block[BLOCK_ATTRIBUTE_KEYS] = list(attribute_keys)
+                block[BLOCK_ATTRIBUTES] = [[] for _ in attribute_keys]
+            if relationship_keys is not None:
+                block[BLOCK_RELATIONSHIP_KEYS] = list(relationship_keys)
+                block[BLOCK_RELATIONSHIPS] = [[] for _ in relationship_keys]
+            if link_keys is not None:
+                block[BLOCK_LINK_KEYS] = list(link_keys)
+                block[BLOCK_LINKS] = [[] for _ in link_keys]
+            self.blocks.append(block)
+        block = self.blocks[block_index]
+
+        row = len(block[BLOCK_IDS])
+        block[BLOCK_IDS].append(self.intern(resource_id) if resource_id is not None else None)
+        if attributes is not None:
+            for column, value in zip(block[BLOCK_ATTRIBUTES], attributes.values()):
+                column.append(value)
+        if relationships is not None:
+            for column, value in zip(block[BLOCK_RELATIONSHIPS], relationships.values()):
+                column.append(self.encode_relationship(value))
+        if links is not None:
+            for column, value in zip(block[BLOCK_LINKS], links.values()):
+                column.append(self.encode_link(value))
+        if extra:
+            block.setdefault(BLOCK_EXTRA, {})[str(row)] = extra
+        return block_index, row
+
+    def add_resources(self, resources: t.Iterable[dict]) -> t.List[t.List[int]]:
+        """Add ``resources``, return their order as runs of ``[block, first row, count]``."""
+        runs = []
+        for resource in resources:
+            block_index, row = self.add_resource(resource)
+            if runs and runs[-1][0] == block_index and runs[-1][1] + runs[-1][2] == row:
+                runs[-1][2] += 1
+            else:
+                runs.append([block_index, row, 1])
+        return runs
+
+
+def encode(document: t.Mapping[str, t.Any]) -> dict:
+    """Encode a JSON API ``document`` into its compact representation, itself serializable to JSON."""
+    encoder = _Encoder()
+    ret = {'v': VERSION}
+    other = {}
+    for key, value in document.items():
+        if key == 'data' and _is_resource(value):
+            ret[DATA] = encoder.add_resources([value])
+            ret[DATA_SINGLE] = 1
+        elif key == 'data' and isinstance(value, list) and all(_is_resource(item) for item in value):
+            ret[DATA] = encoder.add_resources(value)
+        elif key == 'included' and isinstance(value, list) and all(_is_resource(item) for item in value):
+            ret[INCLUDED] = encoder.add_resources(value)
+        else:
+            other[key] = value
+    ret[STRINGS] = encoder.strings
+    ret[BLOCKS] = encoder.blocks
+    if other:
+        ret[OTHER] = other
+    return ret
+
+
+def _decode_relationship(value: t.Any, strings: t.List[str]) -> dict:
+    if value is None:
+        return {'data': None}
+    if isinstance(value, dict):
+        return value['~']
+    if value and isinstance(value[0], int):
+        return {'data': {'type': strings[value[0]], 'id': strings[value[1]]}}
+    return {'data': [{'type': strings[type_], 'id': strings[id_]} for type_, id_ in value]}
+
+
+def _decode_block(block: dict, strings: t.List[str]) -> t.List[dict]:
+    type_ = strings[block[BLOCK_TYPE]]
+    ids = block[BLOCK_IDS]
+    resources = [{'type': type_} if id_ is None else {'type': type_, 'id': strings[id_]} for id_ in ids]
+    if BLOCK_ATTRIBUTE_KEYS in block:
+        attribute_keys = block[BLOCK_ATTRIBUTE_KEYS]
+        for resource, values in zip(resources, zip(*block[BLOCK_ATTRIBUTES]) if attribute_keys else ()):
+            resource['attributes'] = dict(zip(attribute_keys, values))
+        if not attribute_keys:
+            for resource in resources:
+                resource['attributes'] = {}
+    if BLOCK_RELATIONSHIP_KEYS in block:
+        relationship_keys = block[BLOCK_RELATIONSHIP_KEYS]
+        for resource in resources:
+            resource['relationships'] = {}
+        for key, column in zip(relationship_keys, block[BLOCK_RELATIONSHIPS]):
+            for resource, value in zip(resources, column):
+                resource['relationships'][key] = _decode_relationship(value, strings)
+    if BLOCK_LINK_KEYS in block:
+        for resource in resources:
+            resource['links'] = {}
+        for key, column in zip(block[BLOCK_LINK_KEYS], block[BLOCK_LINKS]):
+            for resource, (prefix, rest) in zip(resources, column):
+                resource['links'][key] = strings[prefix] + rest
+    for row, extra in block.get(BLOCK_EXTRA, {}).items():
+        resources[int(row)].update(extra)
+    return resources
+
+
+def decode(compact: t.Mapping[str, t.Any]) -> dict:
+    """Decode the compact representation of a document back into the JSON API document."""
+    if compact.get('v') != VERSION:
+        raise ValueError(f'Unsupported compact document version: {compact.get("v")!r}.')
+    strings = compact[STRINGS]
+    blocks = [_decode_block(block, strings) for block in compact[BLOCKS]]
+
+    def resources(runs):
+        return [resource for block, start, count in runs for resource in blocks[block][start:start + count]]
+
+    ret = {}
+    if DATA in compact:
+        data = resources(compact[DATA])
+        ret['data'] = data[0] if compact.get(DATA_SINGLE) else data
+    if INCLUDED in compact:
+        ret['included'] = resources(compact[INCLUDED])
+    ret.update(compact.get(OTHER, {}))
+    return ret
+
+
+def dumps(document: t.Mapping[str, t.Any]) -> bytes:
+    """Encode ``document`` into compact JSON bytes."""
+    return raw.dumps(encode(document), separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def loads(payload: t.Union[bytes, str]) -> dict:
+    """Decode compact JSON bytes into the JSON API document."""
+    return decode(json.loads(payload))
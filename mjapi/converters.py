@@ -0,0 +1,42 @@
+"""
+Batch converters serializing the values of a field for a whole batch of objects in one loop.
+
+Converters receive the field and the list of values, `None` included, and return the list
+of serialized values. They resolve the field configuration (e.g. the ``DateTime`` format)
+once per batch instead of once per value.
+"""
+
+import typing as t
+
+from marshmallow import fields, utils
+
+BatchConverter = t.Callable[[fields.Field, t.List[t.Any]], t.List[t.Any]]
+
+
+def convert_strings(field: fields.String, values: t.List[t.Any]) -> t.List[t.Optional[str]]:
+    ensure_text_type = utils.ensure_text_type
+    return [
+        value if type(value) is str else (None if value is None else ensure_text_type(value))
+        for value in values
+    ]
+
+
+def convert_datetimes(field: fields.DateTime, values: t.List[t.Any]) -> t.List[t.Optional[str]]:
+    data_format = field.format or field.DEFAULT_FORMAT
+    format_func = field.SERIALIZATION_FUNCS.get(data_format)
+    if format_func is None:
+        return [None if value is None else value.strftime(data_format) for value in values]
+    return [None if value is None else format_func(value) for value in values]
+
+
+# converters per exact field class, subclasses may override `_serialize`
+BATCH_CONVERTERS: t.Dict[t.Type[fields.Field], BatchConverter] = {
+    fields.String: convert_strings,
+    fields.Email: convert_strings,
+    fields.DateTime: convert_datetimes,
+}
+
+
+def get_batch_converter(field: fields.Field) -> t.Optional[BatchConverter]:
+    """Return the batch converter of ``field``, `None` when it is serialized value by value."""
+    return BATCH_CONVERTERS.get(type(field))
@@ -0,0 +1,29 @@
+"""
+Helpers for the incremental (delta) serialization of resource objects.
+"""
+
+import copy
+import typing as t
+
+
+def apply_delta(snapshot: t.Optional[t.Mapping[str, t.Any]], delta: t.Optional[t.Mapping[str, t.Any]]) -> dict:
+    """Return a copy of the ``snapshot`` of a resource object updated with a ``delta``
+    produced by ``dump_delta``, e.g. to keep a cached snapshot up to date.
+    """
+    ret = copy.deepcopy(dict(snapshot or {}))
+    if not delta:
+        return ret
+    ret['id'] = delta['id']
+    ret['type'] = delta['type']
+    if delta.get('attributes'):
+        ret.setdefault('attributes', {}).update(copy.deepcopy(delta['attributes']))
+    for rel_name, rel_data in delta.get('relationships', {}).items():
+        relationships = ret.setdefault('relationships', {})
+        if rel_data['data'] is None:
+            # empty to-one relationships are not serialized
+            relationships.pop(rel_name, None)
+        else:
+            relationships.setdefault(rel_name, {})['data'] = copy.deepcopy(rel_data['data'])
+    if 'relationships' in ret and not ret['relationships']:
+        del ret['relationships']
+    return ret
@@ -0,0 +1,74 @@
+"""
+Canonical content digests of JSON API documents, used to build ETags.
+"""
+
+import hashlib
+import json
+import typing as t
+
+
+def canonical_json(value: t.Any) -> bytes:
+    """Encode ``value`` into a canonical JSON representation (sorted keys, no whitespace)."""
+    return json.dumps(
+        value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str,
+    ).encode()
+
+
+def resource_digest(resource: t.Mapping[str, t.Any]) -> bytes:
+    """Return the digest of a single serialized resource object."""
+    return hashlib.sha256(canonical_json(resource)).digest()
+
+
+class DocumentDigest:
+    """Accumulates resource digests while a document is dumped and combines them, in
+    document order, into the digest of the whole document.
+
+    ``cache`` is an optional mutable mapping, shared between dumps, of
+    ``(type, id, version, only)`` keys to resource digests. It is only used for
+    resources whose schema defines ``Meta.digest_version``.
+    """
+
+    def __init__(self, cache: t.Optional[t.MutableMapping[tuple, bytes]] = None):
+        self.cache = cache
+        self._resource_digests: t.Dict[int, bytes] = {}
+
+    def add_resource(self, resource: t.Mapping[str, t.Any], cache_key: t.Optional[tuple] = None) -> bytes:
+        """Compute, or reuse from the cache, the digest of a dumped ``resource``."""
+        digest = None
+        if cache_key is not None and self.cache is not None:
+            digest = self.cache.get(cache_key)
+        if digest is None:
+            digest = resource_digest(resource)
+            if cache_key is not None and self.cache is not None:
+                self.cache[cache_key] = digest
+        # resources are tracked by identity, they are kept alive by the dumped document
+        self._resource_digests[id(resource)] = digest
+        return digest
+
+    def get_resource_digest(self, resource: t.Mapping[str, t.Any]) -> bytes:
+        digest = self._resource_digests.get(id(resource))
+        if digest is None:
+            digest = resource_digest(resource)
+        return digest
+
+    def hexdigest(self, document: t.Mapping[str, t.Any]) -> str:
+        """Combine the digests of the resources in ``document`` with its other members."""
+        data = document.get('data')
+        other_members = {
+            key: value for key, value in document.items() if key not in ('data', 'included')
+        }
+        document_hash = hashlib.sha256(canonical_json(other_members))
+        if isinstance(data, list):
+            document_hash.update(b'[')
+            resources = data
+        elif data is not None:
+            document_hash.update(b'{')
+            resources = [data]
+        else:
+            resources = []
+        for resource in resources:
+            document_hash.update(self.get_resource_digest(resource))
+        document_hash.update(b'|')
+        for resource in document.get('included', ()):
+            document_hash.update(self.get_resource_digest(resource))
+        return document_hash.hexdigest()
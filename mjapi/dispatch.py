@@ -0,0 +1,66 @@
+"""
+Dispatch of objects and resource types to the schemas of polymorphic relationships and collections.
+"""
+
+import typing as t
+
+from marshmallow import Schema
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+
+class SchemaDispatcher:
+    """Table of the JSON API schemas serializing a set of resource types.
+
+    Objects are dispatched on their class, matched against the ``Meta.model`` of the schemas
+    along the class MRO once, then cached per class. Resource objects are dispatched on their
+    ``type``. A single schema serializes every object, without requiring ``Meta.model``.
+    """
+
+    def __init__(self, schema_classes: t.Sequence[t.Type['JSONAPISchema']]):
+        self.schema_classes = list(schema_classes)
+        self.types = [schema_cls.opts.type_ for schema_cls in self.schema_classes]
+        self.by_type = dict(zip(self.types, self.schema_classes))
+        self.by_model = {
+            schema_cls.opts.model: schema_cls for schema_cls in self.schema_classes if schema_cls.opts.model
+        }
+        self._by_class: t.Dict[type, t.Type['JSONAPISchema']] = {}
+        self._id_serializers: t.Dict[t.Type['JSONAPISchema'], t.Callable[[t.Any], str]] = {}
+        self._resource_schemas: t.Dict[t.Type['JSONAPISchema'], Schema] = {}
+
+    def get_schema_cls(self, obj: t.Any) -> t.Type['JSONAPISchema']:
+        """Return the schema serializing ``obj``."""
+        obj_cls = type(obj)
+        schema_cls = self._by_class.get(obj_cls)
+        if schema_cls is None:
+            if len(self.schema_classes) == 1:
+                schema_cls = self.schema_classes[0]
+            else:
+                schema_cls = next((self.by_model[base] for base in obj_cls.__mro__ if base in self.by_model), None)
+                if schema_cls is None:
+                    raise TypeError(f'No schema of types {self.types} serializes {obj_cls.__name__} objects.')
+            self._by_class[obj_cls] = schema_cls
+        return schema_cls
+
+    def get_id(self, obj: t.Any, schema_cls: t.Optional[t.Type['JSONAPISchema']] = None) -> str:
+        """Return the serialized id of ``obj``."""
+        schema_cls = schema_cls or self.get_schema_cls(obj)
+        serialize_id = self._id_serializers.get(schema_cls)
+        if serialize_id is None:
+            id_field = schema_cls._declared_fields['id']
+            id_accessor = schema_cls.get_accessor(id_field.attribute or 'id')
+            serialize_id = self._id_serializers[schema_cls] = lambda obj: id_field.serialize('id', obj, id_accessor)
+        return serialize_id(obj)
+
+    def get_key(self, obj: t.Any) -> t.Tuple[str, str]:
+        """Return the ``(type, id)`` of ``obj``."""
+        schema_cls = self.get_schema_cls(obj)
+        return schema_cls.opts.type_, self.get_id(obj, schema_cls)
+
+    def get_resource_schema(self, schema_cls: t.Type['JSONAPISchema']) -> Schema:
+        """Return the cached resource object schema instance of ``schema_cls``."""
+        resource_schema = self._resource_schemas.get(schema_cls)
+        if resource_schema is None:
+            resource_schema = self._resource_schemas[schema_cls] = schema_cls.get_jsonapi_resource_object_schema()()
+        return resource_schema
@@ -0,0 +1,44 @@
+"""
+Conversion of marshmallow validation errors into JSON API error objects.
+"""
+
+import typing as t
+
+from marshmallow import ValidationError
+from marshmallow.exceptions import SCHEMA
+
+VALIDATION_ERROR_STATUS = '422'
+
+
+def escape_pointer_token(token: t.Union[str, int]) -> str:
+    """Escape a reference token of a JSON pointer (RFC 6901)."""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def validation_error_objects(
+        error: ValidationError, *, status: str = VALIDATION_ERROR_STATUS, pointer: str = '',
+) -> t.List[dict]:
+    """Convert ``error`` into a list of error objects, one per message, in a single walk of its messages.
+
+    The ``source.pointer`` of each error object points to the invalid member of the document
+    (e.g. ``/data/attributes/email``), the messages nested under the keys of the generated
+    schemas being located where the members are in the document. ``pointer`` prefixes
+    the pointers, e.g. ``/data`` for the errors of a resource object schema.
+    """
+    ret = []
+    stack = [(error.messages, pointer)]
+    while stack:
+        messages, messages_pointer = stack.pop()
+        if isinstance(messages, dict):
+            # reversed to emit the errors in the order of the messages
+            for key, value in reversed(list(messages.items())):
+                if key == SCHEMA:
+                    stack.append((value, messages_pointer))
+                else:
+                    stack.append((value, f'{messages_pointer}/{escape_pointer_token(key)}'))
+        elif isinstance(messages, (list, tuple)):
+            for message in reversed(messages):
+                stack.append((message, messages_pointer))
+        else:
+            ret.append({'status': status, 'detail': str(messages), 'source': {'pointer': messages_pointer}})
+    return ret
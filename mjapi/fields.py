@@ -1,44 +1,114 @@
+import itertools
+import time
 import typing as t
+from collections.abc import Mapping
 
-from marshmallow import Schema, SchemaOpts, fields, validate
+from marshmallow import Schema, SchemaOpts, ValidationError, fields, validate, validates_schema
 from marshmallow.class_registry import get_class
+from marshmallow.utils import get_value, missing
 
-from mjapi.links import LinksSchema, generate_url, resolve_params
+from mjapi.accessors import Accessor, AccessorSchema
+from mjapi.dispatch import SchemaDispatcher
+from mjapi.errors import validation_error_objects
+from mjapi.links import LinksSchema, compile_params, resolve_params
+from mjapi.raw import RawJSON
+from mjapi.state import DumpContextSchema, DumpState, dump_state, get_dump_state
 
 if t.TYPE_CHECKING:
     from mjapi.schemas import JSONAPISchema
 
+SchemaRef = t.Union[t.Type['JSONAPISchema'], str]
+BatchLoader = t.Callable[[t.List[str]], t.Mapping[str, t.Any]]
+
+
+class LocalId(t.NamedTuple):
+    """ Reference to a resource identified by a local id (``lid``) in the loaded document. """
+    type: str
+    lid: str
+
+
+class LinkageSchema(AccessorSchema):
+    """ Resource identifier, with an ``id`` or a local id (``lid``). """
+
+    @validates_schema(skip_on_field_errors=False)
+    def validate_identifier(self, data: dict, **kwargs):
+        if 'id' not in data and 'lid' not in data:
+            raise ValidationError(self.fields['id'].error_messages['required'], 'id')
+
 
 class RelationshipType(fields.String):
+    """ Relationship to resources of ``related_schema``.
+
+    ``batch_loader`` is an optional callable receiving a list of related ids and returning
+    a mapping of id to related object. When set, top level documents load the related
+    objects instead of the ids, with a single call per related type for the whole document.
+
+    Large to-many relationships can be bounded when dumping: ``linkage_limit`` serializes
+    at most that many related resources in ``data`` (slicing the related collection, which
+    e.g. ORM queries turn into a ``LIMIT``), ``count`` is a callable receiving the parent
+    object and returning the number of related resources, emitted as ``meta.count``,
+    and ``linkage=False`` leaves out ``data`` without reading the related attribute.
+    The ``related`` link then points to the complete collection.
+
+    ``related_schema`` can be a list of schemas for polymorphic relationships, the related objects
+    being dispatched on the ``Meta.model`` of the schemas (see `mjapi.dispatch.SchemaDispatcher`).
+    Polymorphic relationships load ``(type, id)`` pairs and their ``batch_loader`` is a mapping
+    of resource type to loader.
+    """
     links_object_schema: t.Type[Schema] = LinksSchema
 
+    default_error_messages = {'not_found': 'Related resource not found.'}
+
     def __init__(
-            self, *, related_schema: t.Union[t.Type['JSONAPISchema'], str],
+            self, *, related_schema: t.Union[SchemaRef, t.Sequence[SchemaRef]],
             many: bool = False, id_field: str = '',
             related_url: str = '', related_url_kwargs: t.Optional[dict] = None,
             self_url: str = '', self_url_kwargs: t.Optional[dict] = None,
+            batch_loader: t.Union[BatchLoader, t.Mapping[str, BatchLoader], None] = None,
+            linkage: bool = True, linkage_limit: t.Optional[int] = None,
+            count: t.Optional[t.Callable[[t.Any], int]] = None,
             **kwargs,
     ):
         self.related_schema = related_schema
+        self.polymorphic = isinstance(related_schema, (list, tuple))
         self.many = many
         self.id_field = id_field
         self.related_url = related_url
         self.related_url_kwargs = related_url_kwargs
         self.self_url = self_url
         self.self_url_kwargs = self_url_kwargs
+        self.batch_loader = batch_loader
+        self.linkage = linkage
+        self.linkage_limit = linkage_limit
+        self.count = count
 
-        self._related_schema_cls = None
+        self._related_schema_classes = None
+        self._dispatcher = None
         self._related_jsonapi_schema_cls = None
+        self._related_id_accessor = None
         super().__init__(**kwargs)
 
     @property
-    def related_schema_cls(self) -> 'JSONAPISchema':
-        if not self._related_schema_cls:
-            if isinstance(self.related_schema, str):
-                self._related_schema_cls = get_class(self.related_schema)
-            else:
-                self._related_schema_cls = self.related_schema
-        return self._related_schema_cls
+    def related_schema_classes(self) -> t.List[t.Type['JSONAPISchema']]:
+        if self._related_schema_classes is None:
+            self._related_schema_classes = [
+                get_class(related_schema) if isinstance(related_schema, str) else related_schema
+                for related_schema in (self.related_schema if self.polymorphic else [self.related_schema])
+            ]
+        return self._related_schema_classes
+
+    @property
+    def related_schema_cls(self) -> t.Type['JSONAPISchema']:
+        if self.polymorphic:
+            raise TypeError('Polymorphic relationships have several related schemas, see `related_schema_classes`.')
+        return self.related_schema_classes[0]
+
+    @property
+    def dispatcher(self) -> SchemaDispatcher:
+        """ Dispatch table of the related objects to their schema. """
+        if self._dispatcher is None:
+            self._dispatcher = SchemaDispatcher(self.related_schema_classes)
+        return self._dispatcher
 
     @property
     def related_jsonapi_schema_cls(self):
@@ -46,70 +116,116 @@ class RelationshipType(fields.String):
             self._related_jsonapi_schema_cls = self.related_schema_cls.get_jsonapi_resource_object_schema()
         return self._related_jsonapi_schema_cls
 
-    def get_jsonapi_relationship_schema(self, relationship_name: str) -> t.Type[Schema]:
-        relationship = {
-            'id': fields.String(required=True),  # use self to preserve parameters defined on the initial schema
-            'type': fields.String(
-                dump_default=self.related_schema_cls.Meta.type_,
-                required=True,
-                validate=validate.Equal(self.related_schema_cls.Meta.type_, error='Invalid `type` specified'),
-            ),
-        }
+    @property
+    def related_id_accessor(self) -> Accessor:
+        if not self._related_id_accessor:
+            id_field = self.related_schema_cls._declared_fields['id']
+            self._related_id_accessor = self.related_schema_cls.get_accessor(id_field.attribute or 'id')
+        return self._related_id_accessor
 
-        data_field = fields.Nested(Schema.from_dict(relationship), required=True, allow_none=self.allow_none)
+    def get_jsonapi_relationship_schema(
+            self, relationship_name: str, parent_schema_cls: t.Optional[t.Type['JSONAPISchema']] = None,
+            local_ids: bool = False,
+    ) -> t.Type[Schema]:
+        """ Build the relationship object schema. With ``local_ids``, resource identifiers can have
+        a local id (``lid``) instead of an ``id``, loaded as `LocalId`.
+        """
+        if local_ids:
+            identifier = {'id': fields.String(), 'lid': fields.String(load_only=True)}
+            linkage_schema_base = LinkageSchema
+        else:
+            identifier = {'id': fields.String(required=True)}
+            linkage_schema_base = AccessorSchema
+        if self.polymorphic:
+            dispatcher = self.dispatcher
+            relationship = {
+                **identifier,
+                'type': fields.String(
+                    required=True, validate=validate.OneOf(dispatcher.types, error='Invalid `type` specified'),
+                ),
+            }
+            linkage_schema_cls = linkage_schema_base.from_dict(relationship)
+            linkage_schema_cls.accessors = {
+                'id': lambda obj, attr, default: dispatcher.get_id(obj),
+                'type': lambda obj, attr, default: dispatcher.get_schema_cls(obj).opts.type_,
+            }
+        else:
+            relationship = {
+                **identifier,
+                'type': fields.String(
+                    dump_default=self.related_schema_cls.Meta.type_,
+                    required=True,
+                    validate=validate.Equal(self.related_schema_cls.Meta.type_, error='Invalid `type` specified'),
+                ),
+            }
+            linkage_schema_cls = linkage_schema_base.from_dict(relationship)
+            linkage_schema_cls.accessors = {'id': self.related_id_accessor}
+            if self.related_schema_cls.opts.accessor:
+                # `type` is always dumped from its default
+                linkage_schema_cls.accessors['type'] = lambda obj, attr, default: default
+
+        # link parameters are read from the parent object
+        get_parent_accessor = parent_schema_cls.get_accessor if parent_schema_cls else lambda attr: get_value
+        resolve_related_url_params = compile_params(self.related_url_kwargs or {}, get_parent_accessor)
+        resolve_self_url_params = compile_params(self.self_url_kwargs or {}, get_parent_accessor)
+
+        get_related = prefetched(get_parent_accessor(self.attribute or relationship_name))
+
+        data_field = fields.Nested(linkage_schema_cls, required=True, allow_none=self.allow_none)
         if self.many:
             data_field = fields.List(data_field)
+        if not self.linkage:
+            data_field.load_only = True
 
-        class RelationshipSchema(Schema):
+        class RelationshipSchema(DumpContextSchema):
             data = data_field
             links = fields.Nested(self.links_object_schema)
+            meta = fields.Dict(dump_only=True)
 
             class Meta(SchemaOpts):
                 register = False
 
             def get_attribute(schema_self, obj, attr, default):
                 """ Overwrite to handle included data. """
-                # handle included data
-                if relationship_name in schema_self.context.get('to_include', set()):
-                    # serialize related object
-                    obj_many = obj
-                    if not self.many:
-                        obj_many = [obj_many]
-                    for rel_obj in obj_many:
-                        new_context = schema_self.context.copy()
-                        new_context.pop('parent_obj', None)
-                        included_repr = self.related_jsonapi_schema_cls(
-                            context=new_context,
-                        ).dump(rel_obj)
-                        # add to already included data from context
-                        included_data = schema_self.context.setdefault('included_data', {})
-                        included_data[(included_repr['type'], included_repr['id'])] = included_repr
                 if attr == 'data':
+                    obj = self.limit_linkage(obj)
+                    state = get_dump_state()
+                    if state is not None and relationship_name in state.to_include:
+                        self.include_related(obj, state)
                     return obj
+                elif attr == 'meta':
+                    return default
                 return super().get_attribute(obj, attr, default)
 
             def load(schema_self, *args, **kwargs):
                 """ Overwrite to flatten data. """
                 ret = super().load(*args, **kwargs)
                 if self.many:
-                    ret = [related_item['id'] for related_item in ret['data']]
+                    ret = [self.get_related_key(related_item) for related_item in ret['data']]
                 else:
                     if ret['data']:
-                        ret = ret['data'].get('id')
+                        ret = self.get_related_key(ret['data'])
                     else:
                         ret = None
                 return ret
 
             def dump(schema_self, *args, **kwargs):
                 """ Override to handle links. """
-                ret = super().dump(*args, **kwargs)
+                with dump_state(schema_self.context) as state:
+                    ret = super().dump(*args, **kwargs)
+                    parent_obj = state.parent_obj
+                    if not self.linkage and relationship_name in state.to_include:
+                        related = get_related(parent_obj, relationship_name, None)
+                        self.include_related(self.limit_linkage(related), state)
+                if self.count:
+                    ret['meta'] = {**ret.get('meta', {}), 'count': self.count(parent_obj)}
                 rel_links = {}
                 if self.related_url:
-                    related_url = self.get_related_url(schema_self.context['parent_obj'])
+                    related_url = self.format_url(self.related_url, resolve_related_url_params(parent_obj))
                     if related_url:
                         rel_links['related'] = related_url
                 if self.self_url:
-                    self_url = self.get_self_url(schema_self.context['parent_obj'])
+                    self_url = self.format_url(self.self_url, resolve_self_url_params(parent_obj))
                     if self_url:
                         rel_links['self'] = self_url
                 if rel_links:
@@ -118,22 +234,278 @@ class RelationshipType(fields.String):
 
         return RelationshipSchema
 
+    def include_related(self, obj: t.Any, state: DumpState):
+        """Serialize the related object(s) into the included data of the dump ``state``.
+
+        Included resources are keyed by ``(type, id)`` before being serialized, so each one
+        is serialized once, cycles are not followed and primary resources are skipped.
+        The ``include_limits`` of the dump can bound the expansion with ``max_included``
+        resources, ``max_depth`` and ``max_time`` (seconds), the resources skipped because
+        of a limit are counted per limit in ``include_truncated``.
+
+        Resources found in the ``resource_memo`` of the dump, keyed by ``(schema class, type, id)``,
+        are reused instead of being serialized again, only their relationships to include are followed.
+        """
+        included_data = state.included_data
+        limits = state.include_limits
+        max_included = limits.get('max_included')
+        max_depth = limits.get('max_depth')
+        if limits.get('max_time') is not None and state.include_deadline is None:
+            state.include_deadline = time.monotonic() + limits['max_time']
+        deadline = state.include_deadline
+        depth = state.include_depth + 1
+        dispatcher = self.dispatcher
+        # memoized resources are not dumped, thus not part of the document digest
+        memo = state.resource_memo if state.document_digest is None else None
+
+        for rel_obj in (obj if self.many else [obj]):
+            if rel_obj is None:
+                continue
+            schema_cls = dispatcher.get_schema_cls(rel_obj)
+            key = (schema_cls.opts.type_, dispatcher.get_id(rel_obj, schema_cls))
+            if key in included_data or key in state.primary_keys:
+                continue
+            if max_depth is not None and depth > max_depth:
+                exceeded_limit = 'max_depth'
+            elif max_included is not None and len(included_data) >= max_included:
+                exceeded_limit = 'max_included'
+            elif deadline is not None and time.monotonic() >= deadline:
+                exceeded_limit = 'max_time'
+            else:
+                exceeded_limit = None
+            if exceeded_limit:
+                state.include_truncated[exceeded_limit] = state.include_truncated.get(exceeded_limit, 0) + 1
+                continue
+
+            # mark as visited before serializing to stop cycles
+            included_data.reserve(key)
+            parent_obj = state.parent_obj
+            state.include_depth = depth
+            try:
+                resource_schema = dispatcher.get_resource_schema(schema_cls)
+                # schemas of the same type can serialize different members
+                memo_key = (schema_cls, *key)
+                resource = memo.get(memo_key) if memo is not None else None
+                if resource is None:
+                    resource = resource_schema.dump(rel_obj)
+                    if memo is not None:
+                        memo[memo_key] = resource
+                else:
+                    include_relationships(schema_cls, resource_schema, rel_obj, state)
+                included_data.add(key, resource)
+            finally:
+                state.include_depth = depth - 1
+                state.parent_obj = parent_obj
+
+    def limit_linkage(self, related: t.Any) -> t.Any:
+        """Cap the related collection to ``linkage_limit`` items."""
+        if self.linkage_limit is None or not self.many or related is None:
+            return related
+        if hasattr(related, '__getitem__'):
+            return related[:self.linkage_limit]
+        return list(itertools.islice(related, self.linkage_limit))
+
+    def get_related_key(self, linkage: t.Mapping[str, t.Any]) -> t.Any:
+        """Return the loaded value of a resource identifier, the id or ``(type, id)`` if polymorphic,
+        or the `LocalId` of a resource created by the same document.
+        """
+        if 'id' not in linkage:
+            return LocalId(linkage['type'], linkage['lid'])
+        if self.polymorphic:
+            return linkage['type'], linkage['id']
+        return linkage['id']
+
+    def get_linkage(self, related_ids: t.Any) -> dict:
+        """Build the relationship object linking to the related resource id(s),
+        ``(type, id)`` pairs for polymorphic relationships.
+        """
+        if not self.linkage:
+            return {}
+        if self.polymorphic:
+            if self.many:
+                return {'data': [
+                    {'id': str(related_id), 'type': type_} for type_, related_id in self.limit_linkage(related_ids)
+                ]}
+            type_, related_id = related_ids
+            return {'data': {'id': str(related_id), 'type': type_}}
+        type_ = self.related_schema_cls.opts.type_
+        if self.many:
+            return {'data': [{'id': str(related_id), 'type': type_} for related_id in self.limit_linkage(related_ids)]}
+        return {'data': {'id': str(related_ids), 'type': type_}}
+
+    @staticmethod
+    def format_url(url: str, params: dict) -> t.Optional[str]:
+        non_null_params = {
+            key: value for key, value in params.items() if value is not None
+        }
+        if non_null_params:
+            return url.format(**non_null_params)
+        return None
+
     def get_related_url(self, obj):
         if self.related_url:
-            params = resolve_params(obj, self.related_url_kwargs)
-            non_null_params = {
-                key: value for key, value in params.items() if value is not None
-            }
-            if non_null_params:
-                return self.related_url.format(**non_null_params)
+            return self.format_url(self.related_url, resolve_params(obj, self.related_url_kwargs or {}))
         return None
 
     def get_self_url(self, obj):
         if self.self_url:
-            params = resolve_params(obj, self.self_url_kwargs)
-            non_null_params = {
-                key: value for key, value in params.items() if value is not None
-            }
-            if non_null_params:
-                return self.self_url.format(**non_null_params)
+            return self.format_url(self.self_url, resolve_params(obj, self.self_url_kwargs or {}))
         return None
+
+
+def include_relationships(schema_cls: t.Type['JSONAPISchema'], resource_schema: Schema, obj: t.Any, state: DumpState):
+    """Include the related objects of ``obj`` for the relationships of ``schema_cls`` to include,
+    in the order ``resource_schema`` would while serializing ``obj``, reading them with its
+    ``related_accessors``.
+    """
+    for field_name in resource_schema.fields['relationships'].schema.dump_fields:
+        if field_name in state.to_include:
+            field = schema_cls._declared_fields[field_name]
+            attr = field.attribute or field_name
+            related = resource_schema.related_accessors[attr](obj, attr, None)
+            if related is not None:
+                field.include_related(field.limit_linkage(related), state)
+
+
+def prefetched(accessor: Accessor) -> Accessor:
+    """Wrap the accessor of a relationship to return the value prefetched by `prefetch_relationships`."""
+    def prefetched_accessor(obj, attr, default=missing):
+        state = get_dump_state()
+        if state is not None and state.prefetched:
+            entry = state.prefetched.get((id(obj), attr))
+            # the object is kept with its values, so that its id is not reused by another object
+            if entry is not None and entry[0] is obj:
+                return entry[1]
+        return accessor(obj, attr, default)
+
+    return prefetched_accessor
+
+
+def prefetch_relationships(
+        schema_cls: t.Type['JSONAPISchema'], objs: t.Iterable[t.Any], state: DumpState,
+        only: t.Optional[t.Collection[str]] = None,
+):
+    """Read the relationships of ``objs`` dumped by ``schema_cls`` concurrently with the ``executor``
+    of the dump ``state``, one task per object and relationship.
+
+    The values are kept in the ``prefetched`` mapping of the state, keyed by object identity
+    and attribute along with the object itself, the serialization reading them in order
+    afterwards. The concurrency is bounded by the workers of the executor.
+    """
+    tasks = []
+    for field_name, field in schema_cls._declared_fields.items():
+        if not isinstance(field, RelationshipType) or (only is not None and field_name not in only):
+            continue
+        if not field.linkage and field_name not in state.to_include:
+            continue
+        attr = field.attribute or field_name
+        accessor = schema_cls.get_accessor(attr)
+        for obj in objs:
+            if obj is not None and type(obj) is not RawJSON and (id(obj), attr) not in state.prefetched:
+                tasks.append((obj, attr, state.executor.submit(accessor, obj, attr, missing)))
+    for obj, attr, future in tasks:
+        state.prefetched[(id(obj), attr)] = (obj, future.result())
+
+
+def prefetch_included(
+        schema_cls: t.Type['JSONAPISchema'], objs: t.Iterable[t.Any], state: DumpState,
+        only: t.Optional[t.Collection[str]] = None,
+):
+    """Prefetch the relationships of the primary ``objs``, then level by level those of the
+    objects to include, with one `prefetch_relationships` per schema and level for all the
+    objects of the level.
+
+    Levels stop at the ``max_depth`` include limit of the dump. Objects skipped by the other
+    include limits can still be read.
+    """
+    max_depth = state.include_limits.get('max_depth')
+    level = {schema_cls: list(objs)}
+    visited = set()
+    depth = 0
+    while level:
+        next_level = {}
+        for level_schema_cls, level_objs in level.items():
+            level_only = only if depth == 0 else None
+            prefetch_relationships(level_schema_cls, level_objs, state, only=level_only)
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for field_name, field in level_schema_cls._declared_fields.items():
+                if not isinstance(field, RelationshipType) or field_name not in state.to_include:
+                    continue
+                if level_only is not None and field_name not in level_only:
+                    continue
+                attr = field.attribute or field_name
+                for obj in level_objs:
+                    entry = state.prefetched.get((id(obj), attr))
+                    if entry is None or entry[0] is not obj or entry[1] is missing or entry[1] is None:
+                        continue
+                    related = field.limit_linkage(entry[1])
+                    for rel_obj in (related if field.many else [related]):
+                        if rel_obj is None or type(rel_obj) is RawJSON:
+                            continue
+                        rel_schema_cls = field.dispatcher.get_schema_cls(rel_obj)
+                        if (rel_schema_cls, id(rel_obj)) not in visited:
+                            visited.add((rel_schema_cls, id(rel_obj)))
+                            next_level.setdefault(rel_schema_cls, []).append(rel_obj)
+        level = next_level
+        depth += 1
+
+
+class ErrorObjects(fields.Field):
+    """ Error objects of an exception, one per message of a `ValidationError`
+    (see `mjapi.errors.validation_error_objects`), else the exception dumped by ``error_object_schema``.
+    """
+
+    def __init__(self, *, error_object_schema: t.Type[Schema], **kwargs):
+        self.error_object_schema = error_object_schema
+        self._error_object_schema_instance = None
+        super().__init__(**kwargs)
+
+    def _serialize(self, value: t.Any, attr: str, obj: t.Any, **kwargs):
+        if value is None:
+            return None
+        if isinstance(value, ValidationError):
+            return validation_error_objects(value)
+        if self._error_object_schema_instance is None:
+            self._error_object_schema_instance = self.error_object_schema()
+        return [self._error_object_schema_instance.dump(value)]
+
+
+class ResourceList(fields.List):
+    """ List of resource objects dumped as one batch by the nested resource object schema. """
+
+    def _serialize(self, value: t.Any, attr: str, obj: t.Any, **kwargs):
+        if value is None:
+            return None
+        return self.inner.schema.dump(value, many=True)
+
+
+class PolymorphicResource(fields.Field):
+    """ Resource object of one of the schemas of ``dispatcher``, used for mixed-type primary data.
+
+    Objects are dumped with the schema of their class, resource objects are loaded with the schema
+    of their ``type``, which is kept in the loaded data.
+    """
+    default_error_messages = {
+        'invalid': 'Invalid input type.',
+        'invalid_type': 'Invalid `type` specified',
+    }
+
+    def __init__(self, *, dispatcher: SchemaDispatcher, **kwargs):
+        self.dispatcher = dispatcher
+        super().__init__(**kwargs)
+
+    def _serialize(self, value: t.Any, attr: str, obj: t.Any, **kwargs):
+        if value is None:
+            return None
+        return self.dispatcher.get_resource_schema(self.dispatcher.get_schema_cls(value)).dump(value)
+
+    def _deserialize(self, value: t.Any, attr: t.Optional[str], data: t.Any, partial=None, **kwargs):
+        if not isinstance(value, Mapping):
+            raise self.make_error('invalid')
+        schema_cls = self.dispatcher.by_type.get(value.get('type'))
+        if schema_cls is None:
+            raise ValidationError({'type': [self.error_messages['invalid_type']]})
+        ret = self.dispatcher.get_resource_schema(schema_cls).load(value, partial=partial)
+        ret['type'] = schema_cls.opts.type_
+        return ret
@@ -0,0 +1,155 @@
+"""
+Stores of the included resources collected while a compound document is dumped.
+
+A store is created per dump by the ``included_store`` factory of the dump context, defaulting
+to `MemoryIncludedStore`. Included resources are keyed by ``(type, id)``: a key is reserved
+before its resource is dumped, so that cycles are not followed, then the dumped resource is
+added. Resources are emitted in the order their keys were reserved, decoded by `resources`
+for the document returned by ``dump`` or encoded by `fragments` for the document written
+by ``dump_to``.
+"""
+
+import json
+import tempfile
+import typing as t
+
+from mjapi import raw
+
+Key = t.Tuple[str, str]
+
+
+class IncludedStore:
+    """Interface of the included resources stores."""
+
+    def __contains__(self, key: Key) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def reserve(self, key: Key):
+        """Mark the resource of ``key`` as included, before it is dumped."""
+        raise NotImplementedError
+
+    def add(self, key: Key, resource: dict):
+        """Store the dumped ``resource`` of a reserved ``key``."""
+        raise NotImplementedError
+
+    def resources(self) -> t.Iterator[dict]:
+        """Iterate over the stored resources, in the order their keys were reserved."""
+        raise NotImplementedError
+
+    def fragments(self) -> t.Iterator[bytes]:
+        """Iterate over the stored resources encoded to JSON, in the order their keys were reserved."""
+        return (encode_resource(resource) for resource in self.resources())
+
+    def close(self):
+        """Release the resources of the store, called at the end of the dump."""
+
+
+class MemoryIncludedStore(IncludedStore):
+    """Keep the included resources in a dict."""
+
+    def __init__(self):
+        self._resources: t.Dict[Key, t.Optional[dict]] = {}
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._resources
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def reserve(self, key: Key):
+        self._resources[key] = None
+
+    def add(self, key: Key, resource: dict):
+        self._resources[key] = resource
+
+    def resources(self) -> t.Iterator[dict]:
+        return (resource for resource in self._resources.values() if resource is not None)
+
+
+def encode_resource(resource: dict) -> bytes:
+    return raw.dumps(resource, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def decode_resource(fragment: bytes) -> dict:
+    return json.loads(fragment)
+
+
+class SpillingIncludedStore(IncludedStore):
+    """Keep the included resources encoded in memory up to ``max_bytes``, then in a temporary file.
+
+    Only the keys and the location of the resources stay in memory once the budget is exceeded.
+    `RawJSON` resources are stored as is and iterated as `RawJSON` again, not decoded.
+    The budget bounds the memory of the document only when it is written with ``dump_to``, which
+    copies the stored fragments to the output one at a time. ``dump`` returns the document as a
+    dict, so every resource is decoded back into memory once the dump is over.
+    """
+
+    def __init__(
+            self, max_bytes: int = 16 * 1024 * 1024, *,
+            encode: t.Callable[[dict], bytes] = encode_resource, decode: t.Callable[[bytes], dict] = decode_resource,
+    ):
+        self.max_bytes = max_bytes
+        self.encode = encode
+        self.decode = decode
+        self.memory_bytes = 0
+        # key -> in memory fragment or (offset, length) in the file, None until added
+        self._locations: t.Dict[Key, t.Union[bytes, t.Tuple[int, int], None]] = {}
+        self._file: t.Optional[t.BinaryIO] = None
+        self._file_size = 0
+        self._raw_keys: t.Set[Key] = set()
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._locations
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    @property
+    def spilled_bytes(self) -> int:
+        """Size of the resources written to the temporary file."""
+        return self._file_size
+
+    def reserve(self, key: Key):
+        self._locations[key] = None
+
+    def add(self, key: Key, resource: dict):
+        if type(resource) is raw.RawJSON:
+            self._raw_keys.add(key)
+        fragment = self.encode(resource)
+        if self._file is None and self.memory_bytes + len(fragment) <= self.max_bytes:
+            self.memory_bytes += len(fragment)
+            self._locations[key] = fragment
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(self._file_size)
+        self._file.write(fragment)
+        self._locations[key] = (self._file_size, len(fragment))
+        self._file_size += len(fragment)
+
+    def resources(self) -> t.Iterator[dict]:
+        for key, fragment in self._fragments():
+            yield raw.RawJSON(fragment) if key in self._raw_keys else self.decode(fragment)
+
+    def fragments(self) -> t.Iterator[bytes]:
+        return (fragment for _, fragment in self._fragments())
+
+    def _fragments(self) -> t.Iterator[t.Tuple[Key, bytes]]:
+        for key, location in self._locations.items():
+            if location is None:
+                continue
+            if isinstance(location, bytes):
+                yield key, location
+            else:
+                offset, length = location
+                self._file.seek(offset)
+                yield key, self._file.read(length)
+
+    def close(self):
+        """Remove the temporary file, called at the end of the dump."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
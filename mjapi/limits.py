@@ -0,0 +1,91 @@
+"""
+Structural limits of loaded documents, checked before validation.
+"""
+
+import typing as t
+
+from marshmallow import ValidationError
+
+LIMIT_ERRORS = {
+    'max_resources': 'Too many resources, the maximum is {limit}.',
+    'max_linkage': 'Too many related resources, the maximum is {limit}.',
+    'max_string_length': 'Longer than maximum length {limit}.',
+    'max_depth': 'Nested deeper than {limit} levels.',
+}
+
+
+def _limit_error(path: t.Sequence[t.Union[str, int]], limit_name: str, limit: int) -> ValidationError:
+    messages = [LIMIT_ERRORS[limit_name].format(limit=limit)]
+    for key in reversed(path):
+        messages = {key: messages}
+    if not path:
+        messages = {'_schema': messages}
+    return ValidationError(messages)
+
+
+def check_load_limits(document: t.Any, limits: t.Mapping[str, int], *, relationship: bool = False):
+    """Check a JSON API ``document`` against the structural ``limits``, raising a
+    `ValidationError` located at the first violation found.
+
+    Supported limits are ``max_resources`` in ``data`` and ``included`` together, ``max_linkage``,
+    the length of the to-many relationship linkage of any of these resources, ``max_string_length``
+    of any string value and ``max_depth``, the nesting of objects and arrays, the document itself
+    being at depth 1.
+
+    With ``relationship``, the document is the document of a relationship endpoint, whose ``data``
+    is the resource linkage itself, checked against ``max_linkage``.
+    """
+    max_resources = limits.get('max_resources')
+    max_linkage = limits.get('max_linkage')
+    max_string_length = limits.get('max_string_length')
+    max_depth = limits.get('max_depth')
+    if not isinstance(document, dict):
+        return
+
+    if relationship:
+        linkage = document.get('data')
+        if max_linkage is not None and isinstance(linkage, list) and len(linkage) > max_linkage:
+            raise _limit_error(['data'], 'max_linkage', max_linkage)
+        max_resources = max_linkage = None
+
+    # (path, resource) of the primary data and the included resources of compound documents
+    data = document.get('data')
+    resources = [(['data', index], item) for index, item in enumerate(data)] if isinstance(data, list) else [
+        (['data'], data),
+    ]
+    included = document.get('included')
+    if isinstance(included, list):
+        resources += [(['included', index], item) for index, item in enumerate(included)]
+    if max_resources is not None and len(resources) > max_resources:
+        raise _limit_error([resources[max_resources][0][0]], 'max_resources', max_resources)
+    if max_linkage is not None:
+        for resource_path, resource in resources:
+            relationships = resource.get('relationships') if isinstance(resource, dict) else None
+            if not isinstance(relationships, dict):
+                continue
+            for rel_name, relationship in relationships.items():
+                linkage = relationship.get('data') if isinstance(relationship, dict) else None
+                if isinstance(linkage, list) and len(linkage) > max_linkage:
+                    raise _limit_error([*resource_path, 'relationships', rel_name, 'data'], 'max_linkage', max_linkage)
+
+    if max_depth is None and max_string_length is None:
+        return
+    # iterative walk, the paths are only built for the containers
+    stack = [(document, 1, ())]
+    while stack:
+        value, depth, path = stack.pop()
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, list):
+            items = enumerate(value)
+        else:
+            if max_string_length is not None and isinstance(value, str) and len(value) > max_string_length:
+                raise _limit_error(path, 'max_string_length', max_string_length)
+            continue
+        if max_depth is not None and depth > max_depth:
+            raise _limit_error(path, 'max_depth', max_depth)
+        for key, item in items:
+            if isinstance(item, (dict, list)):
+                stack.append((item, depth + 1, (*path, key)))
+            elif max_string_length is not None and isinstance(item, str) and len(item) > max_string_length:
+                raise _limit_error((*path, key), 'max_string_length', max_string_length)
@@ -46,4 +46,51 @@ def resolve_params(obj, params, default=missing):
                 )
         else:
             param_values[name] = attr_tpl
-    return param_values
\ No newline at end of file
+    return param_values
+
+
+def compile_params(params, get_accessor):
+    """Compile ``params`` into a function resolving them from an object, same as
+    `resolve_params`. ``get_accessor`` returns the accessor of an attribute name,
+    it is called once per parameter.
+    """
+    resolvers = []
+    for name, attr_tpl in params.items():
+        attr_name = tpl(str(attr_tpl))
+        accessor = get_accessor(attr_name) if attr_name else None
+        resolvers.append((name, attr_name, accessor, attr_tpl))
+
+    def resolve(obj):
+        param_values = {}
+        for name, attr_name, accessor, attr_tpl in resolvers:
+            if accessor is None:
+                param_values[name] = attr_tpl
+                continue
+            attribute_value = accessor(obj, attr_name, missing)
+            if attribute_value is missing:
+                raise AttributeError(
+                    "{attr_name!r} is not a valid "
+                    "attribute of {obj!r}".format(attr_name=attr_name, obj=obj)
+                )
+            param_values[name] = attribute_value
+        return param_values
+
+    return resolve
+
+
+def resolve_column_params(columns, params, index):
+    """Same as `resolve_params` for data held as columns, resolving the values enclosed
+    in `< >` from the ``index`` row of ``columns``.
+    """
+    param_values = {}
+    for name, attr_tpl in params.items():
+        attr_name = tpl(str(attr_tpl))
+        if attr_name:
+            if attr_name not in columns:
+                raise AttributeError(
+                    "{attr_name!r} is not a valid column".format(attr_name=attr_name)
+                )
+            param_values[name] = columns[attr_name][index]
+        else:
+            param_values[name] = attr_tpl
+    return param_values
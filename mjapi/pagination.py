@@ -0,0 +1,80 @@
+"""
+Keyset (cursor based) pagination helpers.
+"""
+
+import base64
+import json
+import typing as t
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+PAGINATION_LINKS = ('first', 'prev', 'next', 'last')
+
+
+def encode_cursor(values: t.Sequence[t.Any]) -> str:
+    """Encode the sort key ``values`` of a resource into an opaque, URL safe cursor."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> t.List[t.Any]:
+    """Decode a cursor produced by `encode_cursor` back into the sort key values.
+
+    Raises `ValueError` if the cursor is malformed.
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f'Invalid cursor {cursor!r}') from exc
+    if not isinstance(values, list):
+        raise ValueError(f'Invalid cursor {cursor!r}')
+    return values
+
+
+def get_cursor(schema_cls: t.Type['JSONAPISchema'], obj: t.Any, sort_keys: t.Sequence[str]) -> str:
+    """Build the cursor of ``obj`` from its sort key attributes, serialized through the fields
+    declared on ``schema_cls`` so that the values match the dumped representation.
+    """
+    declared_fields = schema_cls._declared_fields
+    return encode_cursor([
+        declared_fields[key].serialize(key, obj, schema_cls.get_accessor(declared_fields[key].attribute or key))
+        for key in sort_keys
+    ])
+
+
+def generate_pagination(
+        schema_cls: t.Type['JSONAPISchema'], objs: t.Sequence[t.Any], urls: t.Mapping[str, str],
+        sort_keys: t.Sequence[str], pagination: t.Optional[t.Mapping[str, t.Any]] = None,
+) -> t.Tuple[dict, dict]:
+    """Return the pagination ``links`` and ``meta`` of a page containing ``objs``.
+
+    ``pagination`` may define ``has_prev`` and ``has_next`` (both default to `True` for
+    a non empty page) and ``url_kwargs``, extra replacement fields for the ``urls`` templates.
+    The ``prev`` and ``next`` templates receive the ``cursor`` of the first and last resource.
+    """
+    pagination = pagination or {}
+    url_kwargs = pagination.get('url_kwargs', {})
+    first_cursor = last_cursor = None
+    if objs:
+        first_cursor = get_cursor(schema_cls, objs[0], sort_keys)
+        last_cursor = get_cursor(schema_cls, objs[-1], sort_keys)
+
+    links = {}
+    for link_name in PAGINATION_LINKS:
+        url = urls.get(link_name)
+        if not url:
+            continue
+        cursor = None
+        if link_name == 'prev':
+            cursor = first_cursor if pagination.get('has_prev', True) else None
+        elif link_name == 'next':
+            cursor = last_cursor if pagination.get('has_next', True) else None
+        if link_name in ('prev', 'next') and cursor is None:
+            links[link_name] = None
+        else:
+            links[link_name] = url.format_map(dict(url_kwargs, cursor=cursor))
+
+    meta = {'first_cursor': first_cursor, 'last_cursor': last_cursor}
+    return links, meta
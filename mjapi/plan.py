@@ -0,0 +1,108 @@
+"""
+Fetch plans: what a dump reads from the serialized objects, to build minimal queries.
+"""
+
+import typing as t
+
+from mjapi.fields import RelationshipType
+from mjapi.links import tpl
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+# how the related objects of a relationship are read
+RELATED_OBJECTS = 'objects'  # included, the related objects are serialized
+RELATED_IDS = 'ids'  # only the related ids are serialized in the linkage
+RELATED_NONE = 'none'  # no linkage (``linkage=False``), the relationship is not read
+
+
+class TypePlan(t.NamedTuple):
+    # object attributes read by the attributes and the id
+    attributes: t.FrozenSet[str]
+    # object attributes of the relationships mapped to RELATED_OBJECTS, RELATED_IDS or RELATED_NONE
+    relationships: t.Mapping[str, str]
+    # object attributes read by the ``self_url_kwargs`` and ``related_url_kwargs`` of links
+    link_params: t.FrozenSet[str]
+
+
+class FetchPlan(t.NamedTuple):
+    # plan of each serialized resource type
+    types: t.Mapping[str, TypePlan]
+    # dotted paths of object attributes whose related objects are serialized (e.g. to eager load)
+    include_paths: t.Tuple[str, ...]
+
+
+def _link_params(params: t.Optional[t.Mapping[str, t.Any]]) -> t.Set[str]:
+    return {attr_name for attr_name in (tpl(str(value)) for value in (params or {}).values()) if attr_name}
+
+
+def build_fetch_plan(
+        schema_cls: t.Type['JSONAPISchema'], *, only: t.Optional[t.Iterable[str]] = None,
+        to_include: t.Iterable[str] = (), max_depth: t.Optional[int] = None,
+) -> FetchPlan:
+    """Build the fetch plan of dumping objects of ``schema_cls`` with the ``only`` fields and
+    the ``to_include`` relationships, same as the top-level dump context.
+
+    Included relationships are followed down to ``max_depth`` levels, and not through the
+    schemas already on the path (the primary schema restricted by ``only`` counting apart),
+    as the fields of their objects were planned already.
+    """
+    include_names = set()
+    for item in to_include:
+        include_names.update(item.split('.'))
+    only = frozenset(only) if only is not None else None
+
+    attributes: t.Dict[str, t.Set[str]] = {}
+    relationships: t.Dict[str, t.Dict[str, str]] = {}
+    link_params: t.Dict[str, t.Set[str]] = {}
+    include_paths = []
+
+    # depth first, the paths hold the (type, only) already expanded
+    pending = [(schema_cls, only, (), (), 0)]
+    while pending:
+        current_cls, current_only, path, path_types, depth = pending.pop()
+        type_ = current_cls.opts.type_
+        path_types = (*path_types, (type_, current_only))
+        type_attributes = attributes.setdefault(type_, set())
+        type_relationships = relationships.setdefault(type_, {})
+        type_link_params = link_params.setdefault(type_, set())
+        if current_cls.opts.self_url:
+            type_link_params |= _link_params(current_cls.opts.self_url_kwargs)
+
+        for field_name, field in current_cls._declared_fields.items():
+            attr = field.attribute or field_name
+            if field_name == 'id':
+                type_attributes.add(attr)
+                continue
+            if current_only is not None and field_name not in current_only:
+                continue
+            if not isinstance(field, RelationshipType):
+                type_attributes.add(attr)
+                continue
+
+            if field.related_url:
+                type_link_params |= _link_params(field.related_url_kwargs)
+            if field.self_url:
+                type_link_params |= _link_params(field.self_url_kwargs)
+            if field_name in include_names and (max_depth is None or depth < max_depth):
+                mode = RELATED_OBJECTS
+                field_path = (*path, attr)
+                include_paths.append('.'.join(field_path))
+                for related_cls in reversed(field.related_schema_classes):
+                    if (related_cls.opts.type_, None) not in path_types:
+                        pending.append((related_cls, None, field_path, path_types, depth + 1))
+            elif field.linkage:
+                mode = RELATED_IDS
+            else:
+                mode = RELATED_NONE
+            # the same type can be dumped in several places, objects win over ids
+            if type_relationships.get(attr) != RELATED_OBJECTS:
+                type_relationships[attr] = mode
+
+    return FetchPlan(
+        types={
+            type_: TypePlan(frozenset(attributes[type_]), relationships[type_], frozenset(link_params[type_]))
+            for type_ in attributes
+        },
+        include_paths=tuple(sorted(include_paths)),
+    )
@@ -0,0 +1,212 @@
+"""
+Profile the dump and load of a schema against sample payloads.
+
+Usage::
+
+    python -m mjapi.profile module:SchemaName --factory module:callable --include referrer.teams --repeat 100
+    python -m mjapi.profile module:SchemaName --input sample.json --mode load --report report.json
+
+``--factory`` returns the object (or list of objects) to dump, ``--input`` is a JSON API document to load.
+Without ``--input``, the load is profiled on the dumped document.
+"""
+
+import argparse
+import cProfile
+import importlib
+import json
+import os
+import pstats
+import sys
+import time
+import typing as t
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+DUMP = 'dump'
+LOAD = 'load'
+BOTH = 'both'
+
+
+def import_string(path: str) -> t.Any:
+    """Import ``module:attribute``."""
+    module_name, _, attr = path.partition(':')
+    if not module_name or not attr:
+        raise ValueError(f'Expected "module:attribute", got {path!r}')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_hotspots(profiler: cProfile.Profile, top: int) -> t.List[dict]:
+    """Return the ``top`` functions of ``profiler`` by cumulative time."""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    hotspots = []
+    for func in stats.fcn_list[:top]:
+        file_name, line, func_name = func
+        _, ncalls, tottime, cumtime, _ = stats.stats[func]
+        hotspots.append({
+            'function': f'{os.path.basename(file_name)}:{line}({func_name})',
+            'ncalls': ncalls,
+            'tottime': tottime,
+            'cumtime': cumtime,
+        })
+    return hotspots
+
+
+def run_phases(
+        phases: t.Sequence[t.Tuple[str, t.Callable[[t.Any], t.Any]]], initial: t.Any,
+        repeat: int, profiled: str, top: int,
+) -> dict:
+    """Time the ``phases``, run in order ``repeat`` times, each phase receiving the result of the
+    previous one (the first one receives ``initial``). The ``profiled`` phase is then run
+    ``repeat`` more times under cProfile, so that profiling does not skew the timings.
+    """
+    timings = {name: 0.0 for name, _ in phases}
+    profiler = cProfile.Profile()
+    for is_profiling in (False, True):
+        for _ in range(repeat):
+            value = initial
+            for name, func in phases:
+                if not is_profiling:
+                    start = time.perf_counter()
+                    value = func(value)
+                    timings[name] += time.perf_counter() - start
+                elif name == profiled:
+                    profiler.enable()
+                    value = func(value)
+                    profiler.disable()
+                else:
+                    value = func(value)
+
+    total = sum(timings.values())
+    return {
+        'phases': {
+            name: {'total': elapsed, 'mean': elapsed / repeat, 'share': elapsed / total if total else 0.0}
+            for name, elapsed in timings.items()
+        },
+        'throughput': repeat / timings[profiled] if timings[profiled] else None,
+        'hotspots': get_hotspots(profiler, top),
+    }
+
+
+def time_phase(func: t.Callable[[], t.Any], repeat: int) -> dict:
+    """Time a phase which is not part of the pipeline of the operation."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    return {'total': elapsed, 'mean': elapsed / repeat, 'share': None}
+
+
+def sample_document(schema_cls: t.Type['JSONAPISchema'], obj: t.Any) -> str:
+    """Dump ``obj`` into the document to load, without the dump only resource links."""
+    many = isinstance(obj, (list, tuple))
+    data = schema_cls.get_jsonapi_top_level_schema(many=many)().dump(obj)['data']
+    for resource in (data if many else [data]):
+        resource.pop('links', None)
+    return json.dumps({'data': data})
+
+
+def run_profile(
+        schema_path: str, *, input_path: t.Optional[str] = None, factory_path: t.Optional[str] = None,
+        include: t.Sequence[str] = (), mode: str = BOTH, repeat: int = 100, top: int = 15,
+) -> dict:
+    """Profile the dump and/or load of ``schema_path`` and return the report."""
+    schema_cls = import_string(schema_path)
+    context = {'to_include': set(include)} if include else {}
+    report = {'schema': schema_path, 'mode': mode, 'repeat': repeat, 'include': list(include)}
+
+    if mode in (DUMP, BOTH) and not factory_path:
+        raise ValueError('--factory is required to profile dump')
+
+    document_text = None
+    if input_path:
+        with open(input_path) as input_file:
+            document_text = input_file.read()
+    obj = import_string(factory_path)() if factory_path else None
+    many = isinstance(obj, (list, tuple))
+
+    if mode in (DUMP, BOTH):
+        schema = schema_cls.get_jsonapi_top_level_schema(many=many)(context=context)
+        report[DUMP] = run_phases(
+            [('dump', schema.dump), ('encode', json.dumps)], obj, repeat, profiled='dump', top=top,
+        )
+        report[DUMP]['phases']['build'] = time_phase(
+            lambda: schema_cls.get_jsonapi_top_level_schema(many=many)(context=context), repeat,
+        )
+        report[DUMP]['resources'] = len(obj) if many else 1
+
+    if mode in (LOAD, BOTH):
+        if document_text is None and obj is None:
+            raise ValueError('--input or --factory is required to profile load')
+        if document_text is None:
+            document_text = sample_document(schema_cls, obj)
+        data = json.loads(document_text).get('data')
+        many = isinstance(data, list)
+        schema = schema_cls.get_jsonapi_top_level_schema(many=many)()
+        report[LOAD] = run_phases(
+            [('decode', json.loads), ('load', schema.load)], document_text, repeat, profiled='load', top=top,
+        )
+        report[LOAD]['resources'] = len(data) if many else 1
+
+    return report
+
+
+def print_report(report: dict, file: t.Optional[t.TextIO] = None):
+    for operation in (DUMP, LOAD):
+        if operation not in report:
+            continue
+        result = report[operation]
+        title = f' {operation.upper()} {report["schema"]} x{report["repeat"]} '
+        print('\n' + title.center(100, '=') + '\n', file=file)
+        if result['throughput']:
+            print(
+                f'throughput: {result["throughput"]:.1f} documents/s, '
+                f'{result["throughput"] * result["resources"]:.1f} resources/s\n',
+                file=file,
+            )
+        for name, phase in result['phases'].items():
+            share = f'{phase["share"] * 100:5.1f}%' if phase['share'] is not None else '     -'
+            print(f'{name:>10}: {phase["mean"] * 1000:10.3f} ms/op  {share}', file=file)
+        print('\n' + f'{"ncalls":>10} {"tottime":>10} {"cumtime":>10}  function', file=file)
+        for hotspot in result['hotspots']:
+            print(
+                f'{hotspot["ncalls"]:>10} {hotspot["tottime"]:>10.4f} {hotspot["cumtime"]:>10.4f}  '
+                f'{hotspot["function"]}',
+                file=file,
+            )
+
+
+def main(argv: t.Optional[t.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m mjapi.profile', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('schema', help='JSONAPISchema to profile, as "module:SchemaName"')
+    source = parser.add_argument_group('payloads')
+    source.add_argument('--input', help='JSON API document to load')
+    source.add_argument('--factory', help='callable returning the object(s) to dump, as "module:callable"')
+    parser.add_argument('--include', action='append', default=[], help='relationship path to include, repeatable')
+    parser.add_argument('--mode', choices=(DUMP, LOAD, BOTH), help='defaults to both with --factory, else load')
+    parser.add_argument('--repeat', type=int, default=100, help='number of runs of each operation')
+    parser.add_argument('--top', type=int, default=15, help='number of hotspots to print')
+    parser.add_argument('--report', help='write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.factory:
+        parser.error('one of --input or --factory is required')
+    mode = args.mode or (BOTH if args.factory else LOAD)
+    try:
+        report = run_profile(
+            args.schema, input_path=args.input, factory_path=args.factory,
+            include=args.include, mode=mode, repeat=args.repeat, top=args.top,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Pre-serialized JSON fragments embedded verbatim in dumped documents.
+
+Values already available as JSON text (e.g. ``jsonb`` columns, cached resources) are wrapped
+in `RawJSON` instead of being decoded. Attribute values are dumped as is, resource object
+schemas dump `RawJSON` objects as the whole resource, and resources of the ``resource_memo``
+of a dump (see `mjapi.batch`) can be `RawJSON` too. `dumps` then encodes the document,
+copying the fragments into the output without decoding them.
+"""
+
+import json
+import re
+import secrets
+import typing as t
+
+
+class RawJSON:
+    """JSON text embedded as is by `dumps`. The text is not validated."""
+    __slots__ = ('json',)
+
+    def __init__(self, fragment: t.Union[str, bytes]):
+        self.json = fragment.decode() if isinstance(fragment, bytes) else fragment
+
+    def __eq__(self, other: t.Any) -> bool:
+        return isinstance(other, RawJSON) and other.json == self.json
+
+    def __hash__(self) -> int:
+        return hash(self.json)
+
+    def __repr__(self) -> str:
+        return f'RawJSON({self.json!r})'
+
+    def __str__(self) -> str:
+        return self.json
+
+    def load(self) -> t.Any:
+        """Decode the fragment."""
+        return json.loads(self.json)
+
+
+def dumps(obj: t.Any, **kwargs) -> str:
+    """Same as `json.dumps`, with the `RawJSON` fragments of ``obj`` copied verbatim.
+
+    Fragments are encoded as placeholder strings, unique to the call, then substituted
+    in the encoded text.
+    """
+    fragments = []
+    nonce = secrets.token_hex(8)
+    default = kwargs.pop('default', None)
+
+    def encode_fragment(value):
+        if type(value) is RawJSON:
+            fragments.append(value.json)
+            return f'__raw_json_{nonce}_{len(fragments) - 1}__'
+        if default is not None:
+            return default(value)
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+    ret = json.dumps(obj, default=encode_fragment, **kwargs)
+    if not fragments:
+        return ret
+    return re.sub(f'"__raw_json_{nonce}_(\\d+)__"', lambda match: fragments[int(match.group(1))], ret)
@@ -1,9 +1,25 @@
+import concurrent.futures
+import copy
 import typing as t
+from collections.abc import Mapping
 
-from marshmallow import Schema, SchemaOpts, fields
+from marshmallow import Schema, SchemaOpts, ValidationError, fields
+from marshmallow.utils import missing
 
-from mjapi.fields import RelationshipType
-from mjapi.links import LinksSchema, generate_url, resolve_params
+from mjapi import compact
+from mjapi.accessors import Accessor, AccessorSchema, make_accessor
+from mjapi.converters import get_batch_converter
+from mjapi.digest import DocumentDigest
+from mjapi.dispatch import SchemaDispatcher
+from mjapi.fields import (
+    ErrorObjects, LocalId, PolymorphicResource, RelationshipType, ResourceList, prefetch_included, prefetched,
+)
+from mjapi.links import LinksSchema, compile_params, generate_url, resolve_column_params
+from mjapi.limits import check_load_limits
+from mjapi.pagination import generate_pagination
+from mjapi.plan import FetchPlan, build_fetch_plan
+from mjapi.raw import RawJSON, dumps
+from mjapi.state import DumpContextSchema, DumpState, dump_state, get_dump_state
 
 
 class ErrorObjectSchema(Schema):
@@ -19,16 +35,58 @@ class ErrorObjectSchema(Schema):
     def dump(self, *args, **kwargs):
         """ Overwrite to remove empty fields. """
         ret = super().dump(*args, **kwargs)
-        for field_name in self._declared_fields.keys():
-            if ret.get(field_name) is None:
-                ret.pop(field_name)
-        return ret
+        return {field_name: value for field_name, value in ret.items() if value is not None}
 
 
 class JSONAPIObjectSchema(Schema):
     version = fields.String()
 
 
+class BaseTopLevelSchema(DumpContextSchema):
+    """ Base of the top-level document schemas, reading the members other than ``data`` from the dump state. """
+
+    def get_attribute(self, obj: t.Any, attr: str, default: t.Any):
+        state = get_dump_state()
+        if attr == 'data' and not isinstance(obj, Exception):
+            return obj
+        elif attr == 'errors' and isinstance(obj, Exception):
+            return obj
+        elif attr == 'included':
+            if len(state.included_data) and not state.stream_included:
+                return list(state.included_data.resources())
+            else:
+                return default
+        elif attr == 'meta':
+            return state.context.get('top_level_meta', default)
+        elif attr == 'jsonapi':
+            return state.context.get('jsonapi_info', default)
+        return default
+
+
+class AttributesSchema(AccessorSchema):
+    """ Schema of the attributes of resource objects, dumping `RawJSON` values as is. """
+
+    def serialize_field(self, attr_name: str, field: fields.Field, obj: t.Any) -> t.Any:
+        """ Serialize the value of ``field`` read from ``obj``, `missing` if left out. """
+        if not field._CHECK_ATTRIBUTE:
+            return field.serialize(attr_name, obj, self.get_attribute)
+        value = self.get_attribute(obj, field.attribute or attr_name, missing)
+        if type(value) is RawJSON:
+            return value
+        return field.serialize(attr_name, obj, lambda *_: value)
+
+    def _serialize(self, obj: t.Any, *, many: bool = False):
+        """ Overwrite to serialize the fields with `serialize_field`. """
+        if many and obj is not None:
+            return [self._serialize(item) for item in obj]
+        ret = self.dict_class()
+        for attr_name, field in self.dump_fields.items():
+            value = self.serialize_field(attr_name, field, obj)
+            if value is not missing:
+                ret[field.data_key if field.data_key is not None else attr_name] = value
+        return ret
+
+
 class JSONAPISchemaOpts(SchemaOpts):
     def __init__(self, meta, *args, **kwargs):
         super().__init__(meta, *args, **kwargs)
@@ -37,6 +95,14 @@ class JSONAPISchemaOpts(SchemaOpts):
         self.self_url = getattr(meta, "self_url", None)
         self.self_url_kwargs = getattr(meta, "self_url_kwargs", None)
         self.self_url_many = getattr(meta, "self_url_many", None)
+        self.pagination_urls = getattr(meta, "pagination_urls", None)
+        self.pagination_sort_keys = getattr(meta, "pagination_sort_keys", ('id',))
+        self.digest_version = getattr(meta, "digest_version", None)
+        self.accessor = getattr(meta, "accessor", None)
+        self.row_fields = getattr(meta, "row_fields", None)
+        self.load_limits = getattr(meta, "load_limits", None)
+        self.model = getattr(meta, "model", None)
+        self.batch_dump = getattr(meta, "batch_dump", False)
 
 
 class JSONAPISchema(Schema):
@@ -48,20 +114,50 @@ class JSONAPISchema(Schema):
         """Options object for `Schema`. Takes the same options as `marshmallow.Schema.Meta` with
         the addition of:
         * ``type_`` - required, the JSON API resource type as a string.
-        * ``inflect`` - optional, an inflection function to modify attribute names.
+        * ``inflect`` - optional, an inflection function to modify attribute and relationship names.
         * ``self_url`` - optional, URL to use to `self` in links
         * ``self_url_kwargs`` - optional, replacement fields for `self_url`.
           String arguments enclosed in ``< >`` will be interpreted as attributes
           to pull from the schema data.
         * ``self_url_many`` - optional, URL to use to `self` in top-level ``links``
           when a collection of resources is returned.
+        * ``pagination_urls`` - optional, mapping of ``first``, ``prev``, ``next`` and ``last``
+          to URL templates used for top-level pagination ``links`` of collections.
+          ``prev`` and ``next`` are formatted with the ``cursor`` of the first and last resource.
+        * ``pagination_sort_keys`` - optional, attributes the collection is sorted by,
+          encoded into the pagination cursors. Defaults to ``('id',)``.
+        * ``digest_version`` - optional, attribute holding the version of a resource
+          (e.g. ``updated_at``). Enables reusing resource digests from the cache
+          passed to `dump_with_digest`.
+        * ``accessor`` - optional, strategy used to read attributes, relationships and
+          link parameters from objects: ``'attribute'``, ``'index'`` or ``'mapping'``
+          (see `mjapi.accessors`). Defaults to marshmallow's generic `get_value`.
+        * ``row_fields`` - required by the ``'index'`` accessor, attribute names
+          in the order of the row items (e.g. the columns of a DB-API cursor). Relationship
+          items must hold the related objects, flat foreign key columns are dumped as linkage
+          without ``id`` (use `dump_columns` for them).
+        * ``load_limits`` - optional, mapping of ``max_resources``, ``max_linkage``,
+          ``max_string_length`` and ``max_depth`` checked on the raw document before
+          loading it (see `mjapi.limits.check_load_limits`).
+        * ``model`` - optional, the class of the serialized objects, used to dispatch the objects
+          of polymorphic relationships and mixed-type collections to their schema.
+        * ``batch_dump`` - optional, dump collections field-major (see `dump_batch`)
+          instead of object by object. Defaults to `False`.
         """
         pass
 
     OPTIONS_CLASS = JSONAPISchemaOpts
 
     @classmethod
-    def get_jsonapi_resource_object_schema(cls) -> t.Type[Schema]:
+    def get_accessor(cls, attr: str) -> Accessor:
+        """ Compile the accessor of ``attr`` for the ``accessor`` strategy of the schema. """
+        return make_accessor(cls.opts.accessor, attr, cls.opts.row_fields)
+
+    @classmethod
+    def get_jsonapi_resource_object_schema(cls, local_ids: bool = False) -> t.Type[Schema]:
+        """ Build the resource object schema. With ``local_ids``, resources and resource identifiers
+        can have a local id (``lid``) instead of an ``id``, as in compound documents (see `load_compound`).
+        """
         schema_declared_fields = cls._declared_fields.copy()
         # using the id field that is defined on the schema
         schema_id_field = schema_declared_fields.pop('id')
@@ -70,34 +166,95 @@ class JSONAPISchema(Schema):
         # add fields for attributes and relationships
         schema_attributes = {}
         schema_relationships = {}
+        # relationships, and those resolving related objects on load: (attribute, data key, field)
+        loaded_relationships = []
+        batch_loaded_relationships = []
+        unread_relationships = set()
+        prefetched_relationships = set()
         attributes_required = False
         relationships_required = False
+        inflect = cls.opts.inflect
         for field_name, field in schema_declared_fields.items():
+            # member names are inflected once, through the data_key of the generated fields
+            data_key = field.data_key
+            if data_key is None and inflect:
+                data_key = inflect(field_name)
             if isinstance(field, RelationshipType):
                 if field.required:
                     relationships_required = True
+                loaded_relationships.append((field.attribute or field_name, data_key or field_name, field))
+                if field.batch_loader:
+                    batch_loaded_relationships.append((field.attribute or field_name, data_key or field_name, field))
+                if not field.linkage:
+                    # relationships without linkage are dumped from the parent object
+                    unread_relationships.add(field.attribute or field_name)
+                else:
+                    prefetched_relationships.add(field.attribute or field_name)
                 schema_relationships[field_name] = fields.Nested(
-                    field.get_jsonapi_relationship_schema(relationship_name=field_name),
+                    field.get_jsonapi_relationship_schema(
+                        relationship_name=field_name, parent_schema_cls=cls, local_ids=local_ids,
+                    ),
                     # pass relationship field params to preserve them
                     allow_none=field.allow_none,
                     required=field.required,
+                    attribute=field.attribute,
+                    data_key=data_key,
                 )
             else:
                 if field.required:
                     attributes_required = True
+                if data_key != field.data_key:
+                    field = copy.copy(field)
+                    field.data_key = data_key
                 schema_attributes[field_name] = field
 
-        class ResourceObjectSchema(Schema):
+        def read_parent(obj, attr, default):
+            return obj
+
+        def get_schema_cls(
+                schema_fields: t.Dict[str, fields.Field], base: t.Type[AccessorSchema] = AccessorSchema,
+        ) -> t.Type[Schema]:
+            schema_cls = base.from_dict(schema_fields)
+            schema_cls.accessors = {
+                field.attribute or field_name: (
+                    read_parent if (field.attribute or field_name) in unread_relationships
+                    else prefetched(cls.get_accessor(field.attribute or field_name))
+                    if (field.attribute or field_name) in prefetched_relationships
+                    else cls.get_accessor(field.attribute or field_name)
+                )
+                for field_name, field in schema_fields.items()
+            }
+            # `Method` fields call the methods of the declaring schema
+            for field in schema_fields.values():
+                if isinstance(field, fields.Method):
+                    for method_name in (field.serialize_method_name, field.deserialize_method_name):
+                        if method_name:
+                            setattr(schema_cls, method_name, getattr(cls, method_name))
+            return schema_cls
+
+        id_attr = schema_id_field.attribute or 'id'
+        id_accessor = cls.get_accessor(id_attr)
+        self_url_params = compile_params(cls.opts.self_url_kwargs or {}, cls.get_accessor)
+        digest_version_accessor = cls.get_accessor(cls.opts.digest_version) if cls.opts.digest_version else None
+
+        class ResourceObjectSchema(DumpContextSchema):
 
             class Meta(cls.Meta):
                 register = False
 
             id = schema_id_field
+            if local_ids:
+                lid = fields.String(load_only=True)
             type = schema_type_field
-            attributes = fields.Nested(Schema.from_dict(schema_attributes), required=attributes_required)
-            relationships = fields.Nested(Schema.from_dict(schema_relationships), required=relationships_required)
+            attributes = fields.Nested(
+                get_schema_cls(schema_attributes, AttributesSchema), required=attributes_required,
+            )
+            relationships = fields.Nested(get_schema_cls(schema_relationships), required=relationships_required)
             links = fields.Nested(cls.links_object_schema, dump_only=True)
 
+            # accessors of the related objects, read when including memoized resources
+            related_accessors = {attr: prefetched(cls.get_accessor(attr)) for attr, _, _ in loaded_relationships}
+
             def __init__(self, *, only=None, **kwargs):
                 new_only = [] if only else None
                 if only:
@@ -108,14 +265,17 @@ class JSONAPISchema(Schema):
                             else:
                                 new_only.append(f'attributes.{field_name}')
 
-                    new_only += ['id', 'type']
+                    new_only += ['id', 'lid', 'type'] if local_ids else ['id', 'type']
                 super().__init__(only=new_only, **kwargs)
+                self._fields_by_data_key = None
 
             def get_attribute(self, obj: t.Any, attr: str, default: t.Any):
-                # populate parent_obj on the context
-                self.context['parent_obj'] = obj
+                # populate parent_obj on the dump state
+                get_dump_state().parent_obj = obj
                 if attr in ('attributes', 'relationships'):
                     return obj
+                if attr == id_attr:
+                    return id_accessor(obj, attr, default)
                 return super().get_attribute(obj, attr, default)
 
             def load(self, *args, **kwargs):
@@ -126,28 +286,438 @@ class JSONAPISchema(Schema):
                 ret.update(**ret.pop('relationships', {}))
                 return ret
 
+            @staticmethod
+            def get_related_resource_keys(item: dict) -> t.Iterator[t.Tuple[str, tuple]]:
+                """ Yield the data key of the relationships of a loaded ``item`` with the key
+                of each related resource, ``('id', type, id)`` or ``('lid', type, lid)``.
+                """
+                for attr, data_key, relationship in loaded_relationships:
+                    related_keys = item.get(attr)
+                    if related_keys is None:
+                        continue
+                    for related_key in (related_keys if relationship.many else [related_keys]):
+                        if isinstance(related_key, LocalId):
+                            yield data_key, ('lid', *related_key)
+                        elif relationship.polymorphic:
+                            yield data_key, ('id', *related_key)
+                        else:
+                            yield data_key, ('id', relationship.related_schema_cls.opts.type_, related_key)
+
+            def resolve_related(self, items: t.List[dict]) -> t.Dict[int, dict]:
+                """ Replace the ids loaded for relationships with a ``batch_loader`` by the related objects.
+
+                The ids are collected per related type and loader across all the loaded ``items``,
+                so each loader is called once. Returns the errors of the related resources
+                that were not found, per item index.
+                """
+                if not batch_loaded_relationships:
+                    return {}
+
+                def get_loader_key(relationship, related_key):
+                    """ Return the ``(type, loader)`` loading a related resource and its id. """
+                    if relationship.polymorphic:
+                        type_, related_id = related_key
+                        return (type_, relationship.batch_loader[type_]), related_id
+                    return (relationship.related_schema_cls.opts.type_, relationship.batch_loader), related_key
+
+                pending_ids = {}
+                for item in items:
+                    for attr, _, relationship in batch_loaded_relationships:
+                        related_keys = item.get(attr)
+                        if related_keys is None:
+                            continue
+                        for related_key in (related_keys if relationship.many else [related_keys]):
+                            if isinstance(related_key, LocalId):
+                                continue
+                            loader_key, related_id = get_loader_key(relationship, related_key)
+                            # dict keeps the ids unique in the order they were found
+                            pending_ids.setdefault(loader_key, {})[related_id] = None
+                related_objs = {
+                    (type_, loader): loader(list(ids)) for (type_, loader), ids in pending_ids.items()
+                }
+
+                def find(relationship, related_key):
+                    if isinstance(related_key, LocalId):
+                        # created by the same document
+                        return related_key
+                    loader_key, related_id = get_loader_key(relationship, related_key)
+                    return related_objs[loader_key].get(related_id, missing)
+
+                errors = {}
+                for index, item in enumerate(items):
+                    for attr, data_key, relationship in batch_loaded_relationships:
+                        related_keys = item.get(attr)
+                        if related_keys is None:
+                            continue
+                        not_found = {'id': [relationship.error_messages['not_found']]}
+                        if relationship.many:
+                            found = [find(relationship, related_key) for related_key in related_keys]
+                            item[attr] = [None if related is missing else related for related in found]
+                            rel_errors = {
+                                related_index: not_found
+                                for related_index, related in enumerate(found) if related is missing
+                            }
+                        else:
+                            found = find(relationship, related_keys)
+                            item[attr] = None if found is missing else found
+                            rel_errors = not_found if found is missing else None
+                        if rel_errors:
+                            item_errors = errors.setdefault(index, {}).setdefault('relationships', {})
+                            item_errors[data_key] = {'data': rel_errors}
+                return errors
+
+            def get_fields_by_data_key(self):
+                """ Map data keys to ``(attribute name, field)`` for the resource object members
+                and for the fields nested under ``attributes`` and ``relationships``.
+                """
+                if self._fields_by_data_key is None:
+                    resource_fields = {}
+                    member_fields = {}
+                    for field_name, field in self.load_fields.items():
+                        if field_name in ('attributes', 'relationships'):
+                            member_fields[field_name] = {
+                                nested_field.data_key or nested_name: (
+                                    nested_field.attribute or nested_name, nested_field,
+                                )
+                                for nested_name, nested_field in field.schema.load_fields.items()
+                            }
+                        resource_fields[field.data_key or field_name] = (field.attribute or field_name, field)
+                    self._fields_by_data_key = resource_fields, member_fields
+                return self._fields_by_data_key
+
+            def load_patch(self, data: t.Mapping[str, t.Any]) -> t.Tuple[dict, t.FrozenSet[str]]:
+                """ Load a PATCH resource object, visiting only the members present in ``data``.
+
+                Required checks are skipped for absent fields. Returns the flattened data,
+                same as `load`, and the names of the attributes and relationships it touches.
+                """
+                return self.load_fields_present(data, partial=True)
+
+            def load_fields_present(
+                    self, data: t.Mapping[str, t.Any], *, partial: bool = False, fail_fast: bool = False,
+            ) -> t.Tuple[dict, t.FrozenSet[str]]:
+                """ Load a resource object field by field, visiting the members present in ``data``
+                first, then, unless ``partial``, the absent ones for required checks and defaults.
+
+                With ``fail_fast``, loading stops at the first invalid field. Returns the flattened data
+                and the names of the attributes and relationships present in ``data``.
+                """
+                if not isinstance(data, Mapping):
+                    raise ValidationError({'_schema': [self.error_messages['type']]}, data=data)
+
+                resource_fields, member_fields = self.get_fields_by_data_key()
+                ret = {}
+                touched = set()
+                errors = {}
+                for key, value in self._iter_fields(resource_fields, data, partial):
+                    if key not in resource_fields:
+                        errors[key] = [self.error_messages['unknown']]
+                    elif key in member_fields and value is not missing:
+                        member_errors = self._load_member(
+                            resource_fields[key][1], member_fields[key], value, ret, touched, partial, fail_fast,
+                        )
+                        if member_errors:
+                            errors[key] = member_errors
+                    else:
+                        attr_name, field = resource_fields[key]
+                        try:
+                            loaded = field.deserialize(value, key, data)
+                        except ValidationError as exc:
+                            errors[key] = exc.messages
+                        else:
+                            if loaded is not missing and key not in member_fields:
+                                ret[attr_name] = loaded
+                    if errors and fail_fast:
+                        break
+
+                ret.pop('type', None)
+                if errors:
+                    raise ValidationError(errors, data=data, valid_data=ret)
+                return ret, frozenset(touched)
+
+            @staticmethod
+            def _iter_fields(fields_map, value, partial):
+                """ Iterate over the present members of ``value``, then the absent fields unless ``partial``. """
+                yield from value.items()
+                if not partial:
+                    for key in fields_map:
+                        if key not in value:
+                            yield key, missing
+
+            def _load_member(self, member_field, nested_fields, value, ret, touched, partial, fail_fast):
+                """ Load the fields of ``attributes`` or ``relationships`` into ``ret``. """
+                if value is None:
+                    return [member_field.error_messages['null']]
+                if not isinstance(value, Mapping):
+                    return {'_schema': [self.error_messages['type']]}
+                errors = {}
+                # only members are optional, relationship objects and identifiers are complete
+                field_partial = (partial or None) if member_field.name == 'attributes' else None
+                for key, raw_value in self._iter_fields(nested_fields, value, partial):
+                    if key not in nested_fields:
+                        errors[key] = [self.error_messages['unknown']]
+                    else:
+                        attr_name, field = nested_fields[key]
+                        try:
+                            loaded = field.deserialize(raw_value, key, value, partial=field_partial)
+                        except ValidationError as exc:
+                            errors[key] = exc.messages
+                        else:
+                            if loaded is not missing:
+                                ret[attr_name] = loaded
+                            if raw_value is not missing:
+                                touched.add(attr_name)
+                    if errors and fail_fast:
+                        break
+                return errors
+
+            def dump_columns(self, columns: t.Mapping[str, t.Sequence[t.Any]]) -> t.List[dict]:
+                """ Dump resources held as columns, same as `dump` with ``many=True``.
+
+                ``columns`` maps ``id``, attribute and relationship names to sequences of values,
+                relationship columns holding the related id (or ids for to-many relationships),
+                ``(type, id)`` pairs for polymorphic relationships. Relationships with a ``count``
+                read the counts from the ``<relationship>.count`` column (e.g. ``teams.count``).
+                Values are serialized column by column, without building an object per row.
+                Fields serializing from the whole object (e.g. ``Method``) are not supported.
+                """
+                ids = columns['id']
+                id_field = self.fields['id']
+                ret = [{'id': id_field._serialize(value, 'id', None), 'type': cls.opts.type_} for value in ids]
+
+                if 'attributes' in self.fields:
+                    attributes = [{} for _ in ret]
+                    for attr_name, field in self.fields['attributes'].schema.dump_fields.items():
+                        data_key = field.data_key or attr_name
+                        column = columns.get(field.attribute or attr_name, missing)
+                        if column is missing:
+                            if field.dump_default is missing:
+                                continue
+                            default = field.dump_default
+                            column = [default() if callable(default) else default for _ in ret]
+                        for attributes_item, value in zip(attributes, column):
+                            attributes_item[data_key] = (
+                                value if type(value) is RawJSON else field._serialize(value, attr_name, None)
+                            )
+                    for ret_item, attributes_item in zip(ret, attributes):
+                        ret_item['attributes'] = attributes_item
+
+                if 'relationships' in self.fields:
+                    relationships = [{} for _ in ret]
+                    for rel_name, rel_field in self.fields['relationships'].schema.dump_fields.items():
+                        relationship = cls._declared_fields[rel_name]
+                        column = columns.get(relationship.attribute or rel_name)
+                        if column is None:
+                            if relationship.linkage:
+                                continue
+                            column = [()] * len(ret)
+                        counts = None
+                        if relationship.count:
+                            counts = columns.get(f'{relationship.attribute or rel_name}.count')
+                            if counts is None:
+                                raise ValueError(
+                                    f'Missing the {relationship.attribute or rel_name}.count column '
+                                    f'of the counted relationship {rel_name!r}.'
+                                )
+                        data_key = rel_field.data_key or rel_name
+                        for index, (relationships_item, related_ids) in enumerate(zip(relationships, column)):
+                            if related_ids is None:
+                                continue
+                            rel_data = relationship.get_linkage(related_ids)
+                            if counts is not None:
+                                rel_data['meta'] = {'count': counts[index]}
+                            rel_links = {}
+                            if relationship.related_url:
+                                related_url = relationship.format_url(
+                                    relationship.related_url,
+                                    resolve_column_params(columns, relationship.related_url_kwargs or {}, index),
+                                )
+                                if related_url:
+                                    rel_links['related'] = related_url
+                            if relationship.self_url:
+                                self_url = relationship.format_url(
+                                    relationship.self_url,
+                                    resolve_column_params(columns, relationship.self_url_kwargs or {}, index),
+                                )
+                                if self_url:
+                                    rel_links['self'] = self_url
+                            if rel_links:
+                                rel_data['links'] = rel_links
+                            if rel_data:
+                                relationships_item[data_key] = rel_data
+                    for ret_item, relationships_item in zip(ret, relationships):
+                        if relationships_item:
+                            ret_item['relationships'] = relationships_item
+
+                if self.opts.self_url:
+                    for index, ret_item in enumerate(ret):
+                        self_url_kwargs = resolve_column_params(columns, self.opts.self_url_kwargs or {}, index)
+                        self_url = generate_url(self.opts.self_url, **self_url_kwargs)
+                        if self_url:
+                            ret_item['links'] = {'self': self_url}
+                return ret
+
+            def dump_delta(
+                    self, obj: t.Any, previous: t.Optional[t.Mapping[str, t.Any]] = None,
+                    dirty: t.Optional[t.Iterable[str]] = None,
+            ) -> t.Optional[dict]:
+                """ Dump only the attributes and relationship linkage of ``obj`` that changed.
+
+                With ``dirty``, the names of the changed fields, only these fields are serialized.
+                With ``previous``, a snapshot of the resource object (e.g. the last one pushed or
+                a cached one), the fields equal to the snapshot are left out. Emptied relationships
+                are serialized with empty linkage. Returns `None` when nothing changed.
+                """
+                dirty = set(dirty) if dirty is not None else None
+                previous = previous or {}
+                ret = {}
+                with dump_state(self.context) as state:
+                    state.parent_obj = obj
+                    for member in ('attributes', 'relationships'):
+                        if member not in self.fields:
+                            continue
+                        member_schema = self.fields[member].schema
+                        previous_members = previous.get(member) or {}
+                        changes = {}
+                        for field_name, field in member_schema.dump_fields.items():
+                            if dirty is not None and field_name not in dirty:
+                                continue
+                            if member == 'relationships' and not cls._declared_fields[field_name].linkage:
+                                continue
+                            if member == 'attributes':
+                                value = member_schema.serialize_field(field_name, field, obj)
+                            else:
+                                value = field.serialize(field_name, obj, accessor=member_schema.get_attribute)
+                            if value is missing:
+                                continue
+                            data_key = field.data_key or field_name
+                            previous_value = previous_members.get(data_key, missing)
+                            if member == 'relationships':
+                                # compare linkage only, absent relationships of a snapshot are empty
+                                empty = [] if cls._declared_fields[field_name].many else None
+                                value = {'data': value['data'] if value is not None else empty}
+                                if previous_value is not missing:
+                                    previous_value = {'data': previous_value.get('data', empty)}
+                                elif previous:
+                                    previous_value = {'data': empty}
+                            if previous_value == value:
+                                continue
+                            changes[data_key] = value
+                        if changes:
+                            ret[member] = changes
+
+                if not ret:
+                    return None
+                return {
+                    'id': self.fields['id'].serialize(id_attr, obj, id_accessor),
+                    'type': cls.opts.type_,
+                    **ret,
+                }
+
             def dump(self, obj: t.Any, *args, **kwargs):
-                """ Overwrite to remove empty relationships. """
-                ret = super().dump(obj, *args, **kwargs)
+                """ Overwrite to remove empty relationships, and dump batches field-major with ``Meta.batch_dump``.
+
+                `RawJSON` objects are pre-serialized resources, dumped as is.
+                """
                 many = kwargs.get('many')
+                if type(obj) is RawJSON and not many:
+                    return obj
+                if many and obj is not None:
+                    obj = list(obj)
+                    if any(type(item) is RawJSON for item in obj):
+                        dumped = iter(self.dump([item for item in obj if type(item) is not RawJSON], *args, **kwargs))
+                        return [item if type(item) is RawJSON else next(dumped) for item in obj]
+                if many and self.opts.batch_dump and not args:
+                    return self.dump_batch(obj)
+                with dump_state(self.context) as state:
+                    ret = super().dump(obj, *args, **kwargs)
                 ret = ret if many else [ret]
+                self._finish_dump(ret, obj if many else [obj], state)
+                return ret if many else ret[0]
+
+            def dump_batch(self, objs: t.Iterable[t.Any]) -> t.List[dict]:
+                """ Dump ``objs`` field-major, same as `dump` with ``many=True``.
+
+                The values of each attribute are gathered for the whole batch then serialized
+                in one loop by the batch converter of the field (see `mjapi.converters`),
+                other fields and relationships are serialized object by object.
+                """
+                objs = list(objs)
+                id_field = self.fields['id']
+                with dump_state(self.context) as state:
+                    ret = [
+                        {'id': id_field.serialize(id_attr, obj, id_accessor), 'type': cls.opts.type_} for obj in objs
+                    ]
+                    if 'attributes' in self.fields:
+                        attributes = [{} for _ in objs]
+                        attributes_schema = self.fields['attributes'].schema
+                        for attr_name, field in attributes_schema.dump_fields.items():
+                            data_key = field.data_key or attr_name
+                            for attributes_item, value in zip(
+                                    attributes, self._serialize_batch(attributes_schema, attr_name, field, objs),
+                            ):
+                                if value is not missing:
+                                    attributes_item[data_key] = value
+                        for ret_item, attributes_item in zip(ret, attributes):
+                            ret_item['attributes'] = attributes_item
+                    if 'relationships' in self.fields:
+                        relationships_field = self.fields['relationships']
+                        for ret_item, obj in zip(ret, objs):
+                            relationships = relationships_field.serialize('relationships', obj, self.get_attribute)
+                            if relationships is not missing:
+                                ret_item['relationships'] = relationships
+                self._finish_dump(ret, objs, state)
+                return ret
+
+            @staticmethod
+            def _serialize_batch(schema: Schema, attr_name: str, field: fields.Field, objs: t.List[t.Any]) -> list:
+                """ Serialize the values of ``field`` for all the ``objs``, `missing` for the values left out. """
+                converter = get_batch_converter(field)
+                if converter is None or not field._CHECK_ATTRIBUTE:
+                    return [schema.serialize_field(attr_name, field, obj) for obj in objs]
+                attr = field.attribute or attr_name
+                values = [schema.get_attribute(obj, attr, missing) for obj in objs]
+                if field.dump_default is not missing:
+                    default = field.dump_default
+                    values = [
+                        (default() if callable(default) else default) if value is missing else value for value in values
+                    ]
+                present = [
+                    index for index, value in enumerate(values) if value is not missing and type(value) is not RawJSON
+                ]
+                if len(present) == len(values):
+                    return converter(field, values)
+                ret = [value if type(value) is RawJSON else missing for value in values]
+                for index, value in zip(present, converter(field, [values[index] for index in present])):
+                    ret[index] = value
+                return ret
 
-                for ret_item in ret:
+            def _finish_dump(self, ret: t.List[dict], objs: t.Sequence[t.Any], state: DumpState):
+                """ Remove empty relationships, add self links and resource digests to dumped resources. """
+                document_digest = state.document_digest
+                for ret_item, item_obj in zip(ret, objs):
                     ret_relationships = ret_item.pop('relationships', {})
                     for rel_name, rel_data in ret_relationships.copy().items():
-                        if rel_data is None:
+                        if not rel_data:
                             del ret_relationships[rel_name]
                     if ret_relationships:
                         ret_item['relationships'] = ret_relationships
                     if self.opts.self_url:
-                        self_url_kwargs = resolve_params(obj, self.opts.self_url_kwargs or {})
+                        self_url_kwargs = self_url_params(item_obj)
                         self_url = generate_url(self.opts.self_url, **self_url_kwargs)
                         if self_url:
                             ret_item['links'] = {
                                 'self': self_url,
                             }
-
-                return ret if many else ret[0]
+                    if document_digest is not None:
+                        cache_key = None
+                        if self.opts.digest_version:
+                            cache_key = (
+                                ret_item.get('type'), ret_item.get('id'),
+                                digest_version_accessor(item_obj, self.opts.digest_version, None),
+                                frozenset(self.only) if self.only else None,
+                            )
+                        document_digest.add_resource(ret_item, cache_key)
 
             OPTIONS_CLASS = JSONAPISchemaOpts
 
@@ -156,20 +726,36 @@ class JSONAPISchema(Schema):
     @classmethod
     def get_jsonapi_top_level_schema(cls, many: bool = False) -> t.Type[Schema]:
         resource_object_schema_cls = cls.get_jsonapi_resource_object_schema()
+        compound_resource_schemas = {}
+
+        def get_compound_schema_classes():
+            """ Map the types of the schemas reachable through relationships to their schema. """
+            schema_classes = {}
+            pending = [cls]
+            while pending:
+                schema_cls = pending.pop()
+                if schema_cls.opts.type_ in schema_classes:
+                    continue
+                schema_classes[schema_cls.opts.type_] = schema_cls
+                for field in schema_cls._declared_fields.values():
+                    if isinstance(field, RelationshipType):
+                        pending.extend(field.related_schema_classes)
+            return schema_classes
 
-        class TopLevelSchema(Schema):
+        class TopLevelSchema(BaseTopLevelSchema):
             class Meta(cls.Meta):
                 register = False
                 # order guarantees `data` is processed before `included`,
-                # thus populating `context` with `included_data`
+                # thus populating the dump state with `included_data`
                 ordered = True
 
             data = fields.Nested(resource_object_schema_cls)
             if many:
-                data = fields.List(data, dump_only=True)
-            errors = fields.List(fields.Nested(cls.error_object_schema), dump_only=True)
+                data = ResourceList(data) if cls.opts.batch_dump else fields.List(data)
+            errors = ErrorObjects(error_object_schema=cls.error_object_schema, dump_only=True)
             meta = fields.Dict(dump_only=True)
-            included = fields.List(fields.Dict(), dump_only=True)
+            # the resources are dumped already
+            included = fields.Raw(dump_only=True)
             jsonapi = fields.Nested(cls.jsonapi_object_schema, dump_only=True)
             links = fields.Nested(cls.links_object_schema, dump_only=True)
 
@@ -181,46 +767,320 @@ class JSONAPISchema(Schema):
                         new_only.append(f'data.{field_name}')
                     new_only += ['errors', 'meta', 'included', 'jsonapi', 'links']
                 super().__init__(only=new_only, **kwargs)
-                # normalize all relationships to be included
-                to_include = self.context.get('to_include', set())
-                new_to_include = set()
-                for item in to_include:
-                    item_split = item.split('.')
-                    new_to_include.update(item_split)
-                self.context['to_include'] = new_to_include
+                # the nested options are moved to the data schema by marshmallow
+                self.data_only = tuple(only) if only else None
 
-            def get_attribute(self, obj: t.Any, attr: str, default: t.Any):
-                if attr == 'data' and not isinstance(obj, Exception):
-                    return obj
-                elif attr == 'errors' and isinstance(obj, Exception):
-                    # TODO support multiple errors
-                    return [obj]
-                elif attr == 'included':
-                    included_data = self.context.get('included_data')
-                    if included_data:
-                        return list(included_data.values())
+            def get_fetch_plan(self, context: t.Optional[t.Mapping[str, t.Any]] = None) -> FetchPlan:
+                """ Return the plan of the attributes, relationships and link parameters read by a dump.
+
+                ``context`` updates the schema context like for `dump`, its ``to_include`` and
+                ``include_limits`` ``max_depth`` selecting the included relationships.
+                """
+                context = {**self.context, **(context or {})}
+                return build_fetch_plan(
+                    cls, only=self.data_only, to_include=context.get('to_include', ()),
+                    max_depth=(context.get('include_limits') or {}).get('max_depth'),
+                )
+
+            def load(self, data: t.Any, *args, fail_fast: bool = False, **kwargs):
+                """ Overwrite to check ``Meta.load_limits``, flatten data and resolve related objects.
+
+                With ``fail_fast``, loading stops at the first invalid field and reports only its error.
+                """
+                if cls.opts.load_limits:
+                    check_load_limits(data, cls.opts.load_limits)
+                if fail_fast:
+                    ret = self._load_fail_fast(data, partial=bool(kwargs.get('partial')))
+                else:
+                    ret = super().load(data, *args, **kwargs)
+                if many:
+                    ret = items = ret.pop('data', [])
+                else:
+                    ret.update(**ret.pop('data', {}))
+                    items = [ret]
+                self.resolve_related(data, items)
+                return ret
+
+            def _load_fail_fast(self, data: t.Any, partial: bool) -> dict:
+                """ Load ``data`` member by member, raising the first error found. """
+                if not isinstance(data, Mapping):
+                    raise ValidationError({'_schema': [self.error_messages['type']]}, data=data)
+                for key in data:
+                    if key != 'data':
+                        raise ValidationError({key: [self.error_messages['unknown']]}, data=data)
+                if 'data' not in data:
+                    return {}
+
+                data_field = self.fields['data']
+                value = data['data']
+                if many:
+                    resource_schema = data_field.inner.schema
+                    if not isinstance(value, (list, tuple)):
+                        raise ValidationError({'data': [data_field.error_messages['invalid']]}, data=data)
+                    items = []
+                    for index, item in enumerate(value):
+                        try:
+                            items.append(resource_schema.load_fields_present(item, partial=partial, fail_fast=True)[0])
+                        except ValidationError as exc:
+                            raise ValidationError({'data': {index: exc.messages}}, data=data) from exc
+                    return {'data': items}
+
+                if value is None:
+                    raise ValidationError({'data': [data_field.error_messages['null']]}, data=data)
+                try:
+                    return {'data': data_field.schema.load_fields_present(value, partial=partial, fail_fast=True)[0]}
+                except ValidationError as exc:
+                    raise ValidationError({'data': exc.messages}, data=data) from exc
+
+            def load_compound(self, data: t.Any) -> t.List[t.Dict[str, t.List[dict]]]:
+                """ Load a compound document creating several resources, the primary data and
+                the ``included`` resources, which relate to each other by ``id`` or local id (``lid``).
+
+                Included resources are validated by the schema of their type, among the schemas
+                reachable through relationships. Returns the loaded resources in dependency order:
+                a list of levels mapping types to resources, the resources of a level only relating
+                to resources of the previous levels, so that each level can be inserted in bulk.
+                Relationships to local ids are loaded as `LocalId`, batch loaders are not called.
+                """
+                if not isinstance(data, Mapping):
+                    raise ValidationError({'_schema': [self.error_messages['type']]}, data=data)
+                if cls.opts.load_limits:
+                    check_load_limits(data, cls.opts.load_limits)
+                errors = {
+                    key: [self.error_messages['unknown']] for key in data if key not in ('data', 'included')
+                }
+                data_field = self.fields['data']
+                primary = data.get('data', missing)
+                included = data.get('included', [])
+                if primary is missing:
+                    errors['data'] = [data_field.error_messages['required']]
+                elif many and not isinstance(primary, list):
+                    errors['data'] = [data_field.error_messages['invalid']]
+                elif not many and primary is None:
+                    errors['data'] = [data_field.error_messages['null']]
+                if not isinstance(included, list):
+                    errors['included'] = [fields.List.default_error_messages['invalid']]
+                if errors:
+                    raise ValidationError(errors, data=data)
+
+                def set_errors(path, messages):
+                    target = errors
+                    for key in path[:-1]:
+                        target = target.setdefault(key, {})
+                    target[path[-1]] = messages
+
+                schema_classes = get_compound_schema_classes()
+                # (path, schema, raw resource)
+                if many:
+                    entries = [(('data', index), cls, raw) for index, raw in enumerate(primary)]
+                else:
+                    entries = [(('data',), cls, primary)]
+                for index, raw in enumerate(included):
+                    schema_cls = schema_classes.get(raw.get('type')) if isinstance(raw, Mapping) else None
+                    entries.append((('included', index), schema_cls, raw))
+                # (path, type, resource schema, loaded item), indexed by resource key
+                resources = []
+                resource_keys = {}
+                for path, schema_cls, raw in entries:
+                    if schema_cls is None:
+                        set_errors(path, {'type': ['Invalid `type` specified']})
+                        continue
+                    resource_schema = compound_resource_schemas.get(schema_cls)
+                    if resource_schema is None:
+                        resource_schema = compound_resource_schemas[schema_cls] = (
+                            schema_cls.get_jsonapi_resource_object_schema(local_ids=True)()
+                        )
+                    try:
+                        item = resource_schema.load(raw)
+                    except ValidationError as exc:
+                        set_errors(path, exc.messages)
+                        continue
+                    type_ = schema_cls.opts.type_
+                    if 'lid' in item:
+                        key, member = ('lid', type_, item['lid']), 'lid'
+                    elif item.get('id') is not None:
+                        key, member = ('id', type_, item['id']), 'id'
                     else:
-                        return default
-                elif attr == 'meta':
-                    return self.context.get('top_level_meta', default)
-                elif attr == 'jsonapi':
-                    return self.context.get('jsonapi_info', default)
-                return default
+                        set_errors(path, {'id': [resource_schema.fields['id'].error_messages['required']]})
+                        continue
+                    if key in resource_keys:
+                        set_errors(path, {member: ['Duplicate resource.']})
+                        continue
+                    resource_keys[key] = len(resources)
+                    resources.append((path, type_, resource_schema, item))
 
-            def load(self, *args, **kwargs):
-                """ Overwrite to flatten data. """
-                ret = super().load(*args, **kwargs)
-                ret.update(**ret.pop('data', {}))
+                dependencies = [set() for _ in resources]
+                for index, (path, _, resource_schema, item) in enumerate(resources):
+                    for data_key, related_key in resource_schema.get_related_resource_keys(item):
+                        related_index = resource_keys.get(related_key)
+                        if related_index is None:
+                            if related_key[0] == 'lid':
+                                set_errors((*path, 'relationships', data_key), ['Unknown local id.'])
+                        elif related_index != index:
+                            dependencies[index].add(related_index)
+                if errors:
+                    raise ValidationError(errors, data=data)
+
+                # levels of a topological sort of the resources
+                dependents = [[] for _ in resources]
+                for index, resource_dependencies in enumerate(dependencies):
+                    for related_index in resource_dependencies:
+                        dependents[related_index].append(index)
+                pending_counts = [len(resource_dependencies) for resource_dependencies in dependencies]
+                level = [index for index, count in enumerate(pending_counts) if not count]
+                levels = []
+                sorted_count = 0
+                while level:
+                    sorted_count += len(level)
+                    levels.append(level)
+                    next_level = []
+                    for index in level:
+                        for dependent in dependents[index]:
+                            pending_counts[dependent] -= 1
+                            if not pending_counts[dependent]:
+                                next_level.append(dependent)
+                    level = sorted(next_level)
+                if sorted_count < len(resources):
+                    raise ValidationError(
+                        {'_schema': ['Circular relationships between the resources of the document.']}, data=data,
+                    )
+
+                ret = []
+                for level in levels:
+                    resources_by_type = {}
+                    for index in level:
+                        _, type_, _, item = resources[index]
+                        resources_by_type.setdefault(type_, []).append(item)
+                    ret.append(resources_by_type)
                 return ret
 
-            def dump(self, obj: t.Any, *args, **kwargs):
+            def resolve_related(self, data: t.Any, items: t.List[dict]):
+                """ Resolve related objects of loaded ``items``, see `ResourceObjectSchema.resolve_related`. """
+                resource_schema = self.fields['data'].inner.schema if many else self.fields['data'].schema
+                errors = resource_schema.resolve_related(items)
+                if errors:
+                    raise ValidationError(
+                        {'data': errors if many else errors[0]}, data=data,
+                        valid_data=items if many else items[0],
+                    )
+
+            def load_patch(self, data: t.Mapping[str, t.Any]) -> t.Tuple[dict, t.FrozenSet[str]]:
+                """ Load a PATCH document, see `ResourceObjectSchema.load_patch`. """
+                if many:
+                    raise TypeError('PATCH documents can only be loaded for a single resource.')
+                if cls.opts.load_limits:
+                    check_load_limits(data, cls.opts.load_limits)
+                if not isinstance(data, Mapping):
+                    raise ValidationError({'_schema': [self.error_messages['type']]}, data=data)
+                errors = {
+                    key: [self.error_messages['unknown']] for key in data if key != 'data'
+                }
+                if 'data' not in data:
+                    errors['data'] = [self.fields['data'].error_messages['required']]
+                if errors:
+                    raise ValidationError(errors, data=data)
+                try:
+                    ret, touched = self.fields['data'].schema.load_patch(data['data'])
+                except ValidationError as exc:
+                    raise ValidationError({'data': exc.messages}, data=data, valid_data=exc.valid_data) from exc
+                self.resolve_related(data, [ret])
+                return ret, touched
+
+            def dump_with_digest(
+                    self, obj: t.Any, *, cache: t.Optional[t.MutableMapping[tuple, bytes]] = None,
+                    context: t.Optional[t.Mapping[str, t.Any]] = None,
+            ) -> t.Tuple[dict, str]:
+                """ Dump ``obj`` and compute the content digest of the document, usable as an ETag.
+
+                The digest is built from the digests of the resources, computed as they are dumped
+                and reused from ``cache`` for resource types defining ``Meta.digest_version``.
+                """
+                with dump_state(self.context, context, new=True) as state:
+                    state.document_digest = DocumentDigest(cache)
+                    ret = self._dump(obj, state)
+                return ret, state.document_digest.hexdigest(ret)
+
+            def dump(
+                    self, obj: t.Any, *args, context: t.Optional[t.Mapping[str, t.Any]] = None,
+                    executor: t.Optional[concurrent.futures.Executor] = None, **kwargs,
+            ):
+                """ Overwrite to dump with a new dump state.
+
+                ``context`` updates the schema context for this call only, so that a schema instance
+                can be shared, including between threads, and still dump different included data.
+
+                With an ``executor`` (e.g. a `concurrent.futures.ThreadPoolExecutor`), the relationships
+                of the primary objects, then level by level those of all the included objects, are read
+                concurrently before being serialized, for relationships backed by blocking I/O (see
+                `mjapi.fields.prefetch_included`). The document is the same as without executor.
+                """
+                with dump_state(self.context, context, new=True) as state:
+                    state.executor = executor
+                    return self._dump(obj, state, *args, **kwargs)
+
+            def dump_to(
+                    self, fp: t.BinaryIO, obj: t.Any, *, context: t.Optional[t.Mapping[str, t.Any]] = None,
+                    executor: t.Optional[concurrent.futures.Executor] = None,
+            ):
+                """ Dump ``obj`` and write the document encoded to JSON into the binary file ``fp``.
+
+                Unlike `dump`, the included resources are not part of the document in memory: they are
+                written last, one at a time, as encoded by the ``included_store`` of the dump context
+                (see `mjapi.included.SpillingIncludedStore`). ``context`` and ``executor`` are the same
+                as in `dump`.
+                """
+                with dump_state(self.context, context, new=True) as state:
+                    state.executor = executor
+                    state.stream_included = True
+                    ret = dumps(self._dump(obj, state), separators=(',', ':'), ensure_ascii=False).encode()
+                    if not len(state.included_data):
+                        fp.write(ret)
+                        return
+                    fp.write(ret[:-1] + (b',"included":[' if len(ret) > 2 else b'"included":['))
+                    for index, fragment in enumerate(state.included_data.fragments()):
+                        if index:
+                            fp.write(b',')
+                        fp.write(fragment)
+                    fp.write(b']}')
+
+            def dump_compact(self, obj: t.Any, *args, **kwargs) -> dict:
+                """ Dump ``obj`` into the compact representation of the document, see `mjapi.compact`. """
+                return compact.encode(self.dump(obj, *args, **kwargs))
+
+            def load_compact(self, data: t.Mapping[str, t.Any], *args, **kwargs):
+                """ Load the compact representation of a document, see `mjapi.compact`. """
+                return self.load(compact.decode(data), *args, **kwargs)
+
+            def _dump(self, obj: t.Any, state: DumpState, *args, **kwargs):
+                if many and obj is not None and not isinstance(obj, (list, Exception)):
+                    # iterators are read again for the primary keys and the pagination
+                    obj = list(obj)
+                if state.executor is not None and obj is not None and not isinstance(obj, Exception):
+                    prefetch_included(cls, obj if many else [obj], state, only=self.data_only)
+                if state.to_include and not isinstance(obj, Exception):
+                    # primary data is never repeated in included
+                    id_field = cls._declared_fields['id']
+                    id_accessor = cls.get_accessor(id_field.attribute or 'id')
+                    state.primary_keys = {
+                        (cls.opts.type_, id_field.serialize('id', item, id_accessor))
+                        for item in (obj if many else [obj]) if item is not None and type(item) is not RawJSON
+                    }
                 ret = super().dump(obj, *args, **kwargs)
+                if state.include_truncated:
+                    ret['meta'] = {**ret.get('meta', {}), 'included_truncated': state.include_truncated}
                 if many:
                     if cls.opts.self_url_many:
                         ret['links'] = {'self': generate_url(cls.opts.self_url_many)}
+                    if cls.opts.pagination_urls and not isinstance(obj, Exception):
+                        pagination_links, page_meta = generate_pagination(
+                            cls, obj, cls.opts.pagination_urls, cls.opts.pagination_sort_keys,
+                            state.context.get('pagination'),
+                        )
+                        ret['links'] = {**ret.get('links', {}), **pagination_links}
+                        ret['meta'] = {**ret.get('meta', {}), 'page': page_meta}
                 else:
-                    if cls.opts.self_url:
-                        self_url = ret.get('data', {}).get('links', {}).get('self', None)
+                    if cls.opts.self_url and isinstance(ret.get('data'), dict):
+                        self_url = ret['data'].get('links', {}).get('self', None)
                         if self_url:
                             ret['links'] = {'self': self_url}
                 return ret
@@ -228,3 +1088,123 @@ class JSONAPISchema(Schema):
             OPTIONS_CLASS = JSONAPISchemaOpts
 
         return TopLevelSchema
+
+    @classmethod
+    def get_jsonapi_relationship_document_schema(cls, relationship_name: str) -> t.Type[Schema]:
+        """ Build the schema of the top-level documents of a relationship endpoint
+        (e.g. ``/users/{id}/relationships/teams``), holding only the resource linkage and links.
+
+        The document is dumped from the parent object, loading returns the related id(s),
+        or the related object(s) when the relationship has a ``batch_loader``.
+        """
+        relationship = cls._declared_fields.get(relationship_name)
+        if not isinstance(relationship, RelationshipType):
+            raise ValueError(f'`{relationship_name}` is not a relationship of {cls.__name__}.')
+        relationship_schema_cls = relationship.get_jsonapi_relationship_schema(relationship_name, parent_schema_cls=cls)
+        relationship_attr = relationship.attribute or relationship_name
+        relationship_accessor = cls.get_accessor(relationship_attr)
+        resource_schema = cls.get_jsonapi_resource_object_schema()()
+
+        class RelationshipDocumentSchema(relationship_schema_cls):
+            meta = fields.Dict(dump_only=True)
+            jsonapi = fields.Nested(cls.jsonapi_object_schema, dump_only=True)
+
+            def get_attribute(self, obj: t.Any, attr: str, default: t.Any):
+                if attr == 'meta':
+                    return get_dump_state().context.get('top_level_meta', default)
+                elif attr == 'jsonapi':
+                    return get_dump_state().context.get('jsonapi_info', default)
+                return super().get_attribute(obj, attr, default)
+
+            def load(self, data: t.Any, *args, **kwargs):
+                """ Overwrite to check ``Meta.load_limits`` and resolve related objects with the
+                ``batch_loader`` of the relationship.
+                """
+                if cls.opts.load_limits:
+                    check_load_limits(data, cls.opts.load_limits, relationship=True)
+                ret = super().load(data, *args, **kwargs)
+                if relationship.batch_loader is None or ret is None:
+                    return ret
+                item = {relationship_attr: ret}
+                errors = resource_schema.resolve_related([item])
+                if errors:
+                    # the item only holds this relationship
+                    [rel_errors] = errors[0]['relationships'].values()
+                    raise ValidationError(rel_errors, data=data, valid_data=item[relationship_attr])
+                return item[relationship_attr]
+
+            def dump(self, obj: t.Any, *args, context: t.Optional[t.Mapping[str, t.Any]] = None, **kwargs):
+                """ Overwrite to dump the relationship of the parent ``obj`` with a new dump state. """
+                with dump_state(self.context, context, new=True) as state:
+                    state.parent_obj = obj
+                    related = relationship_accessor(obj, relationship_attr, None) if relationship.linkage else obj
+                    if related is None and relationship.many:
+                        related = []
+                    return super().dump(related, *args, **kwargs)
+
+        return RelationshipDocumentSchema
+
+    @classmethod
+    def get_jsonapi_mixed_top_level_schema(
+            cls, schema_classes: t.Sequence[t.Type['JSONAPISchema']], many: bool = True,
+    ) -> t.Type[Schema]:
+        """ Build the schema of top-level documents whose primary data mixes resources of ``schema_classes``.
+
+        Objects are dumped with the schema of their ``Meta.model``, resource objects are loaded
+        with the schema of their ``type``, kept in the loaded data. ``cls`` provides the schemas
+        of the other top-level members.
+        """
+        dispatcher = SchemaDispatcher(schema_classes)
+
+        class MixedTopLevelSchema(BaseTopLevelSchema):
+            class Meta:
+                register = False
+                ordered = True
+
+            data = PolymorphicResource(dispatcher=dispatcher)
+            if many:
+                data = fields.List(data)
+            errors = ErrorObjects(error_object_schema=cls.error_object_schema, dump_only=True)
+            meta = fields.Dict(dump_only=True)
+            # the resources are dumped already
+            included = fields.Raw(dump_only=True)
+            jsonapi = fields.Nested(cls.jsonapi_object_schema, dump_only=True)
+            links = fields.Nested(cls.links_object_schema, dump_only=True)
+
+            def load(self, data: t.Any, *args, **kwargs):
+                """ Overwrite to check the ``Meta.load_limits`` of ``cls``, flatten data and resolve
+                related objects per resource type.
+                """
+                if cls.opts.load_limits:
+                    check_load_limits(data, cls.opts.load_limits)
+                ret = super().load(data, *args, **kwargs)
+                items = ret.pop('data', []) if many else [ret.pop('data', None)]
+                items_by_type = {}
+                for index, item in enumerate(items):
+                    if item is not None:
+                        items_by_type.setdefault(item['type'], []).append((index, item))
+                errors = {}
+                for type_, indexed_items in items_by_type.items():
+                    resource_schema = dispatcher.get_resource_schema(dispatcher.by_type[type_])
+                    type_errors = resource_schema.resolve_related([item for _, item in indexed_items])
+                    for item_index, item_errors in type_errors.items():
+                        errors[indexed_items[item_index][0]] = item_errors
+                if errors:
+                    raise ValidationError(
+                        {'data': errors if many else errors[0]}, data=data, valid_data=items if many else items[0],
+                    )
+                return items if many else items[0]
+
+            def dump(self, obj: t.Any, *args, context: t.Optional[t.Mapping[str, t.Any]] = None, **kwargs):
+                """ Overwrite to dump with a new dump state, see `TopLevelSchema.dump`. """
+                with dump_state(self.context, context, new=True) as state:
+                    if state.to_include and not isinstance(obj, Exception):
+                        state.primary_keys = {
+                            dispatcher.get_key(item) for item in (obj if many else [obj]) if item is not None
+                        }
+                    ret = super().dump(obj, *args, **kwargs)
+                if state.include_truncated:
+                    ret['meta'] = {**ret.get('meta', {}), 'included_truncated': state.include_truncated}
+                return ret
+
+        return MixedTopLevelSchema
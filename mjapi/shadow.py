@@ -0,0 +1,267 @@
+"""
+Shadow mode verification of optimized serialization paths against their reference implementation.
+
+A `ShadowVerifier` serves the result of the optimized path and, for a sample of the calls,
+also runs the reference path on the same input, compares both results deeply and records
+the mismatches with a minimal reproducer, along with the time spent by each path::
+
+    verifier = ShadowVerifier(sample_rate=0.01)
+    resources = verifier.verify(
+        'users.columns',
+        lambda rows: schema.dump(rows, many=True),
+        lambda rows: schema.dump_columns(to_columns(rows)),
+        rows,
+    )
+    verifier.report()
+
+`generate_objects` builds random object graphs from the declared fields of a schema,
+to verify the optimized paths in tests.
+"""
+
+import datetime as dt
+import random as random_module
+import string
+import threading
+import time
+import typing as t
+import types
+import uuid
+
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+
+if t.TYPE_CHECKING:
+    from mjapi.schemas import JSONAPISchema
+
+# path of a difference, made of keys and indexes
+Path = t.Tuple[t.Union[str, int], ...]
+
+
+class Difference(t.NamedTuple):
+    path: Path
+    expected: t.Any
+    actual: t.Any
+
+
+class Mismatch(t.NamedTuple):
+    name: str
+    # smallest input found reproducing the mismatch
+    reproducer: t.Any
+    differences: t.List[Difference]
+    # exception raised while verifying the input, e.g. by the reference path
+    error: t.Optional[Exception] = None
+
+
+class ShadowStats:
+    """Samples, mismatches, errors and cumulated run times of the paths verified under a name."""
+
+    def __init__(self):
+        self.samples = 0
+        self.mismatches = 0
+        self.errors = 0
+        self.reference_time = 0.0
+        self.optimized_time = 0.0
+
+    @property
+    def speedup(self) -> t.Optional[float]:
+        if not self.optimized_time:
+            return None
+        return self.reference_time / self.optimized_time
+
+
+_missing = object()
+
+
+def diff(expected: t.Any, actual: t.Any, path: Path = ()) -> t.List[Difference]:
+    """Compare ``expected`` with ``actual`` deeply, returning the differences by path.
+
+    Mappings are compared by key regardless of order, sequences item by item.
+    """
+    if isinstance(expected, t.Mapping) and isinstance(actual, t.Mapping):
+        differences = []
+        for key in {**expected, **actual}:
+            differences += diff(expected.get(key, _missing), actual.get(key, _missing), (*path, key))
+        return differences
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        differences = []
+        for index in range(max(len(expected), len(actual))):
+            expected_item = expected[index] if index < len(expected) else _missing
+            actual_item = actual[index] if index < len(actual) else _missing
+            differences += diff(expected_item, actual_item, (*path, index))
+        return differences
+    if type(expected) is not type(actual) or expected != actual:
+        return [Difference(
+            path,
+            None if expected is _missing else expected,
+            None if actual is _missing else actual,
+        )]
+    return []
+
+
+class ShadowVerifier:
+    """Run a reference and an optimized implementation side by side on sampled inputs.
+
+    ``sample_rate`` is the fraction of the calls also running the reference path, at most
+    ``max_mismatches`` mismatches are kept. Verifiers can be shared between threads.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, *, max_mismatches: int = 100, seed: t.Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.max_mismatches = max_mismatches
+        self.stats: t.Dict[str, ShadowStats] = {}
+        self.mismatches: t.List[Mismatch] = []
+        self._random = random_module.Random(seed)
+        self._lock = threading.Lock()
+
+    def verify(
+            self, name: str, reference: t.Callable[[t.Any], t.Any], optimized: t.Callable[[t.Any], t.Any],
+            value: t.Any,
+    ) -> t.Any:
+        """Return ``optimized(value)``, comparing it with ``reference(value)`` for sampled calls.
+
+        The mismatches of sequence inputs are reduced to the first item mismatching on its own.
+        The exceptions raised while verifying, e.g. by the reference path, are recorded as
+        errors of the mismatch instead of being raised, the optimized result is always returned.
+        """
+        if self.sample_rate < 1 and self._random.random() >= self.sample_rate:
+            return optimized(value)
+
+        start = time.perf_counter()
+        actual = optimized(value)
+        optimized_time = time.perf_counter() - start
+
+        reference_time = 0.0
+        mismatch = None
+        try:
+            start = time.perf_counter()
+            expected = reference(value)
+            reference_time = time.perf_counter() - start
+            differences = diff(expected, actual)
+            if differences:
+                mismatch = self.reduce(name, reference, optimized, value, differences)
+        except Exception as exc:
+            mismatch = Mismatch(name, value, [], exc)
+        with self._lock:
+            stats = self.stats.setdefault(name, ShadowStats())
+            stats.samples += 1
+            stats.reference_time += reference_time
+            stats.optimized_time += optimized_time
+            if mismatch is not None:
+                if mismatch.error is not None:
+                    stats.errors += 1
+                else:
+                    stats.mismatches += 1
+                if len(self.mismatches) < self.max_mismatches:
+                    self.mismatches.append(mismatch)
+        return actual
+
+    @staticmethod
+    def reduce(
+            name: str, reference: t.Callable[[t.Any], t.Any], optimized: t.Callable[[t.Any], t.Any],
+            value: t.Any, differences: t.List[Difference],
+    ) -> Mismatch:
+        """Build the mismatch of ``value``, reduced to a single item for lists of inputs."""
+        if isinstance(value, list) and len(value) > 1:
+            for item in value:
+                item_differences = diff(reference([item]), optimized([item]))
+                if item_differences:
+                    return Mismatch(name, [item], item_differences)
+        return Mismatch(name, value, differences)
+
+    def report(self) -> t.Dict[str, dict]:
+        """Return the samples, mismatches, errors, time spent and speedup of the optimized path, per name."""
+        with self._lock:
+            return {
+                name: {
+                    'samples': stats.samples,
+                    'mismatches': stats.mismatches,
+                    'errors': stats.errors,
+                    'reference_time': stats.reference_time,
+                    'optimized_time': stats.optimized_time,
+                    'speedup': stats.speedup,
+                }
+                for name, stats in self.stats.items()
+            }
+
+
+def _random_string(rnd: random_module.Random) -> str:
+    alphabet = string.ascii_letters + string.digits + ' éß€'
+    return ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12)))
+
+
+# generators of random values per field class, looked up along the field class MRO
+VALUE_GENERATORS: t.Dict[t.Type[fields.Field], t.Callable[[random_module.Random], t.Any]] = {
+    fields.Email: lambda rnd: f'user{rnd.randint(0, 10 ** 6)}@example.com',
+    fields.URL: lambda rnd: f'https://example.com/{rnd.randint(0, 10 ** 6)}',
+    fields.UUID: lambda rnd: uuid.UUID(int=rnd.getrandbits(128)),
+    fields.String: _random_string,
+    fields.Boolean: lambda rnd: rnd.random() < 0.5,
+    fields.Integer: lambda rnd: rnd.randint(-10 ** 9, 10 ** 9),
+    fields.Float: lambda rnd: rnd.uniform(-10 ** 6, 10 ** 6),
+    fields.Decimal: lambda rnd: rnd.randint(-10 ** 6, 10 ** 6),
+    fields.DateTime: lambda rnd: dt.datetime(2000, 1, 1) + dt.timedelta(seconds=rnd.randint(0, 10 ** 9)),
+    fields.Date: lambda rnd: dt.date(2000, 1, 1) + dt.timedelta(days=rnd.randint(0, 10 ** 4)),
+    fields.Dict: lambda rnd: {_random_string(rnd): rnd.randint(0, 100) for _ in range(rnd.randint(0, 3))},
+}
+
+
+def generate_value(field: fields.Field, rnd: random_module.Random) -> t.Any:
+    """Generate a random value for ``field``, `None` for the field classes without a generator."""
+    if isinstance(field, fields.List):
+        return [generate_value(field.inner, rnd) for _ in range(rnd.randint(0, 3))]
+    for field_cls in type(field).__mro__:
+        generator = VALUE_GENERATORS.get(field_cls)
+        if generator is not None:
+            return generator(rnd)
+    return None
+
+
+def generate_objects(
+        schema_cls: t.Type['JSONAPISchema'], count: int, *, seed: t.Optional[int] = None, depth: int = 2,
+        max_related: int = 3,
+) -> t.List[t.Any]:
+    """Generate ``count`` random objects with the declared fields of ``schema_cls``.
+
+    Related objects are generated from the related schemas down to ``depth`` levels, to-many
+    relationships holding up to ``max_related`` objects, and are shared between the objects
+    of a type so that the graphs contain repeated and cyclic references. Empty relationships
+    and `None` attributes (unless required) are generated too. Objects are instances of the
+    ``Meta.model`` of their schema, without calling its ``__init__``, or of `types.SimpleNamespace`.
+    """
+    rnd = random_module.Random(seed)
+    pools: t.Dict[str, t.List[types.SimpleNamespace]] = {}
+
+    def generate(cls, level):
+        model = cls.opts.model
+        obj = model.__new__(model) if model else types.SimpleNamespace()
+        pool = pools.setdefault(cls.opts.type_, [])
+        obj_id = f'{cls.opts.type_}-{len(pool)}'
+        pool.append(obj)
+        for field_name, field in cls._declared_fields.items():
+            attr = field.attribute or field_name
+            if field_name == 'id':
+                value = obj_id
+            elif isinstance(field, RelationshipType):
+                value = [] if field.many else None
+                if level < depth:
+                    related = [
+                        get_related(rnd.choice(field.related_schema_classes), level + 1)
+                        for _ in range(rnd.randint(0, max_related))
+                    ]
+                    value = related if field.many else (related[0] if related else None)
+            elif not field.required and not field.dump_only and rnd.random() < 0.1:
+                value = None
+            else:
+                value = generate_value(field, rnd)
+            setattr(obj, attr, value)
+        return obj
+
+    def get_related(cls, level):
+        pool = pools.get(cls.opts.type_)
+        # reuse an existing object half of the time
+        if pool and rnd.random() < 0.5:
+            return rnd.choice(pool)
+        return generate(cls, level)
+
+    return [generate(schema_cls, 0) for _ in range(count)]
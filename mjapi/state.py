@@ -0,0 +1,100 @@
+"""
+Per-call dump state.
+
+The state of a dump (included data, include budgets, the object owning the relationships
+being serialized, ...) is kept in a context variable rather than on the schema instances,
+so a single schema instance can be used concurrently from several threads or asyncio tasks.
+"""
+
+import concurrent.futures
+import contextlib
+import contextvars
+import typing as t
+
+from marshmallow import Schema
+
+from mjapi.included import IncludedStore, MemoryIncludedStore
+
+
+class DumpState:
+    """State of a single dump, shared by the top level schema and all the nested schemas.
+
+    ``context`` is the read-only dump configuration: the schema context, updated with the
+    context passed to the dump call (``to_include``, ``include_limits``, ``top_level_meta``,
+    ``jsonapi_info``, ``pagination``, ``included_store``, the factory of the `IncludedStore`
+    of the dump, ``resource_memo``, a mapping of ``(schema class, type, id)`` to included
+    resources shared between dumps, see `mjapi.batch`).
+    """
+
+    def __init__(self, context: t.Mapping[str, t.Any]):
+        self.context = context
+        # normalize all relationships to be included
+        self.to_include = set()
+        for item in context.get('to_include', ()):
+            self.to_include.update(item.split('.'))
+        self.include_limits = context.get('include_limits') or {}
+
+        self.parent_obj = None
+        self.included_data: IncludedStore = context.get('included_store', MemoryIncludedStore)()
+        # whether the included resources are written after the document, see `TopLevelSchema.dump_to`
+        self.stream_included = False
+        self.resource_memo: t.Optional[t.MutableMapping[tuple, dict]] = context.get('resource_memo')
+        self.include_truncated = {}
+        self.include_deadline = None
+        self.include_depth = 0
+        self.primary_keys = set()
+        self.document_digest = None
+        # executor reading the relationships concurrently and the values read, see `mjapi.fields.prefetch_relationships`
+        self.executor: t.Optional[concurrent.futures.Executor] = None
+        self.prefetched: t.Dict[t.Tuple[int, str], t.Tuple[t.Any, t.Any]] = {}
+
+
+_current_state: contextvars.ContextVar[t.Optional[DumpState]] = contextvars.ContextVar(
+    'mjapi_dump_state', default=None,
+)
+
+
+def get_dump_state() -> t.Optional[DumpState]:
+    """Return the state of the dump in progress, if any."""
+    return _current_state.get()
+
+
+@contextlib.contextmanager
+def dump_state(
+        context: t.Mapping[str, t.Any], call_context: t.Optional[t.Mapping[str, t.Any]] = None,
+        new: bool = False,
+) -> t.Iterator[DumpState]:
+    """Enter the state of a dump.
+
+    The state of the dump in progress is reused unless ``new`` is set, otherwise a new
+    state is created from ``context`` updated with ``call_context``.
+    """
+    state = _current_state.get()
+    if state is not None and not new:
+        yield state
+        return
+    state = DumpState({**context, **call_context} if call_context else context)
+    token = _current_state.set(state)
+    try:
+        yield state
+    finally:
+        _current_state.reset(token)
+        state.included_data.close()
+
+
+class DumpContextSchema(Schema):
+    """Schema whose ``context`` is the context of the dump in progress, if any.
+
+    ``Function`` and ``Method`` fields thus read the context passed to the dump call, including
+    in the schemas of the included resources, which are shared between dumps.
+    """
+
+    @property
+    def context(self) -> t.Mapping[str, t.Any]:
+        state = _current_state.get()
+        return state.context if state is not None else self._context
+
+    @context.setter
+    def context(self, value: t.Mapping[str, t.Any]):
+        # copied, nested schemas can be created with the context of a dump in progress
+        self._context = dict(value)
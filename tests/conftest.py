@@ -5,6 +5,7 @@ from marshmallow import class_registry, fields
 
 from mjapi.schemas import JSONAPISchema
 from mjapi.fields import RelationshipType
+from tests.models import Project, Team, User, camelize
 
 
 @pytest.fixture(autouse=True)
@@ -13,22 +14,6 @@ def cleanup_marshmallow_registry():
     class_registry._registry.clear()  # noqa
 
 
-class Team:
-    def __init__(self, id: str, name: str):
-        self.id = id
-        self.name = name
-
-
-class User:
-    def __init__(self, id: str, name: str, email: str, referrer: 'User' = None, teams: t.List[Team] = None):
-        self.id: str = id
-        self.name: str = name
-        self.email: str = email
-
-        self.referrer = referrer
-        self.teams = teams
-
-
 @pytest.fixture()
 def team_schema_cls() -> t.Type[JSONAPISchema]:
     class TeamSchema(JSONAPISchema):
@@ -138,3 +123,74 @@ def user_schema_cls_links(team_schema_cls) -> t.Type[JSONAPISchema]:
         )
 
     return UserSchema
+
+
+@pytest.fixture()
+def user_schema_cls_pagination(team_schema_cls) -> t.Type[JSONAPISchema]:
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            self_url_many = '/api/v1/users/'
+            pagination_urls = {
+                'first': '/api/v1/users/?page[size]={size}',
+                'prev': '/api/v1/users/?page[size]={size}&page[before]={cursor}',
+                'next': '/api/v1/users/?page[size]={size}&page[after]={cursor}',
+            }
+            pagination_sort_keys = ('name', 'id')
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+        email = fields.Email()
+
+    return UserSchema
+
+
+@pytest.fixture()
+def user_schema_cls_inflect(team_schema_cls) -> t.Type[JSONAPISchema]:
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            inflect = camelize
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+        email_address = fields.Email(attribute='email', required=True)
+
+        # relationships
+        referred_by = RelationshipType(related_schema='UserSchema', attribute='referrer')
+        team_list = RelationshipType(related_schema=team_schema_cls, many=True, attribute='teams')
+
+    return UserSchema
+
+
+@pytest.fixture()
+def project_schema_cls(user_schema_cls, team_schema_cls) -> t.Type[JSONAPISchema]:
+    class ModelUserSchema(user_schema_cls):
+        class Meta:
+            type_ = 'users'
+            model = User
+
+    class ModelTeamSchema(team_schema_cls):
+        class Meta:
+            type_ = 'teams'
+            model = Team
+
+    class ProjectSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'projects'
+            model = Project
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+
+        # relationships
+        owner = RelationshipType(related_schema=[ModelUserSchema, ModelTeamSchema], allow_none=True)
+        members = RelationshipType(related_schema=(ModelUserSchema, ModelTeamSchema), many=True)
+
+    return ProjectSchema
@@ -0,0 +1,34 @@
+"""
+Models of the objects dumped and loaded by the tests.
+"""
+
+import typing as t
+
+
+class Team:
+    def __init__(self, id: str, name: str):
+        self.id = id
+        self.name = name
+
+
+class User:
+    def __init__(self, id: str, name: str, email: str, referrer: 'User' = None, teams: t.List[Team] = None):
+        self.id: str = id
+        self.name: str = name
+        self.email: str = email
+
+        self.referrer = referrer
+        self.teams = teams
+
+
+class Project:
+    def __init__(self, id: str, name: str, owner: t.Union[User, Team, None] = None, members: t.List[t.Any] = ()):
+        self.id = id
+        self.name = name
+        self.owner = owner
+        self.members = list(members)
+
+
+def camelize(value: str) -> str:
+    first, *others = value.split('_')
+    return first + ''.join(other.capitalize() for other in others)
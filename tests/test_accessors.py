@@ -0,0 +1,108 @@
+import collections
+import typing as t
+
+import pytest
+from marshmallow import fields, missing
+
+from mjapi.accessors import ATTRIBUTE, INDEX, MAPPING, make_accessor
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+UserRow = collections.namedtuple('UserRow', ['id', 'name', 'email', 'referrer'])
+
+
+@pytest.mark.parametrize('strategy, obj', [
+    (ATTRIBUTE, UserRow('u1', 'user-1', None, None)),
+    (INDEX, ('u1', 'user-1')),
+    (MAPPING, {'id': 'u1', 'name': 'user-1'}),
+    (None, {'id': 'u1', 'name': 'user-1'}),
+])
+def test_make_accessor(strategy, obj):
+    row_fields = ['id', 'name', 'email']
+    assert make_accessor(strategy, 'name', row_fields)(obj, 'name', missing) == 'user-1'
+    assert make_accessor(strategy, 'unknown', row_fields)(obj, 'unknown', missing) is missing
+
+
+@pytest.mark.parametrize('strategy, obj', [
+    (ATTRIBUTE, collections.namedtuple('Row', ['meta'])(collections.namedtuple('Meta', ['created'])('2022-01-01'))),
+    (MAPPING, {'meta': {'created': '2022-01-01'}}),
+    (None, {'meta': {'created': '2022-01-01'}}),
+])
+def test_make_accessor_dotted(strategy, obj):
+    assert make_accessor(strategy, 'meta.created')(obj, 'meta.created', missing) == '2022-01-01'
+    assert make_accessor(strategy, 'meta.updated')(obj, 'meta.updated', missing) is missing
+    assert make_accessor(strategy, 'meta.created.year')(obj, 'meta.created.year', missing) is missing
+
+
+def test_make_accessor_unknown_strategy():
+    with pytest.raises(ValueError):
+        make_accessor('unknown', 'name')
+
+
+@pytest.fixture(params=[ATTRIBUTE, INDEX, MAPPING])
+def accessor_user_schema_cls(request) -> t.Type[JSONAPISchema]:
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            accessor = request.param
+            row_fields = ('id', 'name', 'email', 'referrer')
+            self_url = '/api/v1/users/{id}'
+            self_url_kwargs = {'id': '<id>'}
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+        email = fields.Email()
+
+        # relationships
+        referrer = RelationshipType(
+            related_schema='UserSchema',
+            related_url='/api/v1/users/{id}/referrer',
+            related_url_kwargs={'id': '<id>'},
+        )
+
+    return UserSchema
+
+
+def test_accessor_dump(accessor_user_schema_cls):
+    strategy = accessor_user_schema_cls.opts.accessor
+    first_user = UserRow('u1', 'user-1', 'user-1@test.local', None)
+    second_user = UserRow('u2', 'user-2', 'user-2@test.local', first_user)
+    if strategy == INDEX:
+        first_user, second_user = tuple(first_user), (*second_user[:3], tuple(first_user))
+    elif strategy == MAPPING:
+        first_user = first_user._asdict()
+        second_user = {**second_user._asdict(), 'referrer': first_user}
+
+    top_level_schema = accessor_user_schema_cls.get_jsonapi_top_level_schema()
+    serialized = top_level_schema(context={'to_include': {'referrer'}}).dump(second_user)
+    assert serialized == {
+        'data': {
+            'id': 'u2',
+            'type': 'users',
+            'attributes': {
+                'name': 'user-2',
+                'email': 'user-2@test.local',
+            },
+            'relationships': {
+                'referrer': {
+                    'data': {'id': 'u1', 'type': 'users'},
+                    'links': {'related': '/api/v1/users/u2/referrer'},
+                },
+            },
+            'links': {'self': '/api/v1/users/u2'},
+        },
+        'included': [
+            {
+                'id': 'u1',
+                'type': 'users',
+                'attributes': {
+                    'name': 'user-1',
+                    'email': 'user-1@test.local',
+                },
+                'links': {'self': '/api/v1/users/u1'},
+            },
+        ],
+        'links': {'self': '/api/v1/users/u2'},
+    }
@@ -0,0 +1,100 @@
+from marshmallow import fields
+
+from mjapi.batch import DumpJob, dump_documents
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+
+def test_dump_documents(user_schema_cls, team_schema_cls, user_1, user_3, user_4, team_1):
+    jobs = [
+        DumpJob(user_schema_cls, [user_3, user_4], many=True, to_include=['teams', 'referrer']),
+        DumpJob(user_schema_cls, user_4, only=['name', 'referrer'], to_include=['referrer.teams']),
+        DumpJob(team_schema_cls, team_1),
+    ]
+
+    memo = {}
+
+    documents = dump_documents(jobs, memo=memo)
+
+    # same documents as dumped one by one
+    assert documents == [
+        user_schema_cls.get_jsonapi_top_level_schema(many=True)().dump(
+            [user_3, user_4], context={'to_include': ['teams', 'referrer']},
+        ),
+        user_schema_cls.get_jsonapi_top_level_schema()(only=['name', 'referrer']).dump(
+            user_4, context={'to_include': ['referrer.teams']},
+        ),
+        team_schema_cls.get_jsonapi_top_level_schema()().dump(team_1),
+    ]
+    # the primary resources of the first document are reused by the second
+    assert memo[(user_schema_cls, 'users', 'u3')] is documents[0]['data'][0]
+
+
+def test_dump_documents_serializes_shared_resources_once(user_schema_cls, team_1, user_3):
+    serialized = []
+
+    class TeamSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'teams'
+
+        id = fields.String()
+        name = fields.Function(lambda obj: serialized.append(obj.id) or obj.name)
+
+    class ProjectSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'projects'
+
+        id = fields.String()
+        owner = RelationshipType(related_schema=user_schema_cls)
+        team = RelationshipType(related_schema=TeamSchema)
+
+    class Project:
+        def __init__(self, id, owner, team):
+            self.id = id
+            self.owner = owner
+            self.team = team
+
+    projects = [Project(str(index), user_3, team_1) for index in range(3)]
+    memo = {}
+
+    documents = dump_documents(
+        [DumpJob(ProjectSchema, project, to_include=['owner', 'team']) for project in projects], memo=memo,
+    )
+
+    assert serialized == ['t1']
+    assert set(memo) == {
+        (ProjectSchema, 'projects', '0'), (ProjectSchema, 'projects', '1'), (ProjectSchema, 'projects', '2'),
+        (user_schema_cls, 'users', 'u3'), (TeamSchema, 'teams', 't1'),
+    }
+    for document in documents:
+        assert {(resource['type'], resource['id']) for resource in document['included']} == {
+            ('users', 'u3'), ('teams', 't1'),
+        }
+
+    # memoized resources include their related resources with the accessors compiled once
+    def get_accessor(attr):
+        raise AssertionError(f'accessor of {attr!r} compiled again')
+
+    user_schema_cls.get_accessor = get_accessor
+    documents = dump_documents([DumpJob(ProjectSchema, projects[0], to_include=['owner.teams'])], memo=memo)
+    assert {(resource['type'], resource['id']) for resource in documents[0]['included']} == {
+        ('users', 'u3'), ('teams', 't1'), ('teams', 't2'),
+    }
+
+
+def test_dump_documents_memo_per_schema(user_schema_cls, user_1, user_2):
+    class PublicUserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+
+        id = fields.String()
+        name = fields.String()
+
+    jobs = [DumpJob(PublicUserSchema, user_1), DumpJob(user_schema_cls, user_2, to_include=['referrer'])]
+
+    documents = dump_documents(jobs)
+
+    assert documents[1] == user_schema_cls.get_jsonapi_top_level_schema()().dump(
+        user_2, context={'to_include': ['referrer']},
+    )
+    assert documents[1]['included'][0]['attributes'] == {'name': user_1.name, 'email': user_1.email}
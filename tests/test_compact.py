@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from mjapi import compact
+
+
+def test_compact_round_trip(user_schema_cls_links, user_1, user_2, user_3, user_4):
+    schema = user_schema_cls_links.get_jsonapi_top_level_schema(many=True)(
+        context={'to_include': ['teams', 'referrer'], 'top_level_meta': {'total': 4}},
+    )
+    document = schema.dump([user_1, user_2, user_3, user_4])
+
+    encoded = schema.dump_compact([user_1, user_2, user_3, user_4])
+
+    assert compact.decode(json.loads(json.dumps(encoded))) == document
+    assert compact.loads(compact.dumps(document)) == document
+    assert len(compact.dumps(document)) < len(json.dumps(document, separators=(',', ':')))
+    # types and ids are stored once
+    assert encoded[compact.STRINGS].count('users') == 1
+    assert encoded[compact.STRINGS].count('u1') == 1
+    assert encoded[compact.OTHER] == {'links': {'self': '/api/v1/users/'}, 'meta': {'total': 4}}
+
+
+def test_compact_load(user_schema_cls, user_3):
+    schema = user_schema_cls.get_jsonapi_top_level_schema()()
+
+    assert schema.load_compact(schema.dump_compact(user_3)) == schema.load(schema.dump(user_3))
+
+
+@pytest.mark.parametrize('document', [
+    {'data': None},
+    {'data': []},
+    {'errors': [{'status': '422', 'detail': 'Invalid.', 'source': {'pointer': '/data'}}]},
+    {'data': {'type': 'users', 'id': 'u1', 'attributes': {}, 'relationships': {}}},
+    {'data': [{'type': 'users', 'lid': 'new'}, {'type': 'users', 'id': 1, 'attributes': None}]},
+    {'data': [
+        {'type': 'users', 'id': 'u1', 'attributes': {'name': 'a', 'tags': ['x']}, 'meta': {'rank': 1}},
+        {'type': 'users', 'id': 'u2', 'attributes': {'tags': [], 'name': None}},
+        {'type': 'users', 'id': 'u3', 'attributes': {'name': 'c', 'tags': None}, 'links': {'self': 'u3'}},
+    ]},
+    {'data': {'type': 'users', 'id': 'u1', 'relationships': {
+        'referrer': {'data': None},
+        'teams': {'data': [], 'meta': {'count': 12}, 'links': {'related': '/users/u1/teams'}},
+        'owner': {'data': {'type': 'teams', 'id': 't1', 'meta': {'role': 'admin'}}},
+        'members': {'data': [{'type': 'teams', 'id': 't1'}, {'type': 'users', 'id': 'u2'}]},
+    }}},
+])
+def test_compact_round_trip_members(document):
+    assert compact.loads(compact.dumps(document)) == document
+
+
+def test_compact_version():
+    with pytest.raises(ValueError):
+        compact.decode({'v': compact.VERSION + 1})
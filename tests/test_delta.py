@@ -0,0 +1,46 @@
+from mjapi.delta import apply_delta
+
+
+def test_dump_delta_previous(user_schema_cls, user_1, user_2, team_1):
+    schema = user_schema_cls.get_jsonapi_resource_object_schema()()
+    snapshot = schema.dump(user_2)
+    assert schema.dump_delta(user_2, previous=snapshot) is None
+
+    user_2.email = 'changed@test.local'
+    user_2.referrer = None
+    user_2.teams = [team_1]
+    delta = schema.dump_delta(user_2, previous=snapshot)
+    assert delta == {
+        'id': user_2.id,
+        'type': 'users',
+        'attributes': {
+            'email': 'changed@test.local',
+        },
+        'relationships': {
+            'referrer': {'data': None},
+            'teams': {'data': [{'id': team_1.id, 'type': 'teams'}]},
+        },
+    }
+    assert apply_delta(snapshot, delta) == schema.dump(user_2)
+
+
+def test_dump_delta_dirty(user_schema_cls, user_1, user_2):
+    schema = user_schema_cls.get_jsonapi_resource_object_schema()()
+    snapshot = schema.dump(user_2)
+
+    user_2.name = 'changed'
+    user_2.email = 'changed@test.local'
+    # only the dirty fields are serialized
+    assert schema.dump_delta(user_2, dirty={'name'}) == {
+        'id': user_2.id,
+        'type': 'users',
+        'attributes': {
+            'name': 'changed',
+        },
+    }
+    assert schema.dump_delta(user_2, previous=snapshot, dirty={'referrer'}) is None
+
+
+def test_dump_delta_without_previous(user_schema_cls, user_3):
+    schema = user_schema_cls.get_jsonapi_resource_object_schema()()
+    assert apply_delta(None, schema.dump_delta(user_3)) == schema.dump(user_3)
@@ -0,0 +1,68 @@
+import typing as t
+
+import pytest
+from marshmallow import fields
+
+from mjapi.digest import canonical_json, resource_digest
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+
+
+@pytest.fixture()
+def versioned_user_schema_cls(team_schema_cls) -> t.Type[JSONAPISchema]:
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            digest_version = 'name'
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+        email = fields.Email()
+
+        # relationships
+        referrer = RelationshipType(related_schema='UserSchema')
+        teams = RelationshipType(related_schema=team_schema_cls, many=True)
+
+    return UserSchema
+
+
+def test_canonical_json_is_order_independent():
+    assert canonical_json({'b': 1, 'a': [1, 2]}) == canonical_json({'a': [1, 2], 'b': 1}) == b'{"a":[1,2],"b":1}'
+
+
+def test_dump_with_digest(user_schema_cls, user_1, user_2):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    serialized, digest = top_level_schema().dump_with_digest([user_1, user_2])
+    assert serialized == top_level_schema().dump([user_1, user_2])
+    assert digest == top_level_schema().dump_with_digest([user_1, user_2])[1]
+
+    assert digest != top_level_schema().dump_with_digest([user_2, user_1])[1]
+    user_2.email = 'changed@test.local'
+    assert digest != top_level_schema().dump_with_digest([user_1, user_2])[1]
+
+
+def test_dump_with_digest_included(user_schema_cls, user_1, user_2):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    _, digest = top_level_schema().dump_with_digest(user_2)
+    _, digest_included = top_level_schema(context={'to_include': {'referrer'}}).dump_with_digest(user_2)
+    assert digest != digest_included
+
+
+def test_dump_with_digest_reuses_cache(versioned_user_schema_cls, user_1, user_2):
+    top_level_schema = versioned_user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    cache = {}
+    serialized, digest = top_level_schema().dump_with_digest([user_1, user_2], cache=cache)
+    assert cache == {
+        ('users', user_1.id, user_1.name, None): resource_digest(serialized['data'][0]),
+        ('users', user_2.id, user_2.name, None): resource_digest(serialized['data'][1]),
+    }
+
+    # the same version is assumed to have the same representation
+    user_2.email = 'changed@test.local'
+    assert top_level_schema().dump_with_digest([user_1, user_2], cache=cache)[1] == digest
+    # a new version is hashed again
+    user_2.name = 'changed'
+    assert top_level_schema().dump_with_digest([user_1, user_2], cache=cache)[1] != digest
+    assert len(cache) == 3
@@ -0,0 +1,33 @@
+from marshmallow import ValidationError
+
+from mjapi.errors import validation_error_objects
+
+
+def test_validation_error_objects():
+    error = ValidationError({
+        '_schema': ['Invalid input type.'],
+        'data': {
+            'attributes': {'email': ['Not a valid email address.'], 'a/b~c': ['Unknown field.']},
+            'relationships': {'teams': {'data': {1: {'type': ['Invalid `type` specified']}}}},
+        },
+    })
+    assert validation_error_objects(error) == [
+        {'status': '422', 'detail': 'Invalid input type.', 'source': {'pointer': ''}},
+        {'status': '422', 'detail': 'Not a valid email address.', 'source': {'pointer': '/data/attributes/email'}},
+        {'status': '422', 'detail': 'Unknown field.', 'source': {'pointer': '/data/attributes/a~1b~0c'}},
+        {
+            'status': '422',
+            'detail': 'Invalid `type` specified',
+            'source': {'pointer': '/data/relationships/teams/data/1/type'},
+        },
+    ]
+
+
+def test_validation_error_objects_pointer():
+    error = ValidationError({'id': ['Missing data for required field.']})
+    assert validation_error_objects(error, status='400', pointer='/data') == [
+        {'status': '400', 'detail': 'Missing data for required field.', 'source': {'pointer': '/data/id'}},
+    ]
+    assert validation_error_objects(ValidationError('Invalid.')) == [
+        {'status': '422', 'detail': 'Invalid.', 'source': {'pointer': ''}},
+    ]
@@ -2,7 +2,8 @@ import pytest
 
 from marshmallow import ValidationError, missing
 
-from mjapi.fields import RelationshipType
+from mjapi.fields import RelationshipType, prefetched
+from mjapi.state import dump_state
 
 
 def test_relationship_load_data_single(team_schema_cls):
@@ -101,3 +102,13 @@ def test_relationship_load_empty_data(team_schema_cls):
             'type': ['Missing data for required field.'],
         }
     }
+
+
+def test_prefetched_accessor_checks_identity(user_1, user_3):
+    accessor = prefetched(lambda obj, attr, default=missing: getattr(obj, attr, default))
+    with dump_state({}) as state:
+        state.prefetched[(id(user_3), 'teams')] = (user_3, ['prefetched'])
+        # entry left by another object of the same id
+        state.prefetched[(id(user_1), 'teams')] = (object(), ['stale'])
+        assert accessor(user_3, 'teams') == ['prefetched']
+        assert accessor(user_1, 'teams') == user_1.teams
@@ -0,0 +1,51 @@
+import functools
+import io
+import json
+
+from mjapi.included import MemoryIncludedStore, SpillingIncludedStore
+
+
+def test_spilling_included_store():
+    store = SpillingIncludedStore(max_bytes=60)
+    resources = [{'id': str(index), 'type': 'users', 'attributes': {'name': f'User {index}'}} for index in range(5)]
+    for resource in resources:
+        store.reserve(('users', resource['id']))
+    store.reserve(('users', 'unfinished'))
+    for resource in reversed(resources):
+        store.add(('users', resource['id']), resource)
+
+    assert len(store) == 6
+    assert ('users', '3') in store
+    assert ('users', '9') not in store
+    assert 0 < store.memory_bytes <= 60
+    assert store.spilled_bytes > 0
+    # emitted in the order the keys were reserved
+    assert list(store.resources()) == resources
+    store.close()
+
+
+def test_included_store_in_dump(user_schema_cls, user_3, user_4):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    context = {'to_include': {'referrer', 'teams'}}
+    expected = top_level_schema().dump([user_3, user_4], context={**context, 'included_store': MemoryIncludedStore})
+    for max_bytes in (0, 100, 10 ** 6):
+        included_store = functools.partial(SpillingIncludedStore, max_bytes=max_bytes)
+        assert top_level_schema().dump(
+            [user_3, user_4], context={**context, 'included_store': included_store},
+        ) == expected
+    assert len(expected['included']) == 3
+
+
+def test_included_store_dump_to(user_schema_cls, user_3, user_4):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    context = {'to_include': {'referrer', 'teams'}}
+    expected = top_level_schema().dump([user_3, user_4], context=context)
+    for included_store in (MemoryIncludedStore, functools.partial(SpillingIncludedStore, max_bytes=100)):
+        fp = io.BytesIO()
+        top_level_schema().dump_to(fp, [user_3, user_4], context={**context, 'included_store': included_store})
+        assert json.loads(fp.getvalue()) == expected
+
+    fp = io.BytesIO()
+    top_level_schema().dump_to(fp, [user_4])
+    assert json.loads(fp.getvalue()) == top_level_schema().dump([user_4])
+    assert 'included' not in json.loads(fp.getvalue())
@@ -0,0 +1,34 @@
+import pytest
+from marshmallow import ValidationError
+
+from mjapi.limits import check_load_limits
+
+
+def test_check_load_limits_max_depth():
+    document = {'data': {'id': '1', 'type': 'users', 'attributes': {'name': {'nested': [1]}}}}
+    check_load_limits(document, {'max_depth': 5})
+    with pytest.raises(ValidationError) as excinfo:
+        check_load_limits(document, {'max_depth': 4})
+    assert excinfo.value.messages == {
+        'data': {'attributes': {'name': {'nested': ['Nested deeper than 4 levels.']}}},
+    }
+
+
+def test_check_load_limits_single_resource():
+    document = {
+        'data': {
+            'id': '1',
+            'type': 'users',
+            'relationships': {'teams': {'data': [{'id': 't1', 'type': 'teams'}, {'id': 't2', 'type': 'teams'}]}},
+        },
+    }
+    check_load_limits(document, {'max_resources': 1, 'max_linkage': 2, 'max_string_length': 5})
+    with pytest.raises(ValidationError) as excinfo:
+        check_load_limits(document, {'max_linkage': 1})
+    assert excinfo.value.messages == {
+        'data': {'relationships': {'teams': {'data': ['Too many related resources, the maximum is 1.']}}},
+    }
+
+
+def test_check_load_limits_not_a_document():
+    check_load_limits(['x' * 10], {'max_string_length': 1})
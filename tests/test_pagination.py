@@ -0,0 +1,64 @@
+import pytest
+
+from mjapi.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(['user-1', 'u1', 3])
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ['user-1', 'u1', 3]
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', encode_cursor(['a'])[:-2], 'eyJhIjoxfQ'])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_top_level_schema_pagination(user_schema_cls_pagination, user_1, user_2):
+    top_level_schema = user_schema_cls_pagination.get_jsonapi_top_level_schema(many=True)
+    serialized = top_level_schema(
+        context={'pagination': {'has_prev': False, 'url_kwargs': {'size': 2}}},
+    ).dump([user_1, user_2])
+
+    last_cursor = encode_cursor([user_2.name, user_2.id])
+    assert serialized['links'] == {
+        'self': '/api/v1/users/',
+        'first': '/api/v1/users/?page[size]=2',
+        'prev': None,
+        'next': f'/api/v1/users/?page[size]=2&page[after]={last_cursor}',
+    }
+    assert serialized['meta'] == {
+        'page': {
+            'first_cursor': encode_cursor([user_1.name, user_1.id]),
+            'last_cursor': last_cursor,
+        },
+    }
+    assert decode_cursor(last_cursor) == [user_2.name, user_2.id]
+
+
+def test_top_level_schema_pagination_empty_page(user_schema_cls_pagination):
+    top_level_schema = user_schema_cls_pagination.get_jsonapi_top_level_schema(many=True)
+    serialized = top_level_schema(
+        context={'top_level_meta': {'total': 0}, 'pagination': {'url_kwargs': {'size': 2}}},
+    ).dump([])
+    assert serialized['links'] == {
+        'self': '/api/v1/users/',
+        'first': '/api/v1/users/?page[size]=2',
+        'prev': None,
+        'next': None,
+    }
+    assert serialized['meta'] == {'total': 0, 'page': {'first_cursor': None, 'last_cursor': None}}
+
+
+def test_top_level_schema_pagination_generator(user_schema_cls_pagination, user_1, user_2, user_3):
+    top_level_schema = user_schema_cls_pagination.get_jsonapi_top_level_schema(many=True)(
+        context={'to_include': ['referrer'], 'pagination': {'url_kwargs': {'size': 3}}},
+    )
+
+    serialized = top_level_schema.dump(user for user in [user_1, user_2, user_3])
+
+    assert serialized == top_level_schema.dump([user_1, user_2, user_3])
+    assert serialized['meta']['page']['last_cursor'] == encode_cursor([user_3.name, user_3.id])
+    # user_1 is primary data, not included
+    assert 'included' not in serialized
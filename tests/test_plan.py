@@ -0,0 +1,87 @@
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+from mjapi.plan import RELATED_IDS, RELATED_NONE, RELATED_OBJECTS, FetchPlan, TypePlan, build_fetch_plan
+from mjapi.schemas import JSONAPISchema
+
+
+def test_fetch_plan_without_include(user_schema_cls):
+    plan = user_schema_cls.get_jsonapi_top_level_schema()().get_fetch_plan()
+
+    assert plan == FetchPlan(
+        types={
+            'users': TypePlan(
+                attributes=frozenset({'id', 'name', 'email'}),
+                relationships={'referrer': RELATED_IDS, 'teams': RELATED_IDS},
+                link_params=frozenset(),
+            ),
+        },
+        include_paths=(),
+    )
+
+
+def test_fetch_plan_only_and_include(user_schema_cls):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)(
+        only=['name', 'teams'], context={'to_include': ['teams']},
+    )
+
+    plan = top_level_schema.get_fetch_plan()
+
+    assert plan.types['users'] == TypePlan(frozenset({'id', 'name'}), {'teams': RELATED_OBJECTS}, frozenset())
+    assert plan.types['teams'] == TypePlan(frozenset({'id', 'name'}), {}, frozenset())
+    assert plan.include_paths == ('teams',)
+
+
+def test_fetch_plan_nested_include_stops_at_cycles(user_schema_cls):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()(only=['name', 'referrer'])
+
+    plan = top_level_schema.get_fetch_plan(context={'to_include': ['referrer.referrer']})
+
+    # the included users are dumped with all their fields, then the cycle stops
+    assert plan.types['users'].attributes == {'id', 'name', 'email'}
+    assert plan.types['users'].relationships == {'referrer': RELATED_OBJECTS, 'teams': RELATED_IDS}
+    assert plan.include_paths == ('referrer', 'referrer.referrer')
+
+
+def test_fetch_plan_max_depth(user_schema_cls):
+    plan = build_fetch_plan(user_schema_cls, only=['referrer'], to_include=['referrer'], max_depth=1)
+
+    assert plan.include_paths == ('referrer',)
+    plan = user_schema_cls.get_jsonapi_top_level_schema()().get_fetch_plan(
+        context={'to_include': ['teams'], 'include_limits': {'max_depth': 0}},
+    )
+
+    assert plan.include_paths == ()
+    assert plan.types['users'].relationships['teams'] == RELATED_IDS
+    assert 'teams' not in plan.types
+
+
+def test_fetch_plan_link_params(team_schema_cls):
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            self_url = '/users/{id}'
+            self_url_kwargs = {'id': '<id>'}
+
+        id = fields.String()
+        name = fields.String(attribute='full_name')
+        teams = RelationshipType(
+            related_schema=team_schema_cls, many=True, linkage=False,
+            related_url='/orgs/{org}/users/{id}/teams', related_url_kwargs={'org': '<org_id>', 'id': '<id>'},
+        )
+
+    plan = build_fetch_plan(UserSchema)
+
+    assert plan.types['users'] == TypePlan(
+        attributes=frozenset({'id', 'full_name'}),
+        relationships={'teams': RELATED_NONE},
+        link_params=frozenset({'id', 'org_id'}),
+    )
+
+
+def test_fetch_plan_polymorphic(project_schema_cls):
+    plan = project_schema_cls.get_jsonapi_top_level_schema()().get_fetch_plan(context={'to_include': ['owner']})
+
+    assert plan.include_paths == ('owner',)
+    assert plan.types['projects'].relationships == {'owner': RELATED_OBJECTS, 'members': RELATED_IDS}
+    assert {'users', 'teams'} <= set(plan.types)
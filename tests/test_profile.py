@@ -0,0 +1,95 @@
+import json
+import textwrap
+
+import pytest
+
+from mjapi.profile import main
+
+SAMPLE_MODULE = '''
+from marshmallow import fields
+
+from mjapi.fields import RelationshipType
+from mjapi.schemas import JSONAPISchema
+from tests.models import Team, User
+
+
+class TeamSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'teams'
+
+    id = fields.String()
+    name = fields.String()
+
+
+class UserSchema(JSONAPISchema):
+    class Meta:
+        type_ = 'users'
+
+    id = fields.String()
+    name = fields.String()
+    email = fields.Email()
+    referrer = RelationshipType(related_schema='UserSchema')
+    teams = RelationshipType(related_schema=TeamSchema, many=True)
+
+
+def users():
+    first_user = User('u1', 'user-1', 'user-1@test.local', teams=[Team('t1', 'team-1')])
+    return [first_user, User('u2', 'user-2', 'user-2@test.local', referrer=first_user)]
+'''
+
+
+@pytest.fixture()
+def sample_module(tmp_path, monkeypatch):
+    (tmp_path / 'profile_sample.py').write_text(textwrap.dedent(SAMPLE_MODULE))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return 'profile_sample'
+
+
+def test_profile_dump_and_load(sample_module, tmp_path, capsys):
+    report_path = tmp_path / 'report.json'
+    exit_code = main([
+        f'{sample_module}:UserSchema', '--factory', f'{sample_module}:users',
+        '--include', 'referrer.teams', '--repeat', '3', '--top', '5', '--report', str(report_path),
+    ])
+    assert exit_code == 0
+
+    report = json.loads(report_path.read_text())
+    assert report['mode'] == 'both'
+    assert set(report['dump']['phases']) == {'dump', 'encode', 'build'}
+    assert set(report['load']['phases']) == {'decode', 'load'}
+    assert report['dump']['resources'] == report['load']['resources'] == 2
+    assert len(report['dump']['hotspots']) == 5
+    assert report['load']['throughput'] > 0
+
+    output = capsys.readouterr().out
+    assert 'DUMP' in output and 'LOAD' in output
+
+
+def test_profile_load_input(sample_module, tmp_path, capsys):
+    input_path = tmp_path / 'sample.json'
+    input_path.write_text(json.dumps({'data': {'id': 'u1', 'type': 'users', 'attributes': {'name': 'user-1'}}}))
+    assert main([f'{sample_module}:UserSchema', '--input', str(input_path), '--repeat', '2']) == 0
+    output = capsys.readouterr().out
+    assert 'LOAD' in output and 'DUMP' not in output
+
+
+def test_profile_load_factory(sample_module, tmp_path, capsys):
+    report_path = tmp_path / 'report.json'
+    exit_code = main([
+        f'{sample_module}:UserSchema', '--factory', f'{sample_module}:users', '--mode', 'load',
+        '--repeat', '2', '--report', str(report_path),
+    ])
+    assert exit_code == 0
+
+    report = json.loads(report_path.read_text())
+    assert 'dump' not in report
+    assert report['load']['resources'] == 2
+    output = capsys.readouterr().out
+    assert 'LOAD' in output and 'DUMP' not in output
+
+
+def test_profile_requires_payload(sample_module):
+    with pytest.raises(SystemExit):
+        main([f'{sample_module}:UserSchema'])
+    with pytest.raises(SystemExit):
+        main([f'{sample_module}:UserSchema', '--input', 'sample.json', '--mode', 'dump'])
@@ -0,0 +1,84 @@
+import datetime as dt
+import json
+
+import pytest
+from marshmallow import fields
+
+from mjapi import raw
+from mjapi.batch import DumpJob, dump_documents
+from mjapi.included import SpillingIncludedStore
+from mjapi.raw import RawJSON
+from mjapi.schemas import JSONAPISchema
+from tests.models import User
+
+
+def test_dumps():
+    fragment = RawJSON(b'{"b": [1, 2],  "a": null}')
+
+    assert raw.dumps({'x': fragment, 'y': [fragment, '__raw_json__']}) == (
+        '{"x": {"b": [1, 2],  "a": null}, "y": [{"b": [1, 2],  "a": null}, "__raw_json__"]}'
+    )
+    assert raw.dumps({'x': dt.date(2022, 1, 1)}, default=str) == '{"x": "2022-01-01"}'
+    with pytest.raises(TypeError):
+        raw.dumps({'x': dt.date(2022, 1, 1)})
+
+
+@pytest.mark.parametrize('use_batch_dump', [False, True])
+def test_raw_attributes(use_batch_dump):
+    class SettingsSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'settings'
+            batch_dump = use_batch_dump
+
+        id = fields.String()
+        name = fields.String()
+        value = fields.Dict()
+
+    schema = SettingsSchema.get_jsonapi_top_level_schema(many=True)()
+    settings = [
+        {'id': '1', 'name': RawJSON('"theme"'), 'value': RawJSON('{"dark": true}')},
+        {'id': '2', 'name': 'lang', 'value': {'code': 'en'}},
+    ]
+
+    document = schema.dump(settings)
+
+    assert document['data'][0]['attributes'] == {'name': RawJSON('"theme"'), 'value': RawJSON('{"dark": true}')}
+    assert json.loads(raw.dumps(document)) == {'data': [
+        {'id': '1', 'type': 'settings', 'attributes': {'name': 'theme', 'value': {'dark': True}}},
+        {'id': '2', 'type': 'settings', 'attributes': {'name': 'lang', 'value': {'code': 'en'}}},
+    ]}
+
+    # the field classes are left as declared
+    resource_schema = SettingsSchema.get_jsonapi_resource_object_schema()()
+    assert type(resource_schema.fields['attributes'].schema.fields['value']) is fields.Dict
+    columns = {key: [setting[key] for setting in settings] for key in ('id', 'name', 'value')}
+    assert resource_schema.dump_columns(columns) == document['data']
+
+
+def test_raw_resources(user_schema_cls, team_schema_cls, user_1, user_3):
+    cached_user = RawJSON('{"type": "users", "id": "u9", "attributes": {"name": "user-9"}}')
+    cached_team = RawJSON('{"type": "teams", "id": "t1", "attributes": {"name": "cached"}}')
+    schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)()
+
+    [document] = dump_documents(
+        [DumpJob(user_schema_cls, [user_1, cached_user, user_3], many=True, to_include=['teams'])],
+        memo={(team_schema_cls, 'teams', 't1'): cached_team},
+        context={'included_store': lambda: SpillingIncludedStore(max_bytes=0)},
+    )
+
+    expected = schema.dump([user_1, user_3], context={'to_include': ['teams']})
+    expected['data'].insert(1, cached_user)
+    expected['included'][0] = cached_team
+    # replayed from the spilling store, the cached team is still embedded verbatim
+    assert document == expected
+    assert json.loads(raw.dumps(document))['included'][0] == cached_team.load()
+
+
+def test_raw_single_resource(user_schema_cls_links):
+    schema = user_schema_cls_links.get_jsonapi_top_level_schema()()
+    cached_user = RawJSON('{"type": "users", "id": "u9"}')
+
+    assert schema.dump(cached_user) == {'data': cached_user}
+    assert schema.dump(User(id='u1', name='user-1', email='user-1@test.local'))['links'] == {
+        'self': '/api/v1/users/u1',
+    }
@@ -1,5 +1,14 @@
+import concurrent.futures
+import datetime as dt
+import threading
+import time
+
 import pytest
-from marshmallow import ValidationError
+from marshmallow import ValidationError, fields
+
+from mjapi.fields import LocalId, RelationshipType
+from mjapi.schemas import JSONAPISchema
+from tests.models import Project, User, camelize
 
 
 def test_team_schema_jsonapi_simple(team_schema_cls, team_1):
@@ -724,3 +733,915 @@ def test_top_level_included_related_to_other_links(user_schema_cls_links, team_1
             }
         }
     ]
+
+
+def test_top_level_schema_load_patch(user_schema_cls_required_fields, user_1):
+    top_level_schema = user_schema_cls_required_fields.get_jsonapi_top_level_schema()
+    deserialized, touched = top_level_schema().load_patch(
+        {
+            'data': {
+                'id': user_1.id,
+                'type': 'users',
+                'attributes': {
+                    'email': user_1.email,
+                },
+            }
+        }
+    )
+    assert deserialized == {'id': user_1.id, 'email': user_1.email}
+    assert touched == {'email'}
+
+    deserialized, touched = top_level_schema().load_patch(
+        {
+            'data': {
+                'id': user_1.id,
+                'type': 'users',
+                'relationships': {
+                    'teams': {'data': []},
+                },
+            }
+        }
+    )
+    assert deserialized == {'id': user_1.id, 'teams': []}
+    assert touched == {'teams'}
+
+
+def test_top_level_schema_load_patch_matches_partial_load(user_schema_cls_required_fields, user_1, user_2):
+    top_level_schema = user_schema_cls_required_fields.get_jsonapi_top_level_schema()
+    document = {
+        'data': {
+            'id': user_2.id,
+            'type': 'users',
+            'attributes': {
+                'name': user_2.name,
+            },
+            'relationships': {
+                'teams': {'data': [{'id': 't1', 'type': 'teams'}]},
+            },
+        }
+    }
+    deserialized, touched = top_level_schema().load_patch(document)
+    assert deserialized == top_level_schema().load(document, partial=True)
+    assert touched == {'name', 'teams'}
+
+
+def test_top_level_schema_load_patch_errors(user_schema_cls_required_fields, user_1):
+    top_level_schema = user_schema_cls_required_fields.get_jsonapi_top_level_schema()
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_patch(
+            {
+                'data': {
+                    'id': user_1.id,
+                    'type': 'users',
+                    'attributes': {
+                        'email': 'invalid',
+                        'unknown': 'value',
+                    },
+                    'relationships': {
+                        'referrer': {'data': {'id': 'u2', 'type': 'teams'}},
+                    },
+                }
+            }
+        )
+    assert excinfo.value.messages == {
+        'data': {
+            'attributes': {
+                'email': ['Not a valid email address.'],
+                'unknown': ['Unknown field.'],
+            },
+            'relationships': {
+                'referrer': {'data': {'type': ['Invalid `type` specified']}},
+            },
+        }
+    }
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_patch({})
+    assert excinfo.value.messages == {'data': ['Missing data for required field.']}
+
+    # only the members are optional, relationship objects and identifiers must be complete
+    for relationships, messages in (
+            ({'referrer': {}}, {'referrer': {'data': ['Missing data for required field.']}}),
+            (
+                {'referrer': {'data': {'type': 'users'}}},
+                {'referrer': {'data': {'id': ['Missing data for required field.']}}},
+            ),
+            (
+                {'teams': {'data': [{'type': 'teams'}]}},
+                {'teams': {'data': {0: {'id': ['Missing data for required field.']}}}},
+            ),
+    ):
+        with pytest.raises(ValidationError) as excinfo:
+            top_level_schema().load_patch({'data': {'id': user_1.id, 'type': 'users', 'relationships': relationships}})
+        assert excinfo.value.messages == {'data': {'relationships': messages}}
+
+
+def test_top_level_included_cycle(user_schema_cls, user_1, user_2):
+    user_1.referrer = user_2
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    serialized = top_level_schema(context={'to_include': {'referrer'}}).dump(user_2)
+    assert serialized['data']['relationships']['referrer']['data'] == {'id': user_1.id, 'type': 'users'}
+    assert serialized['included'] == [
+        {
+            'id': user_1.id,
+            'type': 'users',
+            'attributes': {
+                'name': user_1.name,
+                'email': user_1.email,
+            },
+            'relationships': {
+                'referrer': {
+                    'data': {
+                        'id': user_2.id,
+                        'type': 'users',
+                    }
+                }
+            },
+        }
+    ]
+
+
+@pytest.mark.parametrize('include_limits, expected_ids, expected_truncated', [
+    ({'max_depth': 1}, ['u3'], {'max_depth': 1}),
+    ({'max_depth': 2}, ['u3', 'u1'], None),
+    ({'max_included': 1}, ['u3'], {'max_included': 1}),
+    ({'max_time': 0}, [], {'max_time': 1}),
+])
+def test_top_level_included_limits(user_schema_cls, user_4, include_limits, expected_ids, expected_truncated):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    tls = top_level_schema(context={'to_include': {'referrer'}, 'include_limits': include_limits})
+    serialized = tls.dump(user_4)
+    assert [resource['id'] for resource in serialized.get('included', [])] == expected_ids
+    if expected_truncated:
+        assert serialized['meta'] == {'included_truncated': expected_truncated}
+    else:
+        assert 'meta' not in serialized
+
+    # a second dump does not reuse the included data of the first one
+    assert tls.dump(user_4) == serialized
+
+
+def test_user_schema_dump_columns(user_schema_cls_links, user_1, user_2, user_3):
+    user_schema_cls = user_schema_cls_links.get_jsonapi_resource_object_schema()
+    users = [user_1, user_2, user_3]
+    columns = {
+        'id': [user.id for user in users],
+        'name': [user.name for user in users],
+        'email': [user.email for user in users],
+        'referrer': [user.referrer.id if user.referrer else None for user in users],
+        'teams': [[team.id for team in user.teams] if user.teams is not None else None for user in users],
+    }
+    assert user_schema_cls().dump_columns(columns) == user_schema_cls().dump(users, many=True)
+
+    serialized = user_schema_cls(only=['name']).dump_columns(columns)
+    assert serialized == user_schema_cls(only=['name']).dump(users, many=True)
+
+
+def test_top_level_schema_inflect(user_schema_cls_inflect, team_1, team_2, user_1, user_3):
+    top_level_schema = user_schema_cls_inflect.get_jsonapi_top_level_schema()
+    serialized = top_level_schema(context={'to_include': {'referred_by'}}).dump(user_3)
+    assert serialized == {
+        'data': {
+            'id': user_3.id,
+            'type': 'users',
+            'attributes': {
+                'name': user_3.name,
+                'emailAddress': user_3.email,
+            },
+            'relationships': {
+                'referredBy': {
+                    'data': {
+                        'id': user_1.id,
+                        'type': 'users',
+                    }
+                },
+                'teamList': {
+                    'data': [
+                        {
+                            'id': team_1.id,
+                            'type': 'teams',
+                        },
+                        {
+                            'id': team_2.id,
+                            'type': 'teams',
+                        },
+                    ]
+                },
+            },
+        },
+        'included': [
+            {
+                'id': user_1.id,
+                'type': 'users',
+                'attributes': {
+                    'name': user_1.name,
+                    'emailAddress': user_1.email,
+                },
+            }
+        ],
+    }
+
+    assert top_level_schema().load({'data': serialized['data']}) == {
+        'id': user_3.id,
+        'name': user_3.name,
+        'email': user_3.email,
+        'referrer': user_1.id,
+        'teams': [team_1.id, team_2.id],
+    }
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'data': {'id': user_3.id, 'type': 'users', 'attributes': {'email_address': ''}}})
+    assert excinfo.value.messages == {
+        'data': {
+            'attributes': {
+                'emailAddress': ['Missing data for required field.'],
+                'email_address': ['Unknown field.'],
+            },
+        },
+    }
+
+
+@pytest.fixture()
+def batch_loaded_user_schema_cls(team_schema_cls, user_1, user_2, team_1):
+    users = {user.id: user for user in (user_1, user_2)}
+    teams = {team_1.id: team_1}
+    calls = []
+
+    def load_users(ids):
+        calls.append(('users', ids))
+        return {user_id: users[user_id] for user_id in ids if user_id in users}
+
+    def load_teams(ids):
+        calls.append(('teams', ids))
+        return {team_id: teams[team_id] for team_id in ids if team_id in teams}
+
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+
+        # relationships
+        referrer = RelationshipType(related_schema='UserSchema', batch_loader=load_users)
+        teams = RelationshipType(related_schema=team_schema_cls, many=True, batch_loader=load_teams)
+
+    UserSchema.loader_calls = calls
+    return UserSchema
+
+
+def test_load_top_level_schema_batch_loader(batch_loaded_user_schema_cls, user_1, user_2, team_1):
+    top_level_schema = batch_loaded_user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    deserialized = top_level_schema().load(
+        {
+            'data': [
+                {
+                    'id': 'u3',
+                    'type': 'users',
+                    'relationships': {
+                        'referrer': {'data': {'id': user_1.id, 'type': 'users'}},
+                        'teams': {'data': [{'id': team_1.id, 'type': 'teams'}]},
+                    },
+                },
+                {
+                    'id': 'u4',
+                    'type': 'users',
+                    'relationships': {
+                        'referrer': {'data': {'id': user_2.id, 'type': 'users'}},
+                    },
+                },
+            ]
+        }
+    )
+    assert deserialized == [
+        {'id': 'u3', 'referrer': user_1, 'teams': [team_1]},
+        {'id': 'u4', 'referrer': user_2},
+    ]
+    assert batch_loaded_user_schema_cls.loader_calls == [('users', [user_1.id, user_2.id]), ('teams', [team_1.id])]
+
+
+def test_load_top_level_schema_batch_loader_not_found(batch_loaded_user_schema_cls, user_1, team_1):
+    top_level_schema = batch_loaded_user_schema_cls.get_jsonapi_top_level_schema()
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load(
+            {
+                'data': {
+                    'id': 'u3',
+                    'type': 'users',
+                    'relationships': {
+                        'referrer': {'data': {'id': 'unknown', 'type': 'users'}},
+                        'teams': {'data': [{'id': team_1.id, 'type': 'teams'}, {'id': 'unknown', 'type': 'teams'}]},
+                    },
+                }
+            }
+        )
+    assert excinfo.value.messages == {
+        'data': {
+            'relationships': {
+                'referrer': {'data': {'id': ['Related resource not found.']}},
+                'teams': {'data': {1: {'id': ['Related resource not found.']}}},
+            },
+        },
+    }
+
+
+def test_load_top_level_schema_fail_fast(user_schema_cls, user_1, user_2, team_1):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    document = {
+        'data': [
+            {
+                'id': user_2.id,
+                'type': 'users',
+                'attributes': {'name': user_2.name, 'email': user_2.email},
+                'relationships': {
+                    'referrer': {'data': {'id': user_1.id, 'type': 'users'}},
+                    'teams': {'data': [{'id': team_1.id, 'type': 'teams'}]},
+                },
+            },
+            {'id': 'u5', 'type': 'users', 'attributes': {'name': 'Jane', 'email': 'jane@example.com'}},
+        ]
+    }
+    assert top_level_schema().load(document, fail_fast=True) == top_level_schema().load(document)
+
+    document['data'][0]['attributes']['email'] = 'invalid'
+    document['data'][1]['attributes']['email'] = 'invalid'
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load(document)
+    assert excinfo.value.messages['data'][0]['attributes'] == {'email': ['Not a valid email address.']}
+    assert excinfo.value.messages['data'][1]['attributes'] == {'email': ['Not a valid email address.']}
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load(document, fail_fast=True)
+    assert excinfo.value.messages == {'data': {0: {'attributes': {'email': ['Not a valid email address.']}}}}
+
+
+def test_load_top_level_schema_fail_fast_invalid_document(user_schema_cls):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'data': None}, fail_fast=True)
+    assert excinfo.value.messages == {'data': ['Field may not be null.']}
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'meta': {}}, fail_fast=True)
+    assert excinfo.value.messages == {'meta': ['Unknown field.']}
+
+    with pytest.raises(ValidationError) as excinfo:
+        user_schema_cls.get_jsonapi_top_level_schema(many=True)().load({'data': {}}, fail_fast=True)
+    assert excinfo.value.messages == {'data': ['Not a valid list.']}
+
+
+def test_load_top_level_schema_load_limits(user_schema_cls):
+    class LimitedUserSchema(user_schema_cls):
+        class Meta:
+            type_ = 'users'
+            load_limits = {'max_resources': 2, 'max_linkage': 1, 'max_string_length': 10}
+
+    top_level_schema = LimitedUserSchema.get_jsonapi_top_level_schema(many=True)
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'data': [{'id': str(index), 'type': 'users'} for index in range(3)]})
+    assert excinfo.value.messages == {'data': ['Too many resources, the maximum is 2.']}
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({
+            'data': [{
+                'id': '1',
+                'type': 'users',
+                'relationships': {'teams': {'data': [{'id': 't1', 'type': 'teams'}, {'id': 't2', 'type': 'teams'}]}},
+            }],
+        })
+    assert excinfo.value.messages == {
+        'data': {0: {'relationships': {'teams': {'data': ['Too many related resources, the maximum is 1.']}}}},
+    }
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'data': [{'id': '1', 'type': 'users', 'attributes': {'name': 'x' * 11}}]})
+    assert excinfo.value.messages == {'data': {0: {'attributes': {'name': ['Longer than maximum length 10.']}}}}
+
+
+def test_relationship_document_schema(user_schema_cls_links, user_1, user_3, team_1, team_2):
+    teams_schema = user_schema_cls_links.get_jsonapi_relationship_document_schema('teams')()
+    assert teams_schema.dump(user_3) == {
+        'data': [{'id': team_1.id, 'type': 'teams'}, {'id': team_2.id, 'type': 'teams'}],
+        'links': {
+            'self': f'/api/v1/users/{user_3.id}/relationships/teams',
+            'related': f'/api/v1/users/{user_3.id}/teams',
+        },
+    }
+    assert teams_schema.dump(user_1, context={'top_level_meta': {'count': 0}}) == {
+        'data': [],
+        'links': {
+            'self': f'/api/v1/users/{user_1.id}/relationships/teams',
+            'related': f'/api/v1/users/{user_1.id}/teams',
+        },
+        'meta': {'count': 0},
+    }
+    assert teams_schema.load({'data': [{'id': team_1.id, 'type': 'teams'}, {'id': team_2.id, 'type': 'teams'}]}) == [
+        team_1.id, team_2.id,
+    ]
+
+    referrer_schema = user_schema_cls_links.get_jsonapi_relationship_document_schema('referrer')()
+    assert referrer_schema.dump(user_3) == {'data': {'id': user_1.id, 'type': 'users'}}
+    assert referrer_schema.load({'data': {'id': user_1.id, 'type': 'users'}}) == user_1.id
+
+    with pytest.raises(ValueError):
+        user_schema_cls_links.get_jsonapi_relationship_document_schema('name')
+
+
+def test_relationship_document_schema_batch_loader(batch_loaded_user_schema_cls, team_1):
+    teams_schema = batch_loaded_user_schema_cls.get_jsonapi_relationship_document_schema('teams')()
+    assert teams_schema.load({'data': [{'id': team_1.id, 'type': 'teams'}]}) == [team_1]
+    with pytest.raises(ValidationError) as excinfo:
+        teams_schema.load({'data': [{'id': team_1.id, 'type': 'teams'}, {'id': 'unknown', 'type': 'teams'}]})
+    assert excinfo.value.messages == {'data': {1: {'id': ['Related resource not found.']}}}
+
+
+def test_relationship_document_schema_load_limits(team_schema_cls):
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            load_limits = {'max_linkage': 2, 'max_string_length': 10}
+
+        id = fields.String()
+        teams = RelationshipType(related_schema=team_schema_cls, many=True)
+
+    teams_schema = UserSchema.get_jsonapi_relationship_document_schema('teams')()
+    assert teams_schema.load({'data': [{'id': 't1', 'type': 'teams'}, {'id': 't2', 'type': 'teams'}]}) == ['t1', 't2']
+    with pytest.raises(ValidationError) as excinfo:
+        teams_schema.load({'data': [{'id': str(index), 'type': 'teams'} for index in range(1000)]})
+    assert excinfo.value.messages == {'data': ['Too many related resources, the maximum is 2.']}
+    with pytest.raises(ValidationError) as excinfo:
+        teams_schema.load({'data': [{'id': 't' * 11, 'type': 'teams'}]})
+    assert excinfo.value.messages == {'data': {0: {'id': ['Longer than maximum length 10.']}}}
+
+
+def test_relationship_count_and_linkage_limit(team_schema_cls, user_1, user_3, team_1):
+    # e.g. counted with a single aggregate query
+    team_counts = {user_3.id: len(user_3.teams)}
+
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+
+        id = fields.String()
+        name = fields.String()
+
+        referrer = RelationshipType(related_schema='UserSchema', linkage=False, count=lambda user: 1)
+        teams = RelationshipType(
+            related_schema=team_schema_cls,
+            many=True,
+            linkage_limit=1,
+            count=lambda user: team_counts[user.id],
+            related_url='/api/v1/users/{id}/teams',
+            related_url_kwargs={'id': '<id>'},
+        )
+
+    class UnreadReferrer:
+        def __init__(self, user):
+            self.id = user.id
+            self.name = user.name
+            self.teams = user.teams
+
+        @property
+        def referrer(self):
+            raise AssertionError('relationships without linkage must not be read')
+
+    expected_relationships = {
+        'referrer': {'meta': {'count': 1}},
+        'teams': {
+            'data': [{'id': team_1.id, 'type': 'teams'}],
+            'links': {'related': f'/api/v1/users/{user_3.id}/teams'},
+            'meta': {'count': 2},
+        },
+    }
+    top_level_schema = UserSchema.get_jsonapi_top_level_schema()
+    assert top_level_schema().dump(user_3)['data']['relationships'] == expected_relationships
+
+    unread_user = UnreadReferrer(user_3)
+    assert top_level_schema().dump(unread_user)['data']['relationships'] == expected_relationships
+
+    # iterators are capped without being consumed
+    teams_iterator = iter(user_3.teams)
+    unread_user.teams = teams_iterator
+    UserSchema.get_jsonapi_resource_object_schema()().dump(unread_user)
+    assert len(list(teams_iterator)) == 1
+
+    document = top_level_schema().dump(user_3, context={'to_include': {'teams', 'referrer'}})
+    assert {resource['id'] for resource in document['included']} == {team_1.id, user_1.id}
+
+    resource_schema = UserSchema.get_jsonapi_resource_object_schema()()
+    columns = {
+        'id': [user_3.id],
+        'name': [user_3.name],
+        'teams': [[team.id for team in user_3.teams]],
+        'teams.count': [team_counts[user_3.id]],
+        'referrer.count': [1],
+    }
+    assert resource_schema.dump_columns(columns) == [resource_schema.dump(user_3)]
+    assert resource_schema.dump_columns(columns)[0]['relationships'] == expected_relationships
+    with pytest.raises(ValueError):
+        resource_schema.dump_columns({'id': [user_3.id], 'teams': [[team.id for team in user_3.teams]]})
+    # relationships without linkage still load their data
+    assert resource_schema.load(
+        {'id': 'u5', 'type': 'users', 'relationships': {'referrer': {'data': {'id': user_1.id, 'type': 'users'}}}}
+    ) == {'id': 'u5', 'referrer': user_1.id}
+
+
+def test_polymorphic_relationships(project_schema_cls, user_1, team_1, team_2):
+    project = Project('p1', 'Project', owner=team_1, members=[user_1, team_2])
+    top_level_schema = project_schema_cls.get_jsonapi_top_level_schema()
+    document = top_level_schema().dump(project, context={'to_include': {'owner', 'members'}})
+    assert document['data']['relationships'] == {
+        'owner': {'data': {'id': team_1.id, 'type': 'teams'}},
+        'members': {'data': [{'id': user_1.id, 'type': 'users'}, {'id': team_2.id, 'type': 'teams'}]},
+    }
+    assert sorted((resource['type'], resource['id']) for resource in document['included']) == [
+        ('teams', team_1.id), ('teams', team_2.id), ('users', user_1.id),
+    ]
+
+    # subclasses are dispatched to the schema of their closest model
+    class Admin(User):
+        pass
+
+    project.owner = Admin('u9', 'Admin', 'admin@example.com')
+    assert top_level_schema().dump(project)['data']['relationships']['owner'] == {'data': {'id': 'u9', 'type': 'users'}}
+
+    loaded = top_level_schema().load({
+        'data': {
+            'id': 'p2',
+            'type': 'projects',
+            'relationships': {
+                'owner': {'data': {'id': user_1.id, 'type': 'users'}},
+                'members': {'data': [{'id': team_1.id, 'type': 'teams'}, {'id': user_1.id, 'type': 'users'}]},
+            },
+        },
+    })
+    assert loaded == {
+        'id': 'p2', 'owner': ('users', user_1.id), 'members': [('teams', team_1.id), ('users', user_1.id)],
+    }
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({
+            'data': {'id': 'p2', 'type': 'projects', 'relationships': {'owner': {'data': {'id': 'x', 'type': 'foo'}}}},
+        })
+    assert excinfo.value.messages == {
+        'data': {'relationships': {'owner': {'data': {'type': ['Invalid `type` specified']}}}},
+    }
+
+
+def test_polymorphic_relationships_batch_loader(user_schema_cls, team_schema_cls, user_1, team_1):
+    class ProjectSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'projects'
+
+        id = fields.String()
+        members = RelationshipType(
+            related_schema=[user_schema_cls, team_schema_cls],
+            many=True,
+            batch_loader={
+                'users': lambda ids: {user_1.id: user_1} if user_1.id in ids else {},
+                'teams': lambda ids: {team_1.id: team_1} if team_1.id in ids else {},
+            },
+        )
+
+    top_level_schema = ProjectSchema.get_jsonapi_top_level_schema()
+    members = [{'id': team_1.id, 'type': 'teams'}, {'id': user_1.id, 'type': 'users'}]
+    loaded = top_level_schema().load({
+        'data': {'id': 'p1', 'type': 'projects', 'relationships': {'members': {'data': members}}},
+    })
+    assert loaded == {'id': 'p1', 'members': [team_1, user_1]}
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({
+            'data': {
+                'id': 'p1',
+                'type': 'projects',
+                'relationships': {'members': {'data': [*members, {'id': team_1.id, 'type': 'users'}]}},
+            },
+        })
+    assert excinfo.value.messages == {
+        'data': {'relationships': {'members': {'data': {2: {'id': ['Related resource not found.']}}}}},
+    }
+
+
+def test_mixed_top_level_schema(project_schema_cls, user_1, team_1):
+    owner_schemas = project_schema_cls._declared_fields['owner'].related_schema_classes
+    top_level_schema = JSONAPISchema.get_jsonapi_mixed_top_level_schema(owner_schemas)
+    document = top_level_schema().dump([user_1, team_1])
+    assert [(resource['type'], resource['id']) for resource in document['data']] == [
+        ('users', user_1.id), ('teams', team_1.id),
+    ]
+    assert document['data'][1] == {'id': team_1.id, 'type': 'teams', 'attributes': {'name': team_1.name}}
+
+    assert top_level_schema().load({'data': [
+        {'id': 'u9', 'type': 'users', 'attributes': {'name': 'Jane', 'email': 'jane@example.com'}},
+        {'id': 't9', 'type': 'teams', 'attributes': {'name': 'Team'}},
+    ]}) == [
+        {'id': 'u9', 'type': 'users', 'name': 'Jane', 'email': 'jane@example.com'},
+        {'id': 't9', 'type': 'teams', 'name': 'Team'},
+    ]
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({'data': [{'id': 'x', 'type': 'projects'}]})
+    assert excinfo.value.messages == {'data': {0: {'type': ['Invalid `type` specified']}}}
+
+    class LimitedSchema(JSONAPISchema):
+        class Meta:
+            load_limits = {'max_resources': 1}
+
+    limited_schema = LimitedSchema.get_jsonapi_mixed_top_level_schema(owner_schemas)
+    with pytest.raises(ValidationError) as excinfo:
+        limited_schema().load({'data': [{'id': 'u9', 'type': 'users'}, {'id': 't9', 'type': 'teams'}]})
+    assert excinfo.value.messages == {'data': ['Too many resources, the maximum is 1.']}
+
+
+def test_dump_batch(team_schema_cls, user_1, user_2, user_3, user_4):
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            inflect = camelize
+            self_url = '/api/v1/users/{id}'
+            self_url_kwargs = {'id': '<id>'}
+
+        id = fields.String()
+
+        # attributes
+        name = fields.String()
+        email = fields.Email()
+        created_at = fields.DateTime(format='%Y-%m-%d')
+        updated_at = fields.DateTime()
+        role = fields.String(dump_default='member')
+        name_length = fields.Function(lambda obj: len(obj.name or ''))
+        initial = fields.Method('get_initial')
+
+        # relationships
+        referrer = RelationshipType(related_schema='UserSchema')
+        teams = RelationshipType(related_schema=team_schema_cls, many=True)
+
+        def get_initial(self, obj):
+            return obj.name[:1].upper() if obj.name else None
+
+    class BatchUserSchema(UserSchema):
+        class Meta(UserSchema.Meta):
+            batch_dump = True
+
+    user_1.created_at = user_1.updated_at = dt.datetime(2022, 1, 1)
+    user_1.role = 'admin'
+    user_2.created_at = dt.datetime(2022, 2, 1)
+    user_2.role = None
+    user_4.name = None
+    users = [user_1, user_2, user_3, user_4]
+
+    schema = UserSchema.get_jsonapi_resource_object_schema()()
+    expected = schema.dump(users, many=True)
+    assert schema.dump_batch(users) == expected
+    assert [resource['attributes'] for resource in expected] == [
+        {
+            'name': user_1.name, 'email': user_1.email, 'createdAt': '2022-01-01',
+            'updatedAt': '2022-01-01T00:00:00', 'role': 'admin', 'nameLength': len(user_1.name), 'initial': 'U',
+        },
+        {
+            'name': user_2.name, 'email': user_2.email, 'createdAt': '2022-02-01', 'role': None,
+            'nameLength': len(user_2.name), 'initial': 'U',
+        },
+        {'name': user_3.name, 'email': user_3.email, 'role': 'member', 'nameLength': len(user_3.name), 'initial': 'U'},
+        {'name': None, 'email': user_4.email, 'role': 'member', 'nameLength': 0, 'initial': None},
+    ]
+
+    top_level_schema = BatchUserSchema.get_jsonapi_top_level_schema(many=True)
+    document = top_level_schema().dump([user_3, user_4], context={'to_include': {'referrer'}})
+    assert document == UserSchema.get_jsonapi_top_level_schema(many=True)().dump(
+        [user_3, user_4], context={'to_include': {'referrer'}},
+    )
+    assert document['data'][0]['links'] == {'self': f'/api/v1/users/{user_3.id}'}
+    assert [resource['id'] for resource in document['included']] == [user_1.id]
+
+
+def test_top_level_schema_validation_errors(user_schema_cls_required_fields):
+    top_level_schema = user_schema_cls_required_fields.get_jsonapi_top_level_schema()
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({
+            'data': {
+                'id': 'u5',
+                'type': 'users',
+                'attributes': {'email': 'invalid'},
+                'relationships': {'referrer': {'data': {'id': 'u1', 'type': 'teams'}}},
+            },
+        })
+    document = top_level_schema().dump(excinfo.value)
+    # the order of the messages depends on marshmallow
+    document['errors'].sort(key=lambda error: error['source']['pointer'])
+    assert document == {
+        'errors': [
+            {'status': '422', 'detail': 'Not a valid email address.', 'source': {'pointer': '/data/attributes/email'}},
+            {
+                'status': '422',
+                'detail': 'Missing data for required field.',
+                'source': {'pointer': '/data/attributes/name'},
+            },
+            {
+                'status': '422',
+                'detail': 'Invalid `type` specified',
+                'source': {'pointer': '/data/relationships/referrer/data/type'},
+            },
+        ],
+    }
+    # errors without the members of error objects
+    assert top_level_schema().dump(Exception('error')) == {'errors': [{}]}
+
+
+def test_top_level_schema_load_compound(user_schema_cls, user_1):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    loaded = top_level_schema().load_compound({
+        'data': {
+            'lid': 'new-user',
+            'type': 'users',
+            'attributes': {'name': 'New', 'email': 'new@example.com'},
+            'relationships': {
+                'referrer': {'data': {'lid': 'new-referrer', 'type': 'users'}},
+                'teams': {'data': [{'lid': 'new-team', 'type': 'teams'}, {'id': 't1', 'type': 'teams'}]},
+            },
+        },
+        'included': [
+            {
+                'lid': 'new-referrer',
+                'type': 'users',
+                'attributes': {'name': 'Referrer', 'email': 'referrer@example.com'},
+                'relationships': {
+                    'referrer': {'data': {'id': user_1.id, 'type': 'users'}},
+                    'teams': {'data': [{'lid': 'new-team', 'type': 'teams'}]},
+                },
+            },
+            {'lid': 'new-team', 'type': 'teams', 'attributes': {'name': 'New team'}},
+        ],
+    })
+    assert loaded == [
+        {'teams': [{'lid': 'new-team', 'name': 'New team'}]},
+        {'users': [{
+            'lid': 'new-referrer', 'name': 'Referrer', 'email': 'referrer@example.com', 'referrer': user_1.id,
+            'teams': [LocalId('teams', 'new-team')],
+        }]},
+        {'users': [{
+            'lid': 'new-user', 'name': 'New', 'email': 'new@example.com', 'referrer': LocalId('users', 'new-referrer'),
+            'teams': [LocalId('teams', 'new-team'), 't1'],
+        }]},
+    ]
+
+
+def test_top_level_schema_load_compound_errors(user_schema_cls):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_compound({
+            'data': [
+                {
+                    'lid': 'a',
+                    'type': 'users',
+                    'relationships': {'teams': {'data': [{'lid': 'unknown', 'type': 'teams'}]}},
+                },
+                {'lid': 'a', 'type': 'users'},
+                {'type': 'users'},
+            ],
+            'included': [{'lid': 'b', 'type': 'projects'}],
+        })
+    assert excinfo.value.messages == {
+        'data': {
+            0: {'relationships': {'teams': ['Unknown local id.']}},
+            1: {'lid': ['Duplicate resource.']},
+            2: {'id': ['Missing data for required field.']},
+        },
+        'included': {0: {'type': ['Invalid `type` specified']}},
+    }
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_compound({
+            'data': [
+                {'lid': 'a', 'type': 'users', 'relationships': {'referrer': {'data': {'lid': 'b', 'type': 'users'}}}},
+                {'lid': 'b', 'type': 'users', 'relationships': {'referrer': {'data': {'lid': 'a', 'type': 'users'}}}},
+            ],
+        })
+    assert excinfo.value.messages == {'_schema': ['Circular relationships between the resources of the document.']}
+
+
+
+
+def test_top_level_schema_load_rejects_local_ids(user_schema_cls):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load({
+            'data': {
+                'lid': 'new-user',
+                'type': 'users',
+                'relationships': {'teams': {'data': [{'lid': 'new-team', 'type': 'teams'}]}},
+            },
+        })
+    assert excinfo.value.messages == {'data': {
+        'lid': ['Unknown field.'],
+        'relationships': {'teams': {'data': {0: {
+            'id': ['Missing data for required field.'], 'lid': ['Unknown field.'],
+        }}}},
+    }}
+
+def test_top_level_schema_load_compound_limits(team_schema_cls):
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            load_limits = {'max_resources': 2, 'max_linkage': 1}
+
+        id = fields.String()
+        name = fields.String()
+        teams = RelationshipType(related_schema=team_schema_cls, many=True)
+
+    top_level_schema = UserSchema.get_jsonapi_top_level_schema()
+    user = {'lid': 'u', 'type': 'users', 'relationships': {'teams': {'data': [{'lid': 't0', 'type': 'teams'}]}}}
+    teams = [{'lid': f't{index}', 'type': 'teams', 'attributes': {'name': 'team'}} for index in range(50)]
+
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_compound({'data': user, 'included': teams})
+    assert excinfo.value.messages == {'included': ['Too many resources, the maximum is 2.']}
+
+    included_user = {**user, 'lid': 'v', 'relationships': {'teams': {'data': [
+        {'lid': 't0', 'type': 'teams'}, {'id': 't1', 'type': 'teams'},
+    ]}}}
+    with pytest.raises(ValidationError) as excinfo:
+        top_level_schema().load_compound({'data': user, 'included': [included_user]})
+    assert excinfo.value.messages == {
+        'included': {0: {'relationships': {'teams': {'data': ['Too many related resources, the maximum is 1.']}}}},
+    }
+
+
+def test_dump_with_executor(user_schema_cls, user_1, user_2, user_3, user_4):
+    reads = []
+    lock = threading.Lock()
+
+    class SlowUser(User):
+        """ Relationships read with a delay, as if backed by blocking I/O. """
+
+        def __getattribute__(self, name):
+            if name in ('referrer', 'teams'):
+                with lock:
+                    reads.append(threading.get_ident())
+                time.sleep(0.01)
+            return super().__getattribute__(name)
+
+    users = [SlowUser(user.id, user.name, user.email, user.referrer, user.teams) for user in (user_2, user_3, user_4)]
+    schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)(context={'to_include': ['teams', 'referrer']})
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        ret = schema.dump(iter(users), executor=executor)
+
+    # the relationships of all the users were read once, by the executor threads
+    assert len(reads) == 6
+    assert threading.get_ident() not in reads
+    assert len(set(reads)) > 1
+    assert ret == schema.dump(users)
+
+    # the relationships of included objects are read level by level for all the parents, to-one included
+    reads.clear()
+    referrers = [SlowUser(user.id, user.name, user.email, None, user.teams) for user in (user_1, user_3)]
+    users = [
+        SlowUser(user.id, user.name, user.email, referrer, user.teams)
+        for user, referrer in zip((user_2, user_4), referrers)
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        ret = schema.dump(users, executor=executor)
+    assert len(reads) == 8
+    assert threading.get_ident() not in reads
+    assert ret == schema.dump(users)
+
+
+@pytest.mark.parametrize('use_batch_dump', [False, True])
+def test_function_fields_read_dump_context(user_3, team_1, team_2, use_batch_dump):
+    class TeamSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'teams'
+
+        id = fields.String()
+        label = fields.Function(lambda obj, context: f'{context.get("lang")}:{obj.name}')
+
+    class UserSchema(JSONAPISchema):
+        class Meta:
+            type_ = 'users'
+            batch_dump = use_batch_dump
+
+        id = fields.String()
+        label = fields.Function(lambda obj, context: f'{context.get("lang")}:{obj.name}')
+        greeting = fields.Method('get_greeting')
+
+        teams = RelationshipType(related_schema=TeamSchema, many=True)
+
+        def get_greeting(self, obj):
+            return f'{self.context.get("greeting")} {obj.name}'
+
+    schema = UserSchema.get_jsonapi_top_level_schema(many=True)(context={'greeting': 'Bonjour'})
+    document = schema.dump([user_3], context={'lang': 'fr', 'to_include': ['teams']})
+
+    assert document['data'][0]['attributes'] == {'label': 'fr:user-3', 'greeting': 'Bonjour user-3'}
+    assert [resource['attributes'] for resource in document['included']] == [
+        {'label': f'fr:{team_1.name}'}, {'label': f'fr:{team_2.name}'},
+    ]
+    # the context of a call does not leak into the next calls
+    document = schema.dump([user_3], context={'lang': 'en', 'to_include': ['teams']})
+    assert document['data'][0]['attributes']['label'] == 'en:user-3'
+    assert document['included'][0]['attributes'] == {'label': f'en:{team_1.name}'}
+    assert schema.dump([user_3])['data'][0]['attributes'] == {'label': 'None:user-3', 'greeting': 'Bonjour user-3'}
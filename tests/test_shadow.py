@@ -0,0 +1,87 @@
+from mjapi.shadow import Difference, ShadowVerifier, diff, generate_objects
+
+
+def to_columns(objs, names):
+    columns = {name: [getattr(obj, name) for obj in objs] for name in names}
+    columns['referrer'] = [obj.referrer.id if obj.referrer else None for obj in objs]
+    columns['teams'] = [[team.id for team in obj.teams] for obj in objs]
+    return columns
+
+
+def test_diff():
+    assert diff({'a': [1, {'b': 2}]}, {'a': [1, {'b': 2}]}) == []
+    assert diff({'a': [1, {'b': 2}], 'c': 1}, {'a': [1, {'b': 3}, 4]}) == [
+        Difference(('a', 1, 'b'), 2, 3),
+        Difference(('a', 2), None, 4),
+        Difference(('c',), 1, None),
+    ]
+    assert diff({'a': 1}, {'a': 1.0}) == [Difference(('a',), 1, 1.0)]
+
+
+def test_generate_objects(user_schema_cls):
+    users = generate_objects(user_schema_cls, 20, seed=1)
+    assert len(users) == 20
+    assert len({user.id for user in users}) == 20
+    assert all(team.id.startswith('teams-') for user in users for team in user.teams)
+    assert generate_objects(user_schema_cls, 20, seed=1)[5].email == users[5].email
+
+
+def test_shadow_verifier_columns(user_schema_cls):
+    schema = user_schema_cls.get_jsonapi_resource_object_schema()()
+    users = generate_objects(user_schema_cls, 50, seed=2)
+    verifier = ShadowVerifier()
+    ret = verifier.verify(
+        'users.columns',
+        lambda objs: schema.dump(objs, many=True),
+        lambda objs: schema.dump_columns(to_columns(objs, ['id', 'name', 'email'])),
+        users,
+    )
+    assert verifier.mismatches == []
+    assert ret == schema.dump(users, many=True)
+    report = verifier.report()['users.columns']
+    assert report['samples'] == 1
+    assert report['mismatches'] == 0
+    assert report['speedup'] > 0
+
+
+def test_shadow_verifier_mismatch_reproducer(user_schema_cls):
+    schema = user_schema_cls.get_jsonapi_resource_object_schema()()
+    users = generate_objects(user_schema_cls, 10, seed=3)
+    broken_id = users[4].id
+
+    def optimized(objs):
+        ret = schema.dump(objs, many=True)
+        for item in ret:
+            if item['id'] == broken_id:
+                item['attributes']['name'] = 'broken'
+        return ret
+
+    verifier = ShadowVerifier()
+    verifier.verify('users', lambda objs: schema.dump(objs, many=True), optimized, users)
+    [mismatch] = verifier.mismatches
+    assert mismatch.name == 'users'
+    assert mismatch.reproducer == [users[4]]
+    assert mismatch.differences == [Difference((0, 'attributes', 'name'), users[4].name, 'broken')]
+    assert verifier.report()['users']['mismatches'] == 1
+
+
+def test_shadow_verifier_sample_rate():
+    calls = []
+    verifier = ShadowVerifier(sample_rate=0.0)
+    assert verifier.verify('noop', calls.append, lambda value: value, 1) == 1
+    assert calls == []
+    assert verifier.report() == {}
+
+
+def test_shadow_verifier_reference_error():
+    def reference(value):
+        raise KeyError('missing')
+
+    verifier = ShadowVerifier()
+    assert verifier.verify('broken', reference, lambda value: value * 2, 21) == 42
+
+    [mismatch] = verifier.mismatches
+    assert mismatch.reproducer == 21
+    assert isinstance(mismatch.error, KeyError)
+    assert verifier.report()['broken']['errors'] == 1
+    assert verifier.report()['broken']['mismatches'] == 0
@@ -0,0 +1,45 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS = 8
+ITERATIONS = 50
+
+
+def test_shared_top_level_schema_concurrent_dumps(user_schema_cls, user_1, user_2, user_3, user_4):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema(many=True)()
+    users = [user_2, user_3, user_4]
+    contexts = [None, {'to_include': {'referrer'}}, {'to_include': {'referrer.teams'}}]
+    expected = [top_level_schema.dump(users, context=context) for context in contexts]
+    assert expected[0] != expected[1] != expected[2]
+
+    barrier = threading.Barrier(THREADS)
+
+    def dump_all(thread_index):
+        barrier.wait()
+        results = []
+        for iteration in range(ITERATIONS):
+            context_index = (thread_index + iteration) % len(contexts)
+            results.append((context_index, top_level_schema.dump(users, context=contexts[context_index])))
+        return results
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        # switch threads as often as possible to interleave the dumps
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            all_results = list(executor.map(dump_all, range(THREADS)))
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    for results in all_results:
+        for context_index, result in results:
+            assert result == expected[context_index]
+
+
+def test_dump_context_does_not_leak_to_instance(user_schema_cls, user_2):
+    top_level_schema = user_schema_cls.get_jsonapi_top_level_schema()()
+    with_included = top_level_schema.dump(user_2, context={'to_include': {'referrer'}})
+    assert 'included' in with_included
+    assert 'included' not in top_level_schema.dump(user_2)
+    assert top_level_schema.context == {}